@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from CSVGenerator import generateCSV
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; the peak memory is then not reported
+    resource = None
+'''
+COTIBenchmark is a script that times the COTI operations on deterministic synthetic CSV files and writes the results as JSON, so the
+throughput of two commits can be compared on the same data.
+
+Notes:
+    Each run is a separate process calling COTI.main(), so the peak memory of a run (including its worker processes) is measured on its own.
+    The fastest of the repeated runs of a case is kept.
+'''
+
+COTI_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'COTI')
+# Argument of a case replaced with the full path of the dataset, for the operations that read a second file (e.g. a join of the dataset with itself)
+SOURCE_FILE = '{file}'
+
+# (name, COTI arguments) of each case, in the order they run on a dataset.  The index case builds the index on every run and leaves it for the count with -index.
+CASES = [
+    ('count/stream', ['-operation', 'count', '-mode', 'stream']),
+    ('count/memory', ['-operation', 'count', '-mode', 'memory']),
+    ('count/memory-compact', ['-operation', 'count', '-mode', 'memory', '-compact']),
+    ('index/stream', ['-operation', 'index']),
+    ('count/index', ['-operation', 'count', '-index']),
+    ('chunk/stream', ['-operation', 'chunk', '-chunksize', '50000', '-mode', 'stream']),
+    ('chunk/memory', ['-operation', 'chunk', '-chunksize', '50000', '-mode', 'memory']),
+    ('chunk/memory-compact', ['-operation', 'chunk', '-chunksize', '50000', '-mode', 'memory', '-compact']),
+    ('chunk/raw', ['-operation', 'chunk', '-chunksize', '50000', '-mode', 'raw']),
+    ('chunk/stream-bytes', ['-operation', 'chunk', '-chunkbytes', '10485760', '-mode', 'stream']),
+    ('scrub/stream', ['-operation', 'scrub']),
+    ('explode/stream', ['-operation', 'explode', '-field2split', 'Text1', '-fielddelimiter', ' ', '-splitfieldonly', 'no', '-mode', 'stream']),
+    ('extract/stream', ['-operation', 'extract', '-startrow', '1001', '-endrow', '51000']),
+    ('partition/stream', ['-operation', 'partition', '-partitionby', 'Status']),
+    ('sort/stream', ['-operation', 'sort', '-sortby', 'DueDate:date,Amount:float']),
+    ('dedup/stream', ['-operation', 'dedup', '-dedupby', 'Text1']),
+    ('select/stream', ['-operation', 'select', '-columns', 'Id,Amount,DueDate', '-where', 'Status=PAID']),
+    ('aggregate/stream', ['-operation', 'aggregate', '-groupby', 'Status,Currency', '-aggregates', 'count,sum:Amount,mean:Amount,max:Amount']),
+    ('join/stream', ['-operation', 'join', '-joinfile', SOURCE_FILE, '-joinon', 'Id']),
+    ('diff/stream', ['-operation', 'diff', '-difffile', SOURCE_FILE, '-diffon', 'Id']),
+    ('validate/stream', ['-operation', 'validate']),
+]
+
+def runCase(source_file_path, arguments, fresh_index=False):
+    ''' Runs COTI in a child process and measures it.
+    Args:
+        source_file_path (String):  Full path of the source file.  The output files are written to its directory and deleted afterwards.
+        arguments (List):  COTI arguments, without -file.  SOURCE_FILE is replaced with source_file_path.
+        fresh_index (Boolean):  Defines whether the record index of the source file is deleted first, so it is built again by the run.
+    Returns:
+        (Dictionary):  seconds, cpu_seconds and peak_rss_mb of the run, or error if COTI exited early.
+    '''
+    if fresh_index and os.path.exists(source_file_path + '.idx'):
+        os.remove(source_file_path + '.idx')
+    arguments = [source_file_path if argument == SOURCE_FILE else argument for argument in arguments]
+    command = [sys.executable, os.path.abspath(__file__), '-run', source_file_path, '--'] + arguments
+    result = subprocess.run(command, stdout=subprocess.PIPE, cwd=os.path.dirname(source_file_path), check=True)
+    removeOutputFiles(source_file_path)
+    return json.loads(result.stdout.decode('utf-8').strip().splitlines()[-1])
+
+def runChild(source_file_path, arguments):
+    ''' Body of the child process started by runCase():  calls COTI.main() with its output silenced and prints the measures as JSON.
+    Args:
+        source_file_path (String):  Full path of the source file.
+        arguments (List):  COTI arguments, without -file.
+    '''
+    sys.path.insert(0, COTI_DIRECTORY)
+    import COTI
+
+    sys.argv = ['COTI.py', '-file', source_file_path] + arguments
+    measures = {}
+    fltStart = time.perf_counter()
+    fltCPUStart = time.process_time()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            COTI.main()
+    except SystemExit:
+        measures['error'] = 'COTI exited: ' + ' '.join(arguments)
+    measures['seconds'] = time.perf_counter() - fltStart
+    measures['cpu_seconds'] = time.process_time() - fltCPUStart
+    measures['peak_rss_mb'] = peakMemory()
+    print(json.dumps(measures))
+
+def peakMemory():
+    ''' Returns the peak resident memory of this process and of its finished child processes.
+    Returns:
+        (Float):  Peak memory in MB, or None where it cannot be measured.
+    '''
+    if resource is None:
+        return None
+    intPeak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return intPeak / (1024 * 1024) if sys.platform == 'darwin' else intPeak / 1024
+
+def removeOutputFiles(source_file_path):
+    ''' Deletes the files written by COTI next to the source file (e.g. Filename(1).csv).  The source file and its record index are kept.
+    Args:
+        source_file_path (String):  Full path of the source file.
+    '''
+    strDirectory, strName = os.path.split(source_file_path)
+    strPrefix = os.path.splitext(strName)[0] + '('
+    for strFile in os.listdir(strDirectory):
+        if strFile.startswith(strPrefix):
+            os.remove(os.path.join(strDirectory, strFile))
+
+def getCommit():
+    ''' Returns the git commit of the repository, so the results can be matched to the code they measured.
+    Returns:
+        (String):  The commit hash, or None outside of a git checkout.
+    '''
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=COTI_DIRECTORY, check=True).stdout.decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def runBenchmarks(data_directory, rows, columns, widths, newlines, delimiters, cases, repeat=3, seed=1):
+    ''' Generates one dataset for each combination of the parameters and runs the cases on it.
+    Args:
+        data_directory (String):  Directory of the generated files.  A file that was already generated with the same parameters is reused.
+        rows, columns, widths, newlines, delimiters (List):  Values of the dataset parameters (see CSVGenerator.generateCSV()).
+        cases (List):  (name, COTI arguments) of the cases to run.
+        repeat (Integer):  Number of runs of each case.  The fastest run is kept.
+        seed (Integer):  Seed of the generated files.
+    Returns:
+        (List):  One result dictionary per dataset and case.
+    '''
+    results = []
+    for intRows, intColumns, intWidth, fltNewlines, strDelimiter in itertools.product(rows, columns, widths, newlines, delimiters):
+        dataset = {'rows': intRows, 'columns': intColumns, 'field_width': intWidth, 'quoted_newlines': fltNewlines, 'delimiter': strDelimiter, 'seed': seed}
+        strName = 'bench_%d_%d_%d_%g_%d_%d.csv' % (intRows, intColumns, intWidth, fltNewlines, ord(strDelimiter), seed)
+        strSourcePath = os.path.join(data_directory, strName)
+        if not os.path.exists(strSourcePath):
+            print('[INFO] Generating dataset: ', strName)
+            generateCSV(strSourcePath, intRows, intColumns, intWidth, fltNewlines, strDelimiter, seed)
+        if os.path.exists(strSourcePath + '.idx'):
+            os.remove(strSourcePath + '.idx')
+        intBytes = os.path.getsize(strSourcePath)
+
+        for strCase, arguments in cases:
+            runs = [runCase(strSourcePath, arguments + ['-delimiter', strDelimiter], strCase.startswith('index/')) for i in range(repeat)]
+            best = min(runs, key=lambda run: run['seconds'])
+            result = dict(dataset, case=strCase, bytes=intBytes, seconds=round(best['seconds'], 4), cpu_seconds=round(best['cpu_seconds'], 4),
+                rows_per_second=round(intRows / best['seconds']), mb_per_second=round(intBytes / (1024 * 1024) / best['seconds'], 2),
+                peak_rss_mb=None if best['peak_rss_mb'] is None else round(max(run['peak_rss_mb'] for run in runs), 1))
+            if 'error' in best:
+                result['error'] = best['error']
+            results.append(result)
+            print('[INFO] %-22s %-34s %8.3f s %10d rows/s %8.2f MB/s  peak %s MB' % (strCase, strName, result['seconds'], result['rows_per_second'], result['mb_per_second'], result['peak_rss_mb']))
+
+        if os.path.exists(strSourcePath + '.idx'):
+            os.remove(strSourcePath + '.idx')
+    return results
+
+def compareResults(baseline, results):
+    ''' Prints the change of each case against a previous results file.
+    Args:
+        baseline (Dictionary):  Content of the previous results file.
+        results (List):  The current results.
+    '''
+    def key(result):
+        return (result['rows'], result['columns'], result['field_width'], result['quoted_newlines'], result['delimiter'], result['seed'], result['case'])
+
+    previous = {key(result): result for result in baseline['results']}
+    print('[INFO] Compared with commit: ', baseline.get('commit'))
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        fltChange = (old['seconds'] - result['seconds']) / old['seconds'] * 100 if old['seconds'] else 0.0
+        print('[INFO] %-22s delimiter %-4r %8.3f s -> %8.3f s  %+6.1f%% faster' % (result['case'], result['delimiter'], old['seconds'], result['seconds'], fltChange))
+
+def main():
+    ''' Main logic for the benchmark script.
+    '''
+    if len(sys.argv) > 2 and sys.argv[1] == '-run':
+        runChild(sys.argv[2], sys.argv[4:])
+        return
+
+    parser = argparse.ArgumentParser(prog="COTIBenchmark", description='Times the COTI operations on deterministic synthetic CSV files.')
+    parser.add_argument('-rows', type=int, nargs='+', default=[200000], help='Record counts of the datasets.')
+    parser.add_argument('-columns', type=int, nargs='+', default=[12], help='Column counts of the datasets.')
+    parser.add_argument('-width', type=int, nargs='+', default=[12], help='Average widths of the free text fields of the datasets.')
+    parser.add_argument('-newlines', type=float, nargs='+', default=[0.01], help='Shares of the records with a quoted field that contains a line break.')
+    parser.add_argument('-delimiters', nargs='+', default=[',', '\\t', '|'], help='Delimiters of the datasets.  Use "\\t" for tabs.')
+    parser.add_argument('-cases', nargs='+', help='Names of the cases to run (e.g. chunk/raw).  If nothing is defined then all the cases are run: ' + str([name for name, arguments in CASES]))
+    parser.add_argument('-repeat', type=int, default=3, help='Number of runs of each case.  The fastest run is kept.')
+    parser.add_argument('-seed', type=int, default=1, help='Seed of the generated files.')
+    parser.add_argument('-datadir', help='Directory of the generated files, kept between benchmark runs.  If nothing is defined then a temporary directory is used.')
+    parser.add_argument('-output', default='benchmark-results.json', help='File the results are written to.')
+    parser.add_argument('-compare', help='Previous results file to compare the results with.')
+    args = parser.parse_args()
+
+    cases = CASES if args.cases is None else [case for case in CASES if case[0] in args.cases]
+    delimiters = [delimiter.replace('\\t', '\t') for delimiter in args.delimiters]
+
+    if args.datadir is None:
+        with tempfile.TemporaryDirectory() as strDataDirectory:
+            results = runBenchmarks(strDataDirectory, args.rows, args.columns, args.width, args.newlines, delimiters, cases, args.repeat, args.seed)
+    else:
+        os.makedirs(args.datadir, exist_ok=True)
+        results = runBenchmarks(os.path.abspath(args.datadir), args.rows, args.columns, args.width, args.newlines, delimiters, cases, args.repeat, args.seed)
+
+    output = {'commit': getCommit(), 'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as filehandler:
+        json.dump(output, filehandler, indent=2)
+    print('[INFO] Results written to: ', args.output)
+
+    if args.compare is not None:
+        with open(args.compare, 'r', encoding='utf-8') as filehandler:
+            compareResults(json.load(filehandler), results)
+
+if __name__ == "__main__":
+    main()
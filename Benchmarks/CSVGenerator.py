@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import random
+'''
+CSVGenerator is a function script that writes deterministic synthetic CSV files for the COTI benchmarks.  The same arguments and seed always
+produce the same bytes, so timings taken on different commits are measured on the same data.
+'''
+
+# Values of the low cardinality columns, similar to the status and currency columns of the installment extracts
+STATUSES = ['OPEN', 'PAID', 'LATE', 'CANCELLED', 'REFUNDED']
+CURRENCIES = ['USD', 'EUR', 'GBP', 'JPY', 'CAD', 'AUD']
+TEXT_CHARACTERS = 'abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+TEXT_POOL_SIZE = 1024 * 1024
+
+def generateCSV(target_file_path, rows=100000, columns=12, field_width=12, quoted_newlines=0.01, delimiter=',', seed=1):
+    ''' Writes a synthetic CSV file.  The columns cycle through an id, a low cardinality status, a currency, an amount, a date and free text fields.
+    Args:
+        target_file_path (String):  Full path of the file to write.
+        rows (Integer):  Number of records after the header.
+        columns (Integer):  Number of columns.
+        field_width (Integer):  Average number of characters of the free text fields.
+        quoted_newlines (Float):  Share of the records whose first text field contains a line break, a delimiter and a quote, so it is written quoted.
+        delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+        seed (Integer):  Seed of the random generator.
+    Returns:
+        (Integer):  Size of the file in bytes.
+    '''
+    rng = random.Random(seed)
+    header = ['Id', 'Status', 'Currency', 'Amount', 'DueDate'] + ['Text' + str(i) for i in range(1, max(columns - 5, 0) + 1)]
+    header = header[:columns]
+
+    # Text fields are slices of one random string, so nearly every value is distinct without drawing every character
+    strPool = ''.join(rng.choices(TEXT_CHARACTERS, k=TEXT_POOL_SIZE))
+    intMaxWidth = max(field_width * 2 - 1, 1)
+
+    with open(target_file_path, 'w', encoding='utf-8', newline='') as filehandler:
+        writer = csv.writer(filehandler, delimiter=delimiter)
+        writer.writerow(header)
+        for i in range(rows):
+            row = [str(i), rng.choice(STATUSES), rng.choice(CURRENCIES), '%.2f' % (rng.random() * 10000), '2020-%02d-%02d' % (rng.randint(1, 12), rng.randint(1, 28))]
+            for j in range(5, columns):
+                intStart = int(rng.random() * (TEXT_POOL_SIZE - intMaxWidth))
+                row.append(strPool[intStart:intStart + 1 + int(rng.random() * intMaxWidth)])
+            row = row[:columns]
+            if columns > 5 and rng.random() < quoted_newlines:
+                row[5] = row[5] + '\n' + delimiter + ' "quoted"'
+            writer.writerow(row)
+        return filehandler.tell()
+
+def main():
+    ''' Main logic for the generator script.
+    '''
+    parser = argparse.ArgumentParser(prog="CSVGenerator", description='Writes a deterministic synthetic CSV file for the COTI benchmarks.')
+    parser.add_argument('-file', required=True, help='Fullpath of the file to write.')
+    parser.add_argument('-rows', type=int, default=100000, help='Number of records after the header.')
+    parser.add_argument('-columns', type=int, default=12, help='Number of columns.')
+    parser.add_argument('-width', type=int, default=12, help='Average number of characters of the free text fields.')
+    parser.add_argument('-newlines', type=float, default=0.01, help='Share of the records with a quoted field that contains a line break.')
+    parser.add_argument('-delimiter', default=',', help='Delimiter used for the csv file.  Use "\\t" for tabs.')
+    parser.add_argument('-seed', type=int, default=1, help='Seed of the random generator.')
+    args = parser.parse_args()
+
+    intBytes = generateCSV(args.file, args.rows, args.columns, args.width, args.newlines, args.delimiter.replace('\\t', '\t'), args.seed)
+    print('[INFO] Generated ' + str(args.rows) + ' records (' + str(intBytes) + ' bytes): ', args.file)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,32 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import copy
+import io
+import os
+import sys
+import time
+import traceback
+from CSVTransform import TRANSFORMS, ColumnError, parseTransform
+from CSVBytes import isByteSafeEncoding
 from CSVOps import *
+from CSVStats import RunStats, timePhase
+from CSVSort import SORT_TYPES, DEFAULT_MEMORY_BUDGET, parseSortKeys
+from CSVDedup import KEEP_OPTIONS
+from CSVAggregate import AGGREGATES, parseAggregates
+from CSVJoin import JOIN_TYPES, parseJoinKeys
+from CSVSelect import PREDICATE_OPERATORS, RowSelection, parsePredicate
+from CSVCache import DEFAULT_CACHE_DIRECTORY, DEFAULT_CACHE_SIZE, ParseCache
+from CSVValidate import DEFAULT_MAX_FIELD_SIZE
+from CSVDecode import DECODE_ERROR_POLICIES, DecodeError
+from CSVFields import FieldSizeError
+from CSVBatch import isBatchPattern, expandFiles, runBatch, summarizeBatch, printBatchSummary, saveBatchSummary
+from CSVWriter import MAX_OPEN_FILES
 from Validator import *
 
 # Global class variables
-OPERATIONS = ['chunk']
+OPERATIONS = ['chunk', 'count', 'index', 'extract', 'scrub', 'explode', 'partition', 'sort', 'dedup', 'aggregate', 'select', 'filter', 'join', 'diff', 'validate']
+MODES = ['stream', 'memory', 'raw']
 
 def main():
     ''' Main logic for the CTI script.
@@ -12,87 +34,678 @@ def main():
     # Example Call: python ./FileSplitter.py --file <File_Full_Path>
     parser = argparse.ArgumentParser(prog="CTI", description='CTI, CSV Terminal Interface, is a script that manipulates / operates on a csv file.')
     parser.add_argument('-operation', help='Select the operation you want to do.  Valid operations are: ' + str(OPERATIONS))
-    parser.add_argument('-file', help='Fullpath of the file to be worked on.')
-    parser.add_argument('-chunksize', help='Size of each chunked file.')
+    parser.add_argument('-file', help='Fullpath of the file to be worked on.  A directory (its .csv, .txt and .tsv files) or a glob pattern (e.g. "C:\\extracts\\*.csv", or "C:\\extracts\\**\\*.csv" to include the sub-directories) runs the operation on every matching file with a pool of -workers processes.')
+    parser.add_argument('-chunksize', help='Size of each chunked file.  For the explode operation, the output is only chunked when -chunksize or -chunkbytes is defined.')
+    parser.add_argument('-chunkbytes', help='Maximum size in bytes of each chunked file, header included.  Each file is closed at a record boundary before it goes over this size.  Can be combined with -chunksize, in which case a file is closed by whichever limit is reached first.')
     parser.add_argument('-encoding', help='Define the encoding of the file.  If nothing is defined then the script will default to utf-8.')
+    parser.add_argument('-decodeerrors', help='What is done with the bytes of the file that are not valid in its encoding.  Valid policies are: ' + str(DECODE_ERROR_POLICIES) + '.  "strict" stops the run at the first one with its byte offset, "replace" reads them as the U+FFFD replacement character, "quarantine" writes the records that hold them, unchanged, to a side file (e.g. file(quarantine).csv) and processes the other records.  If nothing is defined then the script will default to strict.')
+    parser.add_argument('-outencoding', help='Encoding of the files written, when it differs from -encoding (e.g. -encoding=utf-16 -outencoding=utf-8).  The records are transcoded in the same pass.  If nothing is defined then the files are written with -encoding.')
     parser.add_argument('-delimiter', help='Delimiter used for the csv file')
+    parser.add_argument('-mode', help='Select how the csv file is read.  Valid modes are: ' + str(MODES) + '.  "stream" reads and writes the records in one pass without keeping them in memory, "memory" loads the whole file first, "raw" copies the records as byte ranges without parsing them.  If nothing is defined then the script will default to stream.')
+    parser.add_argument('-workers', help='Number of worker processes used by the raw mode and the count, explode, sort, aggregate, diff and validate operations, or by a batch of several files (each file then runs in one process).  If nothing is defined then the script will default to the number of cores.')
+    parser.add_argument('-compact', action='store_true', help='Store the records column by column in a compact form when using -mode=memory.  Repeated values (e.g. status or currency) are kept once, so larger files fit in memory.')
+    parser.add_argument('-cache', action='store_true', help='Open the parsed records from the parse cache when using -mode=memory, without parsing the file.  When the file has no cache file yet, or it changed since the cache file was saved, it is parsed and its cache file is saved for the next runs.')
+    parser.add_argument('-cachedir', help='Directory of the parse cache.  If nothing is defined then the script will default to ' + DEFAULT_CACHE_DIRECTORY + '.')
+    parser.add_argument('-cachesize', help='Total size of the cache files kept in the parse cache directory (e.g. 500MB, 4GB).  The least recently used cache files are deleted first.  If nothing is defined then the script will default to ' + str(DEFAULT_CACHE_SIZE // (1024 * 1024)) + 'MB.')
+    parser.add_argument('-stripnul', action='store_true', help='Remove NUL characters from the records while they are read or copied, without writing a scrubbed copy of the file first.')
+    parser.add_argument('-largefields', action='store_true', help='Read files whose records have fields over the 128KB the csv reader accepts by default (e.g. multi-megabyte free-text fields).  A chunk run that only copies the records (-mode=stream without -transform, -columns, -where, -resume, -decodeerrors or -outencoding) then copies them as byte ranges without parsing them, as -mode=raw does, so memory stays flat whatever the size of a field.  The other operations parse the records with their large fields.')
+    parser.add_argument('-index', action='store_true', help='Use the record index saved next to the file (<file>.idx), building or updating it when needed, to count records and find records or chunks without scanning the file.')
+    parser.add_argument('-resume', action='store_true', help='Keep a manifest of the finished chunks of a stream chunk run next to the chunk files (<file>(chunk-manifest).json), and continue the run from the manifest of a previous run that did not finish:  the chunks it lists are kept and the file is read from the first record after them.  The manifest is only used when the file and the chunk arguments did not change.')
+    parser.add_argument('-pieces', help='Chunks to write with the raw mode, e.g. "4000" or "4000-4010,4020".  If nothing is defined then all the chunks are written.')
+    parser.add_argument('-startrow', help='First record copied by the extract operation, where 1 is the first record after the header.')
+    parser.add_argument('-endrow', help='Last record copied by the extract operation.  If nothing is defined then the records are copied up to the end of the file.')
+    parser.add_argument('-field2split', help='Field split into additional rows by the explode operation.  Value can be the column name or its position using a 0 number counting system (e.g. column1 = 0, column2 = 1, etc.)')
+    parser.add_argument('-fielddelimiter', help='The delimiter separating the list values of -field2split.  Must be encapsulated with quotes.')
+    parser.add_argument('-splitfieldonly', help='Specify if the output of the explode operation should only contain the field split rows - "yes" or "no".  If nothing is defined then the script will default to yes.')
+    parser.add_argument('-transform', action='append', help='Transform applied to each record while it is chunked, exploded, partitioned, sorted, de-duplicated, joined, selected or filtered, in the same pass.  Can be repeated; the transforms are applied in the order they are given.  Valid transforms are: ' + str(TRANSFORMS) + ' (e.g. -transform="concat:DocumentNo:DocumentNo+InstallmentId:-", -transform="replace:Amount:,:.", -transform=trim, -transform="call:myetl.updateDocumentNo").  Columns are names or positions (column1 = 0), lists of columns are separated with "+".')
+    parser.add_argument('-partitionby', help='Column whose value chooses the output file of each record for the partition operation.  Value can be the column name or its position using a 0 number counting system.')
+    parser.add_argument('-buckets', help='Number of buckets the values of -partitionby are hashed into.  If nothing is defined then the partition operation writes one file per distinct value.')
+    parser.add_argument('-maxopen', help='Number of output files the partition operation keeps open at once.  If nothing is defined then the script will default to ' + str(MAX_OPEN_FILES) + '.')
+    parser.add_argument('-sortby', help='Columns the sort operation sorts by, comma separated, each with an optional type: ' + str(SORT_TYPES) + ' (e.g. "DueDate:date,Amount:float,Id:int").  Dates are ISO (2020-12-31) unless a format is given (e.g. "DueDate:date=%%d/%%m/%%Y").  Values that are not valid for their type sort first.')
+    parser.add_argument('-descending', action='store_true', help='Sort from the largest key to the smallest.')
+    parser.add_argument('-dedupby', help='Key columns of the dedup operation, comma separated (e.g. "CompanyCode,DocumentNo").  Values can be the column names or their positions using a 0 number counting system.  If nothing is defined then whole records are compared.')
+    parser.add_argument('-keep', help='Occurrence of each key written by the dedup operation.  Valid options are: ' + str(KEEP_OPTIONS) + '.  If nothing is defined then the script will default to first.')
+    parser.add_argument('-groupby', help='Columns the aggregate operation groups the records by, comma separated (e.g. "CompanyCode,Status").  Values can be the column names or their positions using a 0 number counting system.  If nothing is defined then all the records are aggregated together.')
+    parser.add_argument('-aggregates', help='Aggregates computed by the aggregate operation, comma separated, each with its column: ' + str(AGGREGATES) + ' (e.g. "count,sum:Amount,mean:Amount,max:DueDays").  A count without a column counts the records.  If nothing is defined then the script will default to count.')
+    parser.add_argument('-joinfile', help='Fullpath of the file joined with -file by the join operation (the right file).  It is read with the same encoding and delimiter as -file.')
+    parser.add_argument('-joinon', help='Key columns of the join operation, comma separated, each with an optional right column when the names differ (e.g. "EmployeeId", "CompanyCode,PersonnelNo=EmployeeId").  Values can be the column names or their positions using a 0 number counting system.')
+    parser.add_argument('-jointype', help='Type of the join operation.  Valid join types are: ' + str(JOIN_TYPES) + '.  "left" also writes the records of -file without a match, with blank fields for the -joinfile columns.  If nothing is defined then the script will default to inner.')
+    parser.add_argument('-difffile', help='Fullpath of the new extract compared with -file (the old extract) by the diff operation.  It is read with the same encoding and delimiter as -file.')
+    parser.add_argument('-diffon', help='Key columns of the diff operation, comma separated, each with an optional new column when the names differ (e.g. "DocumentNo", "CompanyCode,DocumentNo=DocNo").  Values can be the column names or their positions using a 0 number counting system.')
+    parser.add_argument('-maxfield', help='Longest field accepted by the validate operation (e.g. 128KB, 1MB).  Longer fields are reported.  If nothing is defined then the script will default to ' + str(DEFAULT_MAX_FIELD_SIZE // 1024) + 'KB, the longest field the csv reader accepts.')
+    parser.add_argument('-columns', help='Columns kept by the select operation (or the chunk and filter operations), comma separated, in the order they are written (e.g. "DocumentNo,Amount,Status").  Values can be the column names or their positions using a 0 number counting system.  The other columns are dropped while the records are read.')
+    parser.add_argument('-where', action='append', help='Predicate a record must match to be kept by the filter operation (or the chunk and select operations).  Can be repeated; a record is kept when it matches all of them.  Valid operators are: ' + str(PREDICATE_OPERATORS) + ' (e.g. -where="Status=PAID|LATE", -where="Amount>=1000", -where="Name~Corp").  = and ~ (contains) accept several values separated with "|".  Records that cannot match are dropped before they are parsed.')
+    parser.add_argument('-memory', help='Memory budget of the records held at once by the sort operation, and of the keys held by the dedup operation (e.g. 512MB, 2GB).  Larger files are sorted in runs spilled to temporary files, and de-duplicated, joined or compared in hash partitions spilled to temporary files.  For the join operation, the budget of the records of the smaller file held in the hash table, and for the diff operation of the records of -file.  If nothing is defined then the script will default to ' + str(DEFAULT_MEMORY_BUDGET // (1024 * 1024)) + 'MB.')
+    parser.add_argument('-tempdir', help='Directory of the temporary files of the sort, dedup, join, diff and validate operations.  If nothing is defined then the system temporary directory is used.')
+    parser.add_argument('-stats', action='store_true', help='Print the runtime metrics of the run when it ends: wall and CPU time per phase, records and bytes read and written, throughput, latency of the chunks, time spent by the writer thread and waiting on it, and peak memory.')
+    parser.add_argument('-statsfile', help='Save the runtime metrics of the run to this JSON file.')
+    parser.add_argument('-profile', help='Profile the run with cProfile and save the statistics to this file.  Slows the run down.')
+    parser.add_argument('-tracemalloc', action='store_true', help='Trace the memory allocations of the run with tracemalloc and print where the most memory was allocated.  Slows the run down.')
     args = parser.parse_args()
 
     # Validate terminal arguments
-    strOperation, strSourceFullFilePath, intChunkSize, strEncoding, strDelimiter = validateArgs(args)
+    args = validateArgs(args)
 
-    # Read CSV File
-    csv = CSVOps(strSourceFullFilePath, strEncoding, strDelimiter)
+    if isBatchPattern(args.file):
+        runBatchFiles(args)
+        return
+
+    stats = None
+    if args.stats or args.statsfile is not None or args.profile is not None or args.tracemalloc:
+        stats = RunStats()
+        stats.startProfiling(args.profile, args.tracemalloc)
+
+    try:
+        csv = runFile(args, stats)
+    except (DecodeError, FieldSizeError) as e:
+        print('[ERROR] ' + str(e))
+        print('[WARNING] Script is exiting...')
+        sys.exit(1)
+
+    if stats is not None:
+        reportStats(stats, csv, args)
+    if csv.getValidationErrorCount():
+        sys.exit(1)
+
+def runFile(args, stats=None):
+    ''' Runs the operation on the source file.
+    Args:
+        args (Namespace):  The validated arguments.
+        stats (RunStats):  Collects the runtime metrics of the run.  None does not collect them.
+    Returns:
+        (CSVOps):  Instance of CSVOps that ran the operation.
+    '''
+    # Read CSV File.  In stream mode only the source file is registered; the records are read by the operation itself.
+    try:
+        cache = ParseCache(args.cachedir, args.cachesize) if args.cache else None
+        csv = CSVOps(args.file, args.encoding, args.delimiter, read_data=(args.mode == 'memory'), compact=args.compact, strip_nul=args.stripnul, stats=stats, selection=args.selection, cache=cache, decode_errors=args.decodeerrors, large_fields=args.largefields)
+    except ColumnError as e:
+        argumentError(str(e))
+
+    if args.index or args.operation == 'index':
+        with timePhase(stats, 'index'):
+            index = csv.getIndex()
+        if index is not None:
+            print('[INFO] Record index: ', index.index_file_path)
 
     # Get final count of records in the file
-    intRecordCount = csv.getCSVLength()
-    print('[INFO] Total CSV Record Count: ', intRecordCount)
+    if csv.isDataLoaded():
+        intRecordCount = csv.getCSVLength()
+        print('[INFO] Total CSV Record Count: ', intRecordCount)
+
+    if args.operation in ['count', 'index']:
+        if not csv.isDataLoaded():
+            with timePhase(stats, 'count'):
+                intRecordCount = csv.getCSVLength(args.workers)
+            print('[INFO] Total CSV Record Count: ', intRecordCount)
+
+    if args.operation == 'chunk':
+        try:
+            with timePhase(stats, 'chunk'):
+                intRecordCount = chunk(csv, args.chunksize, args.outencoding, args.delimiter, args.mode, args.workers, args.chunkbytes, args.pieces, args.transform, args.resume)
+        except ColumnError as e:
+            argumentError(str(e))
+        if not csv.isDataLoaded():
+            print('[INFO] Total CSV Record Count: ', intRecordCount)
+
+    if args.operation in ['select', 'filter']:
+        print('[INFO] Begin CSV ' + args.operation.capitalize() + '...')
+        try:
+            with timePhase(stats, args.operation):
+                intRecordCount = csv.writeFileChunk(args.chunksize, True, args.outencoding, args.delimiter, args.chunkbytes, output_label=args.operation, transforms=args.transform)
+        except ColumnError as e:
+            argumentError(str(e))
+        print('[INFO] Total CSV Record Count: ', intRecordCount)
+        print('[INFO] CSV ' + args.operation + ' is done.')
+
+    if args.selection is not None and args.selection.predicates:
+        print('[INFO] Records dropped by -where: ', args.selection.dropped_count)
+        print('[INFO] Records dropped before they were parsed: ', args.selection.unparsed_count)
+
+    if args.operation == 'extract':
+        with timePhase(stats, 'extract'):
+            csv.writeRowRange(args.startrow, args.endrow)
+
+    if args.operation == 'scrub':
+        with timePhase(stats, 'scrub'):
+            csv.writeScrubbedFile()
+
+    if args.operation == 'explode':
+        print('[INFO] Begin CSV Explode...')
+        try:
+            with timePhase(stats, 'explode'):
+                csv.writeExplodedFile(args.field2split, args.fielddelimiter, args.splitfieldonly, chunk_size=args.chunksize, encoding=args.outencoding, delimiter=args.delimiter, chunk_bytes=args.chunkbytes, workers=args.workers, transforms=args.transform)
+        except ColumnError as e:
+            argumentError(str(e))
+        print('[INFO] CSV explode is done.')
+
+    if args.operation == 'partition':
+        try:
+            with timePhase(stats, 'partition'):
+                intRecordCount = csv.writePartitionedFile(args.partitionby, args.buckets, encoding=args.outencoding, delimiter=args.delimiter, max_open=args.maxopen, transforms=args.transform)
+        except ColumnError as e:
+            argumentError(str(e))
+        print('[INFO] Total CSV Record Count: ', intRecordCount)
+
+    if args.operation == 'sort':
+        print('[INFO] Begin CSV Sort...')
+        try:
+            intRecordCount = csv.writeSortedFile(args.sortby, args.descending, chunk_size=args.chunksize, encoding=args.outencoding, delimiter=args.delimiter, chunk_bytes=args.chunkbytes, memory_budget=args.memory, workers=args.workers, temp_directory=args.tempdir, transforms=args.transform)
+        except ColumnError as e:
+            argumentError(str(e))
+        print('[INFO] Total CSV Record Count: ', intRecordCount)
+        print('[INFO] CSV sort is done.')
+
+    if args.operation == 'dedup':
+        print('[INFO] Begin CSV De-duplication...')
+        try:
+            intRecordCount = csv.writeDedupFile(args.dedupby, args.keep, chunk_size=args.chunksize, encoding=args.outencoding, delimiter=args.delimiter, chunk_bytes=args.chunkbytes, memory_budget=args.memory, temp_directory=args.tempdir, transforms=args.transform)
+        except ColumnError as e:
+            argumentError(str(e))
+        print('[INFO] Total CSV Record Count: ', intRecordCount)
+        print('[INFO] CSV de-duplication is done.')
+
+    if args.operation == 'aggregate':
+        print('[INFO] Begin CSV Aggregate...')
+        try:
+            intGroupCount = csv.writeAggregateFile(args.groupby, args.aggregates, encoding=args.outencoding, delimiter=args.delimiter, workers=args.workers)
+        except ColumnError as e:
+            argumentError(str(e))
+        print('[INFO] Total Group Count: ', intGroupCount)
+        print('[INFO] CSV aggregate is done.')
+
+    if args.operation == 'join':
+        print('[INFO] Begin CSV Join...')
+        try:
+            intRecordCount = csv.writeJoinFile(args.joinfile, args.joinon[0], args.joinon[1], args.jointype, chunk_size=args.chunksize, encoding=args.outencoding, delimiter=args.delimiter, chunk_bytes=args.chunkbytes, memory_budget=args.memory, temp_directory=args.tempdir, transforms=args.transform)
+        except ColumnError as e:
+            argumentError(str(e))
+        print('[INFO] Total CSV Record Count: ', intRecordCount)
+        print('[INFO] CSV join is done.')
+
+    if args.operation == 'diff':
+        print('[INFO] Begin CSV Diff...')
+        try:
+            intRecordCount = csv.writeDiffFile(args.difffile, args.diffon[0], args.diffon[1], chunk_size=args.chunksize, encoding=args.outencoding, delimiter=args.delimiter, chunk_bytes=args.chunkbytes, memory_budget=args.memory, workers=args.workers, temp_directory=args.tempdir)
+        except ColumnError as e:
+            argumentError(str(e))
+        print('[INFO] Total CSV Record Count: ', intRecordCount)
+        print('[INFO] CSV diff is done.')
 
-    if strOperation == 'chunk':
-        chunk(csv, intChunkSize, strEncoding, strDelimiter)
+    if args.operation == 'validate':
+        print('[INFO] Begin CSV Validation...')
+        intRecordCount = csv.validateFile(args.maxfield, workers=args.workers, encoding=args.encoding, delimiter=args.delimiter, temp_directory=args.tempdir)
+        print('[INFO] Total CSV Record Count: ', intRecordCount)
+        if csv.getValidationErrorCount():
+            print('[ERROR] The file has ' + str(csv.getValidationErrorCount()) + ' validation errors.  See the report: ', csv.getWrittenFiles()[-1])
+        print('[INFO] CSV validation is done.')
 
-def chunk(csv, chunk_size, encoding, delimiter):
+    return csv
+
+def runBatchFiles(args):
+    ''' Runs the operation on every file selected by a directory or glob -file argument, with a pool of -workers processes, then reports the batch.  Exits with status 1 when a file failed.
+    Args:
+        args (Namespace):  The validated arguments.
+    '''
+    file_paths = expandFiles(args.file)
+    if not file_paths:
+        argumentError('The -file argument does not match any file.')
+
+    fltStart = time.perf_counter()
+    results = runBatch(runBatchFile, file_paths, args.workers, (args,))
+    summary = summarizeBatch(results, time.perf_counter() - fltStart)
+    print('[INFO] Batch is done.  Files done: ' + str(summary['files_done']) + ', files failed: ' + str(summary['files_failed']))
+
+    if args.stats:
+        printBatchSummary(summary)
+    if args.statsfile is not None:
+        saveBatchSummary(args.statsfile, summary)
+    if summary['files_failed']:
+        sys.exit(1)
+
+def runBatchFile(args, file_path):
+    ''' Runs the operation on one file of a batch, in a worker process.  The output of the run is kept in the result instead of being printed, so the logs of the files running at the same time do not mix.
+    Args:
+        args (Namespace):  The validated arguments.
+        file_path (String):  Full path of the source file.
+    Returns:
+        (Dictionary):  The result of the file (see CSVBatch.runBatch()):  its status, error, log, seconds and metrics.
+    '''
+    args = copy.copy(args)
+    args.file = file_path
+    # The batch already runs one file per core
+    args.workers = 1
+    result = {'status': 'done'}
+    fltStart = time.perf_counter()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        print('[INFO] ---- ' + file_path + ' ----')
+        try:
+            stats = RunStats() if args.stats or args.statsfile is not None else None
+            csv = runFile(args, stats)
+            if stats is not None:
+                result['summary'] = collectStats(stats, csv, args)
+                if args.stats:
+                    stats.printSummary(result['summary'])
+            if csv.getValidationErrorCount():
+                result['status'] = 'failed'
+                result['error'] = str(csv.getValidationErrorCount()) + ' validation errors, see the report: ' + csv.getWrittenFiles()[-1]
+        except SystemExit:
+            # argumentError() exits after printing the error
+            errors = [line for line in log.getvalue().splitlines() if line.startswith('[ERROR]')]
+            result['status'] = 'failed'
+            result['error'] = errors[-1][len('[ERROR] '):].partition('  When calling')[0] if errors else 'The run exited.'
+        except (DecodeError, FieldSizeError) as e:
+            print('[ERROR] ' + str(e))
+            result['status'] = 'failed'
+            result['error'] = str(e)
+        except Exception as e:
+            traceback.print_exc(file=log)
+            result['status'] = 'failed'
+            result['error'] = type(e).__name__ + ': ' + str(e)
+    result['seconds'] = round(time.perf_counter() - fltStart, 4)
+    result['log'] = log.getvalue()
+    return result
+
+def reportStats(stats, csv, args):
+    ''' Completes the runtime metrics with the bytes read and written, then prints and / or saves them.
+    Args:
+        stats (RunStats):  The metrics of the run.
+        csv (CSVOps):  Instance of CSVOps that ran the operation.
+        args (Namespace):  The validated arguments.
+    '''
+    summary = collectStats(stats, csv, args)
+    if args.stats:
+        stats.printSummary(summary)
+    if args.statsfile is not None:
+        stats.save(args.statsfile, summary)
+
+def collectStats(stats, csv, args):
+    ''' Completes the runtime metrics with the bytes read and written and stops the profilers.
+    Args:
+        stats (RunStats):  The metrics of the run.
+        csv (CSVOps):  Instance of CSVOps that ran the operation.
+        args (Namespace):  The validated arguments.
+    Returns:
+        (Dictionary):  The metrics from RunStats.summary().
+    '''
+    # Operations that stream the whole source file (the memory mode already counted its read)
+    if not csv.isDataLoaded() and (args.operation in ['chunk', 'explode', 'scrub', 'partition', 'sort', 'dedup', 'aggregate', 'select', 'filter', 'join', 'diff', 'validate'] or (args.operation == 'count' and not args.index)):
+        stats.count('bytes_read', os.path.getsize(args.file))
+    if csv.getQuarantineCount():
+        stats.count('rows_quarantined', csv.getQuarantineCount())
+    stats.count('files_written', len(csv.getWrittenFiles()))
+    stats.count('bytes_written', sum(os.path.getsize(path) for path in csv.getWrittenFiles() if os.path.exists(path)))
+
+    stats.stopProfiling()
+    return stats.summary()
+
+def chunk(csv, chunk_size, encoding, delimiter, mode='stream', workers=None, chunk_bytes=None, pieces=None, transforms=None, resume=False):
     '''
     Args:
         csv (CSVData):  Instance of CSVOps to operate on the CSV file and its data.
         chunk_size (Integer):  The size of each chunk / batch CSV file to be written.
         encoding (String):  Note: Python's default encoding is ASCII.  This parameter forces default encoding for the writer to be utf-8.
         delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+        mode (String):  How the csv file is read ('stream', 'memory' or 'raw').
+        workers (Integer):  Number of worker processes used by the raw mode.
+        chunk_bytes (Integer):  The maximum size in bytes of each chunk / batch CSV file, header included.
+        pieces (List):  Numbers of the chunks to write with the raw mode.  None writes all the chunks.
+        transforms (List):  RowTransform instances applied to each record before it is written.
+        resume (Boolean):  Defines whether a manifest of the finished chunks is kept, and the run continues from the manifest of a previous run (stream mode).
+    Returns:
+        (Integer):  The number of records that were chunked.
     '''
     print('[INFO] Begin CSV Chunking...')
-    csv.writeFileChunk(chunk_size=chunk_size, encoding=encoding, delimiter=delimiter)
+    if mode == 'raw':
+        intRecordCount = csv.writeFileChunkRaw(chunk_size=chunk_size, workers=workers, chunk_bytes=chunk_bytes, pieces=pieces)
+    else:
+        intRecordCount = csv.writeFileChunk(chunk_size=chunk_size, encoding=encoding, delimiter=delimiter, chunk_bytes=chunk_bytes, transforms=transforms, keep_manifest=resume, resume=resume)
     print('[INFO] CSV chunking is done.')
+    return intRecordCount
+
+def argumentError(message):
+    ''' Prints an argument error and exits the script.
+    Args:
+        message (String):  Description of the error.
+    '''
+    print('[ERROR] ' + message + '  When calling this script, add --help / -h for more details.')
+    print('[WARNING] Script is exiting...')
+    quit()
+
+def positiveIntArg(value, name):
+    ''' Validate an optional argument that must be a positive integer.
+    Args:
+        value (String):  Value of the argument.
+        name (String):  Name of the argument, used in the error message.
+    Returns:
+        (Integer):  The value converted into an integer, or None if the argument was not defined.
+    '''
+    if stringBlankOrNone(value):
+        return None
+    if not isInt(value) or int(value) < 1:
+        argumentError('The -' + name + ' argument must be a positive integer.')
+    return int(value)
+
+def sizeArg(value, name):
+    ''' Validate an optional argument that is a size in bytes, with an optional KB, MB or GB unit.
+    Args:
+        value (String):  Value of the argument (e.g. 512MB).
+        name (String):  Name of the argument, used in the error message.
+    Returns:
+        (Integer):  The size in bytes, or None if the argument was not defined.
+    '''
+    if stringBlankOrNone(value):
+        return None
+    strValue = value.strip().upper()
+    intUnit = 1
+    for strUnit, intBytes in [('KB', 1024), ('MB', 1024 ** 2), ('GB', 1024 ** 3)]:
+        if strValue.endswith(strUnit):
+            strValue = strValue[:-2].strip()
+            intUnit = intBytes
+    if not isInt(strValue) or int(strValue) < 1:
+        argumentError('The -' + name + ' argument must be a positive size in bytes, KB, MB or GB (e.g. 512MB).')
+    return int(strValue) * intUnit
+
+def piecesArg(value):
+    ''' Validate the -pieces argument.
+    Args:
+        value (String):  Comma separated chunk numbers or ranges of chunk numbers (e.g. "4000-4010,4020").
+    Returns:
+        (List):  The chunk numbers in ascending order, or None if the argument was not defined.
+    '''
+    if stringBlankOrNone(value):
+        return None
+    pieces = set()
+    for item in value.split(','):
+        bounds = item.split('-')
+        if len(bounds) > 2 or not all(isInt(bound) and int(bound) >= 1 for bound in bounds):
+            argumentError('The -pieces argument must be chunk numbers or ranges of chunk numbers (e.g. "4000-4010,4020").')
+        pieces.update(range(int(bounds[0]), int(bounds[-1]) + 1))
+    return sorted(pieces)
 
 def validateArgs(input):
     ''' Validate if the arguments have been defined or not.
     Args:
         input (Namespace):  A Namespace object containing attributes parsed out of the command line.  See Python Documentation for more details: https://docs.python.org/3/library/argparse.html?highlight=parse_args#argparse.ArgumentParser.parse_args
     Returns:
-        operation (String):  The operation that the user wants to do.
-        file (String):  Fullpath of the file.
-        chunksize (Integer):  Size of each chunked file.
-        encoding (String):  Define the encoding of the file.  If nothing is defined then the script will default to utf-8.
-        delimiter (String):  Delimiter used for the csv file.  If nothing is defined then the script will default to ','.
+        (Namespace):  The same Namespace with defaults applied and values converted:
+            operation (String):  The operation that the user wants to do.
+            file (String):  Fullpath of the file, or a directory or glob pattern selecting several files.
+            chunksize (Integer):  Size of each chunked file.  None when only -chunkbytes limits the chunks.
+            chunkbytes (Integer):  Maximum size in bytes of each chunked file.  None when the chunks are only limited by chunksize.
+            encoding (String):  Define the encoding of the file.  If nothing is defined then the script will default to utf-8.
+            delimiter (String):  Delimiter used for the csv file.  If nothing is defined then the script will default to ','.
+            decodeerrors (String):  What is done with the bytes that are not valid in the encoding ('strict', 'replace' or 'quarantine').  If nothing is defined then the script will default to 'strict'.
+            outencoding (String):  Encoding of the files written.  If nothing is defined then the script will default to the encoding of the file.
+            mode (String):  How the csv file is read ('stream', 'memory' or 'raw').  If nothing is defined then the script will default to 'stream'.
+            workers (Integer):  Number of worker processes used by the raw mode and the count operation, or by a batch of several files.  None defaults to the number of cores.
+            compact (Boolean):  Whether the records are stored in the compact column form in memory mode.
+            cache (Boolean):  Whether the records are opened from and saved to the parse cache in memory mode.
+            cachedir (String):  Directory of the parse cache.  None uses the default directory.
+            cachesize (Integer):  Total size in bytes of the cache files kept in the parse cache directory.
+            stripnul (Boolean):  Whether NUL characters are removed from the records while they are read or copied.
+            largefields (Boolean):  Whether records with fields over the default limit of the csv reader are read.
+            index (Boolean):  Whether the record index is used.
+            pieces (List):  Numbers of the chunks to write with the raw mode.  None writes all the chunks.
+            resume (Boolean):  Whether the chunk operation keeps a manifest of its finished chunks and continues from the manifest of a previous run.
+            startrow (Integer):  First record copied by the extract operation.
+            endrow (Integer):  Last record copied by the extract operation.  None copies up to the end of the file.
+            field2split (String):  Field split into additional rows by the explode operation.
+            fielddelimiter (String):  The delimiter separating the list values of field2split.
+            splitfieldonly (Boolean):  Whether the explode operation only writes the rows that were split.
+            transform (List):  RowTransform instances built from the -transform arguments.  None when there are none.
+            partitionby (String):  Column choosing the output file of each record for the partition operation.
+            buckets (Integer):  Number of buckets of the partition operation.  None writes one file per distinct value.
+            maxopen (Integer):  Number of output files the partition operation keeps open at once.
+            sortby (List):  (column, type, date format) tuples of the sort operation.
+            descending (Boolean):  Whether the sort operation sorts from the largest key to the smallest.
+            memory (Integer):  Memory budget in bytes of the sort, dedup, join and diff operations.
+            dedupby (List):  Key columns of the dedup operation.  None compares whole records.
+            keep (String):  Occurrence of each key written by the dedup operation.
+            groupby (List):  Columns the aggregate operation groups the records by.
+            aggregates (List):  (function, column) tuples of the aggregate operation.
+            joinfile (String):  Fullpath of the right file of the join operation.
+            joinon (Tuple):  (left columns, right columns) keys of the join operation.
+            jointype (String):  Type of the join operation.
+            difffile (String):  Fullpath of the new file of the diff operation.
+            diffon (Tuple):  (old columns, new columns) keys of the diff operation.
+            maxfield (Integer):  Longest field in characters accepted by the validate operation.
+            columns (List):  Columns kept by the row selection.  None keeps every column.
+            where (List):  (column, operator, values) predicates of the row selection.
+            selection (RowSelection):  The row selection built from columns and where, or None without them.
+            tempdir (String):  Directory of the temporary files.  None uses the system temporary directory.
     '''
-    operation = input.operation
-    file = input.file
-    chunksize = input.chunksize
-    encoding = input.encoding
-    delimiter = input.delimiter
-
-    if stringBlankOrNone(operation):
-        print('[ERROR] The -operation argument cannot be blank.  When calling this script, add --help / -h for more details.')
-        print('[WARNING] Script is exiting...')
-        quit()
+    if stringBlankOrNone(input.operation):
+        argumentError('The -operation argument cannot be blank.')
+    elif str.lower(input.operation) not in OPERATIONS:
+        argumentError('The -operation argument is not valid.  It needs to be at least one of these values: ' + str(OPERATIONS))
+    input.operation = str.lower(input.operation)
+
+    if stringBlankOrNone(input.file):
+        argumentError('The -file argument cannot be blank.')
+    if isBatchPattern(input.file) and (input.profile is not None or input.tracemalloc):
+        argumentError('The -profile and -tracemalloc arguments cannot be used with a directory or glob pattern of several files.')
+
+    if input.operation in ['explode', 'sort', 'dedup', 'select', 'filter', 'join', 'diff']:
+        input.chunkbytes = positiveIntArg(input.chunkbytes, 'chunkbytes')
+        input.chunksize = positiveIntArg(input.chunksize, 'chunksize')
+
+    if input.operation == 'explode':
+        if stringBlankOrNone(input.field2split):
+            argumentError('The -field2split argument cannot be blank for the explode operation.')
+        if input.fielddelimiter is None or input.fielddelimiter == '':
+            argumentError('The -fielddelimiter argument cannot be blank for the explode operation.')
+
+        if stringBlankOrNone(input.splitfieldonly):
+            input.splitfieldonly = 'yes'
+            print('[INFO] No splitfieldonly argument.  Default splitfieldonly used: ', input.splitfieldonly)
+        elif str.lower(input.splitfieldonly) not in ['yes', 'no']:
+            argumentError('The -splitfieldonly argument must be "yes" or "no".')
+        input.splitfieldonly = str.lower(input.splitfieldonly) == 'yes'
+
+    if input.operation == 'chunk':
+        input.chunkbytes = positiveIntArg(input.chunkbytes, 'chunkbytes')
+
+        if stringBlankOrNone(input.chunksize) and input.chunkbytes is not None:
+            input.chunksize = None
+        elif stringBlankOrNone(input.chunksize):
+            input.chunksize = 5000
+            print('[INFO] No chunksize argument.  Default chunksize used: ', input.chunksize)
+        else:
+            input.chunksize = positiveIntArg(input.chunksize, 'chunksize')
+
+    if stringBlankOrNone(input.encoding):
+        input.encoding = 'utf-8'
+        print('[INFO] No encoding argument.  Default Encoding used: ', input.encoding)
+    if stringBlankOrNone(input.outencoding):
+        input.outencoding = input.encoding
+
+    if stringBlankOrNone(input.decodeerrors):
+        input.decodeerrors = 'strict'
+    elif str.lower(input.decodeerrors) not in DECODE_ERROR_POLICIES:
+        argumentError('The -decodeerrors argument is not valid.  It needs to be at least one of these values: ' + str(DECODE_ERROR_POLICIES))
     else:
-        if (str.lower(operation) not in OPERATIONS):
-            print('[ERROR] The -operation argument is not valid.  It needs to be at least one of these values: ' + str(OPERATIONS))
-            print('[WARNING] Script is exiting...')
-            quit()
+        input.decodeerrors = str.lower(input.decodeerrors)
 
-    if stringBlankOrNone(file):
-        print('[ERROR] The -file argument cannot be blank.  When calling this script, add --help / -h for more details.')
-        print('[WARNING] Script is exiting...')
-        quit()
-    
-    if operation == 'chunk':
-        if not isInt(chunksize):
-            print('[ERROR] The -chunksize argument must be an integer.  When calling this script, add --help / -h for more details.')
-            print('[WARNING] Script is exiting...')
-            quit()
+    if stringBlankOrNone(input.delimiter):
+        input.delimiter = ','
+        print('[INFO] No delimiter argument.  Default delimiter used: ', input.delimiter)
+
+    if stringBlankOrNone(input.mode):
+        input.mode = 'stream'
+        print('[INFO] No mode argument.  Default mode used: ', input.mode)
+    elif str.lower(input.mode) not in MODES:
+        argumentError('The -mode argument is not valid.  It needs to be at least one of these values: ' + str(MODES))
+    else:
+        input.mode = str.lower(input.mode)
+
+    if input.mode == 'raw' and not isByteSafeEncoding(input.encoding):
+        argumentError('The raw mode cannot be used with the encoding ' + input.encoding + '.  Use -mode=stream instead.')
+
+    if (input.index or input.operation in ['index', 'extract', 'scrub']) and not isByteSafeEncoding(input.encoding):
+        argumentError('The record index and the extract and scrub operations cannot be used with the encoding ' + input.encoding + '.')
+
+    # The raw mode and the extract and scrub operations copy the records as bytes, and validate reports the invalid bytes itself
+    if (input.mode == 'raw' or input.operation in ['extract', 'scrub', 'validate']) and (input.decodeerrors != 'strict' or input.outencoding != input.encoding):
+        argumentError('The -decodeerrors and -outencoding arguments cannot be used with -mode=raw or the extract, scrub and validate operations, the records are not decoded.')
+
+    if input.compact and input.mode != 'memory':
+        argumentError('The -compact argument can only be used with -mode=memory.')
+
+    if (input.cache or not stringBlankOrNone(input.cachedir) or input.cachesize is not None) and input.mode != 'memory':
+        argumentError('The -cache, -cachedir and -cachesize arguments can only be used with -mode=memory.')
+    input.cachesize = sizeArg(input.cachesize, 'cachesize') or DEFAULT_CACHE_SIZE
+    if stringBlankOrNone(input.cachedir):
+        input.cachedir = None
+    elif os.path.exists(input.cachedir) and not os.path.isdir(input.cachedir):
+        argumentError('The -cachedir argument must be a directory.')
+
+    input.workers = positiveIntArg(input.workers, 'workers')
+
+    input.pieces = piecesArg(input.pieces)
+    if input.pieces is not None and input.mode != 'raw':
+        argumentError('The -pieces argument can only be used with -mode=raw.')
+
+    if input.operation == 'extract':
+        input.startrow = positiveIntArg(input.startrow, 'startrow')
+        input.endrow = positiveIntArg(input.endrow, 'endrow')
+        if input.startrow is None:
+            argumentError('The -startrow argument cannot be blank for the extract operation.')
+        if input.endrow is not None and input.endrow < input.startrow:
+            argumentError('The -endrow argument cannot be smaller than -startrow.')
+
+    if input.operation == 'sort':
+        if stringBlankOrNone(input.sortby):
+            argumentError('The -sortby argument cannot be blank for the sort operation.')
+        try:
+            input.sortby = parseSortKeys(input.sortby)
+        except ValueError as e:
+            argumentError(str(e))
+        if input.mode == 'raw':
+            argumentError('The sort operation cannot be used with -mode=raw, the records need to be parsed.')
+    if input.operation == 'dedup':
+        if stringBlankOrNone(input.dedupby):
+            input.dedupby = None
         else:
-            chunksize = 5000
-            print('[INFO] No chunksize argument.  Default chunksize used: ', chunksize)
-
-    if stringBlankOrNone(encoding):
-        encoding = 'utf-8'
-        print('[INFO] No encoding argument.  Default Encoding used: ', encoding)
-    
-    if stringBlankOrNone(delimiter):
-        delimiter = ','
-        print('[INFO] No delimiter argument.  Default delimiter used: ', delimiter)
-    
-    return operation, file, chunksize, encoding, delimiter
+            input.dedupby = input.dedupby.split(',')
+            if '' in input.dedupby:
+                argumentError('The -dedupby argument has a blank column.')
+        if stringBlankOrNone(input.keep):
+            input.keep = 'first'
+            print('[INFO] No keep argument.  Default keep used: ', input.keep)
+        elif str.lower(input.keep) not in KEEP_OPTIONS:
+            argumentError('The -keep argument is not valid.  It needs to be one of these values: ' + str(KEEP_OPTIONS))
+        input.keep = str.lower(input.keep)
+        if input.mode == 'raw':
+            argumentError('The dedup operation cannot be used with -mode=raw, the records need to be parsed.')
+    if input.operation == 'aggregate':
+        input.groupby = [] if stringBlankOrNone(input.groupby) else input.groupby.split(',')
+        if '' in input.groupby:
+            argumentError('The -groupby argument has a blank column.')
+        if stringBlankOrNone(input.aggregates):
+            input.aggregates = 'count'
+            print('[INFO] No aggregates argument.  Default aggregates used: ', input.aggregates)
+        try:
+            input.aggregates = parseAggregates(input.aggregates)
+        except ValueError as e:
+            argumentError(str(e))
+        if input.mode == 'raw':
+            argumentError('The aggregate operation cannot be used with -mode=raw, the records need to be parsed.')
+    if input.operation == 'join':
+        if stringBlankOrNone(input.joinfile):
+            argumentError('The -joinfile argument cannot be blank for the join operation.')
+        if not os.path.isfile(input.joinfile):
+            argumentError('The -joinfile argument must be an existing file.')
+        if stringBlankOrNone(input.joinon):
+            argumentError('The -joinon argument cannot be blank for the join operation.')
+        try:
+            input.joinon = parseJoinKeys(input.joinon)
+        except ValueError as e:
+            argumentError(str(e))
+        if stringBlankOrNone(input.jointype):
+            input.jointype = 'inner'
+            print('[INFO] No jointype argument.  Default jointype used: ', input.jointype)
+        elif str.lower(input.jointype) not in JOIN_TYPES:
+            argumentError('The -jointype argument is not valid.  It needs to be one of these values: ' + str(JOIN_TYPES))
+        input.jointype = str.lower(input.jointype)
+        if input.mode == 'raw':
+            argumentError('The join operation cannot be used with -mode=raw, the records need to be parsed.')
+    if input.operation == 'diff':
+        if stringBlankOrNone(input.difffile):
+            argumentError('The -difffile argument cannot be blank for the diff operation.')
+        if not os.path.isfile(input.difffile):
+            argumentError('The -difffile argument must be an existing file.')
+        if stringBlankOrNone(input.diffon):
+            argumentError('The -diffon argument cannot be blank for the diff operation.')
+        try:
+            input.diffon = parseJoinKeys(input.diffon)
+        except ValueError as e:
+            argumentError(str(e))
+        if input.mode == 'raw':
+            argumentError('The diff operation cannot be used with -mode=raw, the records need to be parsed.')
+    if input.operation == 'validate':
+        if input.mode != 'stream':
+            argumentError('The validate operation checks the source file itself and can only be used with -mode=stream.')
+        if not isByteSafeEncoding(input.encoding):
+            argumentError('The validate operation cannot be used with the encoding ' + input.encoding + ', the records need to be located at the byte level.')
+    input.maxfield = sizeArg(input.maxfield, 'maxfield') or DEFAULT_MAX_FIELD_SIZE
+    input.memory = sizeArg(input.memory, 'memory') or DEFAULT_MEMORY_BUDGET
+    if not stringBlankOrNone(input.tempdir) and not os.path.isdir(input.tempdir):
+        argumentError('The -tempdir argument must be an existing directory.')
+
+    if input.operation == 'partition':
+        if stringBlankOrNone(input.partitionby):
+            argumentError('The -partitionby argument cannot be blank for the partition operation.')
+        if input.mode == 'raw':
+            argumentError('The partition operation cannot be used with -mode=raw, the records need to be parsed.')
+    input.buckets = positiveIntArg(input.buckets, 'buckets')
+    input.maxopen = positiveIntArg(input.maxopen, 'maxopen') or MAX_OPEN_FILES
+
+    if input.transform is not None:
+        if input.operation not in ['chunk', 'explode', 'partition', 'sort', 'dedup', 'join', 'select', 'filter']:
+            argumentError('The -transform argument can only be used with the chunk, explode, partition, sort, dedup, join, select and filter operations.')
+        if input.mode == 'raw':
+            argumentError('The -transform argument cannot be used with -mode=raw, the records are not parsed.')
+        try:
+            input.transform = [parseTransform(specification) for specification in input.transform]
+        except ValueError as e:
+            argumentError(str(e))
+
+    if input.operation == 'select' and stringBlankOrNone(input.columns):
+        argumentError('The -columns argument cannot be blank for the select operation.')
+    if input.operation == 'filter' and input.where is None:
+        argumentError('The -where argument cannot be blank for the filter operation.')
+    input.selection = None
+    if not stringBlankOrNone(input.columns) or input.where is not None:
+        if input.operation not in ['chunk', 'select', 'filter']:
+            argumentError('The -columns and -where arguments can only be used with the chunk, select and filter operations.')
+        if input.mode == 'raw':
+            argumentError('The -columns and -where arguments cannot be used with -mode=raw, the records are not parsed.')
+        if input.where is not None and input.decodeerrors == 'quarantine':
+            argumentError('The -where argument cannot be used with -decodeerrors=quarantine, the records it drops before they are parsed cannot be quarantined.')
+        input.columns = None if stringBlankOrNone(input.columns) else input.columns.split(',')
+        if input.columns is not None and '' in input.columns:
+            argumentError('The -columns argument has a blank column.')
+        try:
+            input.where = [parsePredicate(specification) for specification in (input.where or [])]
+        except ValueError as e:
+            argumentError(str(e))
+        input.selection = RowSelection(input.columns, input.where)
+
+    # The chunks of a stream run are located in the source file at the byte level, one chunk record per source record
+    if input.resume:
+        if input.operation != 'chunk' or input.mode != 'stream':
+            argumentError('The -resume argument can only be used with the chunk operation and -mode=stream.  Use -pieces to rewrite chunks of -mode=raw.')
+        if not isByteSafeEncoding(input.encoding) or input.where or input.decodeerrors == 'quarantine':
+            argumentError('The -resume argument cannot be used with the encoding ' + input.encoding + ', with -where or with -decodeerrors=quarantine.')
+
+    # Records that are only copied are located and copied as bytes, so a large field is never held in memory
+    if input.largefields and input.operation == 'chunk' and input.mode == 'stream' and isByteSafeEncoding(input.encoding) and input.transform is None and input.selection is None and not input.resume and input.decodeerrors == 'strict' and input.outencoding == input.encoding:
+        input.mode = 'raw'
+        print('[INFO] The records are only copied, so with -largefields they are copied as byte ranges without being parsed (-mode=raw).')
+
+    return input
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+import itertools
+import math
+from operator import itemgetter
+from CSVTransform import resolveColumn
+try:
+    import numpy
+except ImportError:
+    # Optional; without it the batches are aggregated record by record
+    numpy = None
+'''
+CSVAggregate is a function script that computes counts, sums, minimums, maximums and means of columns grouped by other columns, in one
+streaming pass.  The records are taken in batches; with NumPy installed each batch is converted to typed column arrays and grouped and
+reduced with vectorized operations, otherwise the batch is aggregated record by record.
+
+Notes:
+    Only the partial aggregates of each group are kept, so the number of groups (not of records) has to fit in memory.  The partial
+    aggregates of several passes (e.g. worker processes reading ranges of one file) are combined exactly with combine().
+    Integer columns are summed exactly.  Columns with decimals are summed with math.fsum per group and batch, so the float sums do not
+    pick up the rounding errors of adding one record at a time.  Blank values are skipped
+    and values that are not numbers are counted separately, so they never stop a run.
+'''
+
+AGGREGATES = ['count', 'sum', 'min', 'max', 'mean']
+# Number of records converted to column arrays at once
+AGGREGATE_BATCH_SIZE = 65536
+# Largest magnitude of an int64 sum; batches that could go over it are summed with Python integers
+INT64_LIMIT = 2 ** 63
+
+# Number of float partial sums kept per group before they are added together
+FLOAT_PARTIALS = 64
+
+# Positions of the partial aggregates of a value column in the state of a group
+N_INT, INT_SUM, N_FLOAT, FLOAT_SUM, MINIMUM, MAXIMUM, N_OTHER = range(7)
+
+def parseAggregates(specification):
+    ''' Reads the aggregates from their command line form:  comma separated functions, each with the column it applies to.  A count without
+    a column counts the records.
+        e.g. "count,sum:Amount,mean:Amount,max:DueDays"
+    Args:
+        specification (String):  The aggregates in their command line form.
+    Returns:
+        (List):  (function, column) tuples.  The column is None for a count of the records.
+    Raises:
+        ValueError:  The specification is not valid.
+    '''
+    aggregates = []
+    for item in specification.split(','):
+        strFunction, _, column = item.partition(':')
+        strFunction = strFunction.strip().lower()
+        if strFunction not in AGGREGATES:
+            raise ValueError('Unknown aggregate ' + strFunction + '.  Valid aggregates are: ' + str(AGGREGATES))
+        if column == '' and strFunction != 'count':
+            raise ValueError('The ' + strFunction + ' aggregate needs a column (e.g. ' + strFunction + ':Amount).')
+        aggregates.append((strFunction, column or None))
+    return aggregates
+
+def toNumber(value):
+    ''' Converts a field to an integer or a float.
+    Args:
+        value (String):  The field.
+    Returns:
+        (Integer, Float or None):  The number, or None for a blank field.
+    Raises:
+        ValueError:  The field is not a number.
+    '''
+    value = value.strip()
+    if value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def convertColumn(fields):
+    ''' Converts a column of fields to a NumPy array, as integers if they all are, otherwise as floats.  Python's int() and float() parse the
+    fields, which is faster than converting a NumPy string array.
+    Args:
+        fields (List):  The fields.
+    Returns:
+        (Array):  The int64 or float64 array, or None when a field is not a number (or an integer does not fit in int64).
+    '''
+    try:
+        return numpy.fromiter(map(int, fields), numpy.int64, len(fields))
+    except ValueError:
+        pass
+    except OverflowError:
+        # Integers past int64 are summed exactly by the per-value path, not as floats
+        return None
+    try:
+        return numpy.fromiter(map(float, fields), numpy.float64, len(fields))
+    except (ValueError, OverflowError):
+        return None
+
+def addNumbers(stats, count, total, low, high, integers):
+    ''' Adds the numbers of a group in a batch to the partial aggregates of a value column.
+    Args:
+        stats (List):  The partial aggregates of the value column of the group.
+        count (Integer):  Number of numbers.
+        total (Number):  Their sum; with floats, from math.fsum.
+        low, high (Number):  Their minimum and maximum.
+        integers (Boolean):  Defines whether the numbers are integers.
+    '''
+    if integers:
+        stats[N_INT] += count
+        stats[INT_SUM] += total
+    else:
+        stats[N_FLOAT] += count
+        stats[FLOAT_SUM].append(total)
+        if len(stats[FLOAT_SUM]) > FLOAT_PARTIALS:
+            stats[FLOAT_SUM] = [math.fsum(stats[FLOAT_SUM])]
+    if stats[MINIMUM] is None or low < stats[MINIMUM]:
+        stats[MINIMUM] = low
+    if stats[MAXIMUM] is None or high > stats[MAXIMUM]:
+        stats[MAXIMUM] = high
+
+class Aggregator(object):
+    ''' Aggregates records by group.  add() can be called several times; the results cover every record added.
+    '''
+    def __init__(self, header, group_columns, aggregates, batch_size=AGGREGATE_BATCH_SIZE, vectorized=None):
+        ''' Class instantiation method
+        Args:
+            header (List):  The fields of the header record.
+            group_columns (List):  Names or positions of the columns the records are grouped by.  An empty list aggregates all the records together.
+            aggregates (List):  (function, column) tuples from parseAggregates().
+            batch_size (Integer):  Number of records aggregated at once.
+            vectorized (Boolean):  Defines whether the batches are aggregated with NumPy.  Defaults to True when NumPy is installed.
+        '''
+        self.header = header
+        self.group_indexes = [resolveColumn(header, column) for column in (group_columns or [])]
+        self.aggregates = [(strFunction, None if column is None else resolveColumn(header, column)) for strFunction, column in aggregates]
+        self.batch_size = batch_size
+        self.vectorized = numpy is not None if vectorized is None else vectorized and numpy is not None
+        # Columns with an aggregate, in the order they are first used, and whether their values are read as numbers
+        self.value_indexes = []
+        self.numeric = []
+        for strFunction, intColumn in self.aggregates:
+            if intColumn is None:
+                continue
+            if intColumn not in self.value_indexes:
+                self.value_indexes.append(intColumn)
+                self.numeric.append(False)
+            if strFunction != 'count':
+                self.numeric[self.value_indexes.index(intColumn)] = True
+        # Group key (tuple of fields) -> [record count, [N_INT, INT_SUM, N_FLOAT, FLOAT_SUM, MINIMUM, MAXIMUM, N_OTHER] of each value column]
+        self.groups = {}
+        self.__needed = self.group_indexes + self.value_indexes
+        self.__getter = itemgetter(*self.__needed) if self.__needed else None
+
+    def add(self, rows):
+        ''' Aggregates records.
+        Args:
+            rows (Iterable):  The records, each as a list of fields.
+        Returns:
+            (Integer):  The number of records aggregated.
+        '''
+        rows = iter(rows)
+        intCount = 0
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return intCount
+            intCount += len(batch)
+            if self.vectorized:
+                self.__addBatchVectorized(batch)
+            else:
+                self.__addBatch(batch)
+
+    def combine(self, groups):
+        ''' Adds the partial aggregates of another Aggregator with the same settings, e.g. from a worker process.
+        Args:
+            groups (Dictionary):  The groups attribute of the other Aggregator.
+        '''
+        for key, other in groups.items():
+            state = self.__getState(key)
+            state[0] += other[0]
+            for stats, otherStats in zip(state[1], other[1]):
+                for intPosition in (N_INT, INT_SUM, N_FLOAT, FLOAT_SUM, N_OTHER):
+                    stats[intPosition] += otherStats[intPosition]
+                if len(stats[FLOAT_SUM]) > FLOAT_PARTIALS:
+                    stats[FLOAT_SUM] = [math.fsum(stats[FLOAT_SUM])]
+                if otherStats[MINIMUM] is not None and (stats[MINIMUM] is None or otherStats[MINIMUM] < stats[MINIMUM]):
+                    stats[MINIMUM] = otherStats[MINIMUM]
+                if otherStats[MAXIMUM] is not None and (stats[MAXIMUM] is None or otherStats[MAXIMUM] > stats[MAXIMUM]):
+                    stats[MAXIMUM] = otherStats[MAXIMUM]
+
+    def getIgnoredCount(self):
+        ''' Returns the number of values of the summed, minimized, maximized or averaged columns that were not numbers.
+        Returns:
+            (Integer):  The number of values left out of those aggregates.
+        '''
+        return sum(state[1][j][N_OTHER] for state in self.groups.values() for j in range(len(self.value_indexes)) if self.numeric[j])
+
+    def getHeader(self):
+        ''' Returns the header of the results:  the group columns, then one column per aggregate (e.g. sum(Amount)).
+        Returns:
+            (List):  The names of the columns.
+        '''
+        def name(intColumn):
+            return self.header[intColumn] if intColumn < len(self.header) else str(intColumn)
+
+        return [name(i) for i in self.group_indexes] + [strFunction if intColumn is None else strFunction + '(' + name(intColumn) + ')' for strFunction, intColumn in self.aggregates]
+
+    def results(self):
+        ''' Computes the aggregates of each group, in the order the groups first appear in the records.
+        Returns:
+            (Generator):  Yields one record per group:  the group fields, then the aggregates.  An aggregate without any number is blank.
+        '''
+        groups = self.groups
+        if not groups and not self.group_indexes:
+            groups = {(): self.__newState()}
+        for key, state in groups.items():
+            row = list(key)
+            for strFunction, intColumn in self.aggregates:
+                if intColumn is None:
+                    row.append(state[0])
+                    continue
+                stats = state[1][self.value_indexes.index(intColumn)]
+                intNumbers = stats[N_INT] + stats[N_FLOAT]
+                if strFunction == 'count':
+                    row.append(intNumbers + stats[N_OTHER])
+                elif intNumbers == 0:
+                    row.append('')
+                elif strFunction == 'sum':
+                    row.append(math.fsum([stats[INT_SUM]] + stats[FLOAT_SUM]) if stats[N_FLOAT] else stats[INT_SUM])
+                elif strFunction == 'mean':
+                    row.append(math.fsum([stats[INT_SUM]] + stats[FLOAT_SUM]) / intNumbers if stats[N_FLOAT] else stats[INT_SUM] / intNumbers)
+                else:
+                    row.append(stats[MINIMUM] if strFunction == 'min' else stats[MAXIMUM])
+            yield row
+
+    def __newState(self):
+        return [0, [[0, 0, 0, [], None, None, 0] for i in self.value_indexes]]
+
+    def __getState(self, key):
+        ''' Returns the partial aggregates of a group, creating them the first time the group is seen.
+        Args:
+            key (Tuple):  The group fields.
+        Returns:
+            (List):  The state of the group.
+        '''
+        state = self.groups.get(key)
+        if state is None:
+            state = self.groups[key] = self.__newState()
+        return state
+
+    def __pad(self, batch):
+        ''' Adds blank fields to the records of a batch that are too short for the group and value columns.
+        Args:
+            batch (List):  The records.
+        Returns:
+            (List):  The batch, with every record long enough.
+        '''
+        intWidth = max(self.__needed) + 1
+        if min(map(len, batch)) < intWidth:
+            return [row if len(row) >= intWidth else row + [''] * (intWidth - len(row)) for row in batch]
+        return batch
+
+    def __addBatch(self, batch):
+        ''' Aggregates a batch record by record, without NumPy.  The numbers of each group are collected for the whole batch and added like the
+        vectorized path does, so both give the same results.
+        Args:
+            batch (List):  The records.
+        '''
+        intGroups = len(self.group_indexes)
+        numeric = self.numeric
+        if not self.__needed:
+            picked = [()] * len(batch)
+        elif len(self.__needed) == 1:
+            picked = [(value,) for value in map(self.__getter, self.__pad(batch))]
+        else:
+            picked = map(self.__getter, self.__pad(batch))
+
+        # (group key, value column) -> numbers of the batch, and whether each value column only had integers in the batch
+        pending = {}
+        integers = [True] * len(self.value_indexes)
+        for row in picked:
+            key = tuple(row[:intGroups])
+            state = self.__getState(key)
+            state[0] += 1
+            for j, value in enumerate(row[intGroups:]):
+                if not numeric[j]:
+                    if value != '':
+                        state[1][j][N_OTHER] += 1
+                    continue
+                try:
+                    number = toNumber(value)
+                except ValueError:
+                    state[1][j][N_OTHER] += 1
+                    continue
+                if number is None:
+                    continue
+                if integers[j] and not isinstance(number, int):
+                    integers[j] = False
+                numbers = pending.get((key, j))
+                if numbers is None:
+                    numbers = pending[(key, j)] = []
+                numbers.append(number)
+
+        for (key, j), numbers in pending.items():
+            if not integers[j]:
+                numbers = [float(number) for number in numbers]
+            addNumbers(self.groups[key][1][j], len(numbers), sum(numbers) if integers[j] else math.fsum(numbers), min(numbers), max(numbers), integers[j])
+
+    def __addBatchVectorized(self, batch):
+        ''' Aggregates a batch with NumPy:  the group fields are turned into group codes, and each value column is converted to a typed array
+        and reduced per group code.  Only the groups of the batch, not its records, are visited in Python.
+        Args:
+            batch (List):  The records.
+        '''
+        intRows = len(batch)
+        if self.__needed:
+            batch = self.__pad(batch)
+        columns = [list(map(itemgetter(intColumn), batch)) for intColumn in self.__needed]
+        intGroups = len(self.group_indexes)
+        groupCodes, keys = self.__groupCodes(columns[:intGroups], intRows)
+
+        states = [self.__getState(key) for key in keys]
+        for state, intCount in zip(states, numpy.bincount(groupCodes, minlength=len(keys)).tolist()):
+            state[0] += intCount
+
+        for j, column in enumerate(columns[intGroups:]):
+            if not self.numeric[j]:
+                for intGroup, intCount in enumerate(numpy.bincount(groupCodes[numpy.array(column) != ''], minlength=len(keys)).tolist()):
+                    states[intGroup][1][j][N_OTHER] += intCount
+                continue
+
+            numbers, mask, otherMask = self.__toNumbers(column)
+            if otherMask is not None:
+                for intGroup, intCount in enumerate(numpy.bincount(groupCodes[otherMask], minlength=len(keys)).tolist()):
+                    states[intGroup][1][j][N_OTHER] += intCount
+            if numbers.size == 0:
+                continue
+            codes = groupCodes if mask is None else groupCodes[mask]
+
+            order = numpy.argsort(codes, kind='stable')
+            codes = codes[order]
+            numbers = numbers[order]
+            starts = numpy.flatnonzero(numpy.concatenate(([True], codes[1:] != codes[:-1])))
+            blnInt = numbers.dtype.kind in 'iO'
+            if numbers.dtype.kind == 'i' and max(abs(int(numbers.max())), abs(int(numbers.min()))) * len(numbers) >= INT64_LIMIT:
+                numbers = numbers.astype(object)
+            counts = numpy.diff(numpy.append(starts, len(numbers)))
+            if blnInt:
+                totals = numpy.add.reduceat(numbers, starts).tolist()
+            else:
+                # Each group is summed with math.fsum so the float sums do not depend on the order of the records
+                values = numbers.tolist()
+                bounds = starts.tolist() + [len(values)]
+                totals = [math.fsum(values[intStart:intEnd]) for intStart, intEnd in zip(bounds, bounds[1:])]
+            reduced = zip(codes[starts].tolist(), counts.tolist(), totals, numpy.minimum.reduceat(numbers, starts).tolist(), numpy.maximum.reduceat(numbers, starts).tolist())
+            for intGroup, intCount, total, low, high in reduced:
+                addNumbers(states[intGroup][1][j], intCount, total, low, high, blnInt)
+
+    def __groupCodes(self, groupColumns, rows):
+        ''' Numbers the groups of a batch in the order they first appear.
+        Args:
+            groupColumns (List):  The fields of each group column.
+            rows (Integer):  Number of records of the batch.
+        Returns:
+            (Tuple):  The group code of each record (array), and the key of each group code (list of tuples).
+        '''
+        if not groupColumns:
+            return numpy.zeros(rows, dtype=numpy.intp), [()]
+
+        uniques = []
+        codes = []
+        for column in groupColumns:
+            unique, inverse = numpy.unique(numpy.array(column), return_inverse=True)
+            uniques.append(unique.tolist())
+            codes.append(inverse.reshape(-1))
+        if len(codes) == 1:
+            combined, first, inverse = numpy.unique(codes[0], return_index=True, return_inverse=True)
+            keys = [(uniques[0][intCode],) for intCode in combined.tolist()]
+        else:
+            combined, first, inverse = numpy.unique(numpy.column_stack(codes), axis=0, return_index=True, return_inverse=True)
+            keys = [tuple(uniques[j][intCode] for j, intCode in enumerate(row)) for row in combined.tolist()]
+
+        # numpy.unique sorts the groups; they are renumbered by their first record so new groups are added in source order
+        order = numpy.argsort(first)
+        rank = numpy.empty_like(order)
+        rank[order] = numpy.arange(len(order))
+        return rank[inverse.reshape(-1)], [keys[i] for i in order.tolist()]
+
+    def __toNumbers(self, column):
+        ''' Converts a column of fields to numbers.
+        Args:
+            column (List):  The fields.
+        Returns:
+            (Tuple):  The numbers (an int64 array when every number is an integer, otherwise float64), the mask of the records they belong to
+            (None for every record), and the mask of the records whose field is not a number (None when there are none).
+        '''
+        numbers = convertColumn(column)
+        if numbers is not None:
+            return numbers, None, None
+
+        values = numpy.char.strip(numpy.array(column))
+        mask = values != ''
+        numbers = convertColumn(values[mask].tolist())
+        if numbers is not None:
+            return numbers, mask, None
+
+        # Fields that are not numbers, or integers too large for int64:  converted one at a time
+        numbers = []
+        for intRow in numpy.flatnonzero(mask).tolist():
+            try:
+                numbers.append(toNumber(str(values[intRow])))
+            except ValueError:
+                mask[intRow] = False
+                numbers.append(None)
+        otherMask = (values != '') & ~mask
+        numbers = [number for number in numbers if number is not None]
+        if any(isinstance(number, float) for number in numbers):
+            return numpy.array(numbers, dtype=numpy.float64), mask, otherMask
+        try:
+            return numpy.array(numbers, dtype=numpy.int64), mask, otherMask
+        except OverflowError:
+            return numpy.array(numbers, dtype=object), mask, otherMask
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+'''
+CSVBatch is a function script that runs a COTI operation over many source files (e.g. every extract dropped in a directory) with a pool
+of worker processes.  The files are handed out from the largest to the smallest, so the large files start first and the small ones fill
+the gaps at the end, and each file reports its own progress and result.
+
+Notes:
+    A file that fails (an invalid column, a bad record, or even a worker process that dies) is reported as failed and the batch carries on
+    with the other files.  When a worker process dies, the files that were running are run again one at a time, each in a new pool of
+    its own, and the other files carry on in a new pool.
+'''
+
+# Characters that make a -file argument a glob pattern instead of a file name
+GLOB_CHARACTERS = '*?['
+# Extensions of the files read from a directory
+BATCH_EXTENSIONS = ['.csv', '.txt', '.tsv']
+# Name of an output file of COTI:  the name of its source file with the chunk, partition or operation in brackets (e.g. file(12).csv)
+OUTPUT_NAME_PATTERN = re.compile(r'^(.*)\(.*\)(\.[^.]*)$')
+
+def isBatchPattern(file_pattern):
+    ''' Returns whether a -file argument selects several files:  a directory, or a glob pattern that is not the name of a file.
+    Args:
+        file_pattern (String):  The -file argument.
+    Returns:
+        (Boolean):  True for a directory or a glob pattern.
+    '''
+    if os.path.isdir(file_pattern):
+        return True
+    return not os.path.isfile(file_pattern) and any(character in file_pattern for character in GLOB_CHARACTERS)
+
+def expandFiles(file_pattern):
+    r''' Lists the source files selected by a -file argument.
+    Args:
+        file_pattern (String):  A file, a directory (its files with one of BATCH_EXTENSIONS, not its sub-directories) or a glob pattern (e.g. C:\extracts\*.csv, or C:\extracts\**\*.csv for the sub-directories too).
+    Returns:
+        (List):  Full paths of the files, sorted by name.  The output files of a previous run (e.g. file(12).csv next to file.csv) are left out when their source file is selected too.
+    '''
+    if os.path.isdir(file_pattern):
+        paths = [entry.path for entry in os.scandir(file_pattern) if entry.is_file() and os.path.splitext(entry.name)[1].lower() in BATCH_EXTENSIONS]
+    elif isBatchPattern(file_pattern):
+        paths = [path for path in glob.glob(file_pattern, recursive=True) if os.path.isfile(path)]
+    else:
+        return [file_pattern]
+
+    selected = set(paths)
+    for path in list(paths):
+        match = OUTPUT_NAME_PATTERN.match(os.path.basename(path))
+        if match is not None and os.path.join(os.path.dirname(path), match.group(1) + match.group(2)) in selected:
+            paths.remove(path)
+    return sorted(paths)
+
+def runBatch(job, file_paths, workers=None, arguments=()):
+    ''' Runs a job on each file with a pool of worker processes, printing the log and the result of each file as it finishes.
+    Args:
+        job (Callable):  Module level function called as job(*arguments, file_path) in a worker process.  It returns a result dictionary with at least a 'status' ('done' or 'failed'), and optionally an 'error', a 'log' printed when the file finishes, and a 'summary' of its metrics.
+        file_paths (List):  Full paths of the files.
+        workers (Integer):  Number of worker processes.  Defaults to the number of cores.
+        arguments (Tuple):  Arguments passed to the job before the file path.
+    Returns:
+        (List):  The result of each file, in the order of file_paths, completed with its 'file', 'bytes' and 'seconds'.
+    '''
+    # Largest files first, so the pool does not end waiting on a large file started last
+    sizes = {path: os.path.getsize(path) for path in file_paths}
+    pending = sorted(set(file_paths), key=lambda path: sizes[path], reverse=True)
+    intWorkers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    progress = {'files': 0, 'bytes': 0, 'total_files': len(pending), 'total_bytes': sum(sizes[path] for path in pending)}
+    results = {}
+    print('[INFO] Batch of ' + str(len(pending)) + ' files (' + formatSize(progress['total_bytes']) + ') with ' + str(intWorkers) + ' worker processes.')
+
+    while pending:
+        crashed = runPool(job, pending, intWorkers, arguments, sizes, progress, results)
+        for path in crashed:
+            # Alone in its pool, a file that kills its worker process again only fails itself
+            print('[WARNING] A worker process died.  Running again on its own: ', path)
+            runPool(job, [path], 1, arguments, sizes, progress, results, retry=False)
+    return [results[path] for path in file_paths]
+
+def runPool(job, pending, workers, arguments, sizes, progress, results, retry=True):
+    ''' Runs files of a batch in one process pool.  Only as many files as there are workers are handed to the pool at once, so a worker process that dies only interrupts the files that were running.
+    Args:
+        job (Callable):  The job of runBatch().
+        pending (List):  Full paths of the files still to run, in the order they are handed out.  The files are removed from it as they are handed out.
+        workers (Integer):  Number of worker processes.
+        arguments (Tuple):  Arguments passed to the job before the file path.
+        sizes (Dictionary):  Size in bytes of each file.
+        progress (Dictionary):  Files and bytes finished so far, and their totals.  Updated as files finish.
+        results (Dictionary):  Result of each finished file.  Updated as files finish.
+        retry (Boolean):  Defines whether the files interrupted by a dead worker process are returned to be run again, instead of failing.
+    Returns:
+        (List):  The files interrupted by a dead worker process, to be run again.  The pool stops handing out files when a worker process dies.
+    '''
+    running = {}
+    crashed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while (pending or running) and not crashed:
+            while pending and len(running) < workers:
+                path = pending.pop(0)
+                running[executor.submit(job, *arguments, path)] = (path, time.perf_counter())
+            done, notDone = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, fltStart = running.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    if retry:
+                        crashed.append(path)
+                        continue
+                    result = {'status': 'failed', 'error': 'The worker process died: ' + str(e)}
+                except Exception as e:
+                    result = {'status': 'failed', 'error': type(e).__name__ + ': ' + str(e)}
+                result['file'] = path
+                result['bytes'] = sizes[path]
+                result.setdefault('seconds', round(time.perf_counter() - fltStart, 4))
+                results[path] = result
+                reportFile(result, progress)
+    # The files still running when a worker process died were interrupted too
+    return crashed + [path for path, fltStart in running.values()]
+
+def reportFile(result, progress):
+    ''' Prints the log of a finished file and the progress of the batch.
+    Args:
+        result (Dictionary):  The result of the file.
+        progress (Dictionary):  Files and bytes finished so far, and their totals.
+    '''
+    progress['files'] += 1
+    progress['bytes'] += result['bytes']
+    if result.get('log'):
+        print(result['log'].rstrip('\n'))
+    strProgress = '[' + str(progress['files']) + '/' + str(progress['total_files']) + ' files, ' + formatSize(progress['bytes']) + '/' + formatSize(progress['total_bytes']) + ']'
+    if result['status'] == 'done':
+        print('[INFO] ' + strProgress + ' Done in %.2f s: ' % result['seconds'] + result['file'])
+    else:
+        print('[ERROR] ' + strProgress + ' Failed: ' + result['file'] + '  ' + str(result.get('error')))
+
+def summarizeBatch(results, seconds):
+    ''' Builds the aggregate metrics of a batch from the results of its files.
+    Args:
+        results (List):  The results from runBatch().
+        seconds (Float):  Wall time of the batch.
+    Returns:
+        (Dictionary):  The metrics of the batch and of each file, ready to be saved as JSON.  Counters of the files (records, bytes written...) are added up.
+    '''
+    counters = {}
+    for result in results:
+        for name, value in (result.get('summary') or {}).get('counters', {}).items():
+            if not name.endswith('_per_second') and isinstance(value, (int, float)):
+                counters[name] = counters.get(name, 0) + value
+    intBytes = sum(result['bytes'] for result in results)
+    return {
+        'seconds': round(seconds, 4),
+        'files': len(results),
+        'files_done': sum(1 for result in results if result['status'] == 'done'),
+        'files_failed': sum(1 for result in results if result['status'] != 'done'),
+        'bytes_read': intBytes,
+        'mb_read_per_second': round(intBytes / (1024 * 1024) / seconds, 2) if seconds > 0 else None,
+        'file_seconds': round(sum(result['seconds'] for result in results), 4),
+        'counters': {name: round(value, 4) if isinstance(value, float) else value for name, value in counters.items()},
+        'failed': [{'file': result['file'], 'error': result.get('error')} for result in results if result['status'] != 'done'],
+        'results': [{key: value for key, value in result.items() if key != 'log'} for result in results],
+    }
+
+def printBatchSummary(summary):
+    ''' Prints the aggregate metrics of a batch.
+    Args:
+        summary (Dictionary):  Metrics from summarizeBatch().
+    '''
+    print('[STATS] Batch: %d files, %d done, %d failed in %.3f s wall (%.3f s of file runs), %s MB/s read' % (summary['files'], summary['files_done'], summary['files_failed'], summary['seconds'], summary['file_seconds'], summary['mb_read_per_second']))
+    for name, value in summary['counters'].items():
+        print('[STATS] %-28s %s' % (name, value))
+    slowest = sorted(summary['results'], key=lambda result: result['seconds'], reverse=True)[:5]
+    for result in slowest:
+        print('[STATS] Slow file %10.3f s  %s' % (result['seconds'], result['file']))
+    for failure in summary['failed']:
+        print('[STATS] Failed: %s  %s' % (failure['file'], failure['error']))
+
+def saveBatchSummary(stats_file_path, summary):
+    ''' Writes the metrics of a batch to a JSON file.
+    Args:
+        stats_file_path (String):  Full path of the file.
+        summary (Dictionary):  Metrics from summarizeBatch().
+    '''
+    with open(stats_file_path, 'w', encoding='utf-8') as filehandler:
+        json.dump(summary, filehandler, indent=2)
+    print('[STATS] Stats saved to: ', stats_file_path)
+
+def formatSize(intBytes):
+    ''' Formats a number of bytes for the progress messages.
+    Args:
+        intBytes (Integer):  Number of bytes.
+    Returns:
+        (String):  The size in KB, MB or GB.
+    '''
+    for strUnit, intSize in [('GB', 1024 ** 3), ('MB', 1024 ** 2)]:
+        if intBytes >= intSize:
+            return '%.1f %s' % (intBytes / intSize, strUnit)
+    return '%.1f KB' % (intBytes / 1024)
@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+import codecs
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+'''
+CSVBytes is a function script that works on the raw bytes of a CSV file.  Record boundaries are found by tracking the quote state of each
+line feed, so records are located and copied without being decoded or parsed into fields.
+
+Notes:
+    A record ends at a line feed (\\n) that is outside of a quoted field.  Quote state is tracked by counting quote characters, so an escaped
+    quote ("") leaves the state unchanged.  This only holds for encodings where quotes and line feeds are single ASCII bytes (see isByteSafeEncoding).
+'''
+
+# Size of the blocks read from the source file
+BLOCK_SIZE = 8 * 1024 * 1024
+# Size of the buffer used when the operating system cannot copy between files directly
+COPY_BUFFER_SIZE = 1024 * 1024
+# Smallest range of bytes given to a worker process when a file is scanned in parallel
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+QUOTE = b'"'
+NEWLINE = b'\n'
+NUL = b'\x00'
+
+def isByteSafeEncoding(encoding):
+    ''' Check if quotes and line feeds are encoded as single ASCII bytes that cannot appear inside another character (e.g. utf-8, latin-1, cp1252).
+    Args:
+        encoding (String):  Name of the encoding.
+    Returns:
+        (Boolean):  True if the record boundaries of a file in this encoding can be found at the byte level.
+    '''
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return False
+
+    if name.startswith('utf-16') or name.startswith('utf-32'):
+        return False
+
+    try:
+        return '"\r\n'.encode(encoding) == b'"\r\n'
+    except UnicodeError:
+        return False
+
+def scanBlock(block, in_quotes=False):
+    ''' Counts the record terminators in a block of bytes.
+    Args:
+        block (Bytes):  The block of bytes to scan.
+        in_quotes (Boolean):  Whether the block starts inside a quoted field.
+    Returns:
+        count (Integer):  The number of line feeds that are outside of quoted fields.
+        in_quotes (Boolean):  Whether the block ends inside a quoted field.
+    '''
+    if not in_quotes and QUOTE not in block:
+        return block.count(NEWLINE), False
+
+    # Splitting on the quotes leaves the quoted text at every other index, so the quoted line feeds can be counted without a python level loop.
+    parts = block.split(QUOTE)
+    quoted = parts[0::2] if in_quotes else parts[1::2]
+    intQuotedNewlines = b''.join(quoted).count(NEWLINE)
+
+    return block.count(NEWLINE) - intQuotedNewlines, in_quotes ^ bool((len(parts) - 1) & 1)
+
+def findNewline(block, start, newlines):
+    ''' Finds the offset right after the n-th line feed from a position, ignoring quotes.  Short distances are walked with find(), longer ones
+    are doubled until they hold enough line feeds and then narrowed down with a binary search, so the work stays close to the number of bytes skipped.
+    Args:
+        block (Bytes):  The block of bytes to search.
+        start (Integer):  Offset within the block to search from.
+        newlines (Integer):  Number of line feeds to move past.
+    Returns:
+        (Integer):  Offset right after the n-th line feed, or -1 if the block does not hold that many.
+    '''
+    if newlines <= 256:
+        intPosition = start
+        for i in range(newlines):
+            intPosition = block.find(NEWLINE, intPosition) + 1
+            if intPosition == 0:
+                return -1
+        return intPosition
+
+    intLow = start
+    intCountLow = 0
+    intWindow = newlines * 64
+    while True:
+        intHigh = min(intLow + intWindow, len(block))
+        intCountHigh = intCountLow + block.count(NEWLINE, intLow, intHigh)
+        if intCountHigh >= newlines:
+            break
+        if intHigh == len(block):
+            return -1
+        intLow, intCountLow = intHigh, intCountHigh
+        intWindow *= 2
+
+    # Smallest offset holding the n-th line feed before it
+    while intLow < intHigh:
+        intMiddle = (intLow + intHigh) // 2
+        intCountMiddle = intCountLow + block.count(NEWLINE, intLow, intMiddle)
+        if intCountMiddle >= newlines:
+            intHigh = intMiddle
+        else:
+            intLow = intMiddle + 1
+            intCountLow = intCountMiddle + (block[intMiddle] == NEWLINE[0])
+    return intLow
+
+def findRecordEnd(block, start, records, in_quotes=False):
+    ''' Finds the offset right after the n-th record terminator from a position.
+    Args:
+        block (Bytes):  The block of bytes to search.
+        start (Integer):  Offset within the block to search from.
+        records (Integer):  Number of records to move past.
+        in_quotes (Boolean):  Whether start is inside a quoted field.
+    Returns:
+        (Integer):  Offset right after the n-th record terminator, or -1 if the block does not hold that many.
+
+    Notes:
+        The quote state right after a record terminator is always outside of quotes.
+    '''
+    intPosition = start
+    intRemaining = records
+    while intRemaining > 0:
+        # Move past as many line feeds as records are missing, then count how many of them really ended a record
+        intNext = findNewline(block, intPosition, intRemaining)
+        if intNext == -1:
+            return -1
+        intCount, in_quotes = scanBlock(block[intPosition:intNext], in_quotes)
+        intRemaining -= intCount
+        intPosition = intNext
+    return intPosition
+
+def lastRecordEnd(block, in_quotes_after):
+    ''' Finds the offset right after the last record terminator in a block of bytes.
+    Args:
+        block (Bytes):  The block of bytes to scan.
+        in_quotes_after (Boolean):  Whether the block ends inside a quoted field, as returned by scanBlock().
+    Returns:
+        (Integer):  Offset within the block right after the last record terminator, or -1 if the block does not contain one.
+    '''
+    intEnd = len(block)
+    blnInQuotes = in_quotes_after
+    intPosition = block.rfind(NEWLINE)
+    while intPosition != -1:
+        # Walk backwards and undo the quotes that follow the line feed to get the quote state at the line feed.
+        blnInQuotes ^= bool(block.count(QUOTE, intPosition, intEnd) & 1)
+        if not blnInQuotes:
+            return intPosition + 1
+        intEnd = intPosition
+        intPosition = block.rfind(NEWLINE, 0, intPosition)
+    return -1
+
+class RecordLocator(object):
+    ''' Walks forward over the records of a CSV file in large blocks and reports the byte offset where each record ends.
+    '''
+    def __init__(self, source_file_path, start_offset=0, in_quotes=False, block_size=BLOCK_SIZE):
+        ''' Class instantiation method
+        Args:
+            source_file_path (String):  Contains the full file path and file name of the source file.
+            start_offset (Integer):  Byte offset of a record start to begin from.  Defaults to the beginning of the file.
+            in_quotes (Boolean):  Whether start_offset is inside a quoted field.
+            block_size (Integer):  Number of bytes read at a time.
+        '''
+        self.offset = start_offset
+        # Start of the last record when it does not end with a line feed, once the end of the file is reached
+        self.unterminated_offset = None
+        self.__filehandler = open(source_file_path, 'rb')
+        self.__filehandler.seek(start_offset)
+        self.__block_size = block_size
+        self.__block = b''
+        self.__block_base = start_offset
+        self.__block_position = 0
+        self.__block_records = 0
+        self.__block_in_quotes_after = in_quotes
+        self.__in_quotes = in_quotes
+        self.__eof = False
+
+    def close(self):
+        ''' Closes the source file.
+        '''
+        self.__filehandler.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def skipRecords(self, records):
+        ''' Moves past a number of records.  Afterwards, offset points right after the last record that was skipped.
+        Args:
+            records (Integer):  Number of records to skip.
+        Returns:
+            (Integer):  Number of records actually skipped.  Less than records when the end of the file is reached.
+        '''
+        intSkipped = 0
+        while intSkipped < records:
+            intNeeded = records - intSkipped
+
+            if self.__block_records >= intNeeded:
+                # The current block holds the last record to skip
+                self.__block_position = findRecordEnd(self.__block, self.__block_position, intNeeded, self.__in_quotes)
+                self.__block_records -= intNeeded
+                self.__in_quotes = False
+                self.offset = self.__block_base + self.__block_position
+                intSkipped += intNeeded
+                continue
+
+            if self.__block_records > 0:
+                # Skip the rest of the block, only its last record end is needed
+                intSkipped += self.__block_records
+                self.offset = self.__block_base + lastRecordEnd(self.__block, self.__block_in_quotes_after)
+            self.__in_quotes = self.__block_in_quotes_after
+
+            if self.__eof:
+                break
+
+            self.__block_base += len(self.__block)
+            self.__block = self.__filehandler.read(self.__block_size)
+            self.__block_position = 0
+            self.__block_records, self.__block_in_quotes_after = scanBlock(self.__block, self.__in_quotes)
+
+            if not self.__block:
+                self.__eof = True
+                # A last record without a line feed is still a record
+                if self.offset < self.__block_base:
+                    self.unterminated_offset = self.offset
+                    self.offset = self.__block_base
+                    intSkipped += 1
+
+        return intSkipped
+
+def findChunkOffsets(source_file_path, chunk_size, start_offset=0):
+    ''' Finds the byte offsets that split a CSV file into chunks of chunk_size records.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        chunk_size (Integer):  The number of records in each chunk.
+        start_offset (Integer):  Byte offset of the first record to chunk (e.g. right after the header).
+    Returns:
+        offsets (List):  Offsets where each chunk starts, followed by the offset where the last chunk ends.
+        record_count (Integer):  The number of records after start_offset.
+    '''
+    offsets = [start_offset]
+    intRecordCount = 0
+    with RecordLocator(source_file_path, start_offset) as locator:
+        while True:
+            intSkipped = locator.skipRecords(chunk_size)
+            if intSkipped == 0:
+                break
+            intRecordCount += intSkipped
+            offsets.append(locator.offset)
+    return offsets, intRecordCount
+
+def findByteChunkOffsets(source_file_path, chunk_bytes, chunk_size=None, start_offset=0, block_size=BLOCK_SIZE):
+    ''' Finds the byte offsets that split a CSV file into chunks of at most chunk_bytes bytes, always at a record boundary.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        chunk_bytes (Integer):  The maximum number of bytes of records in each chunk.
+        chunk_size (Integer):  The maximum number of records in each chunk.  None to only limit by bytes.
+        start_offset (Integer):  Byte offset of the first record to chunk (e.g. right after the header).
+        block_size (Integer):  Number of bytes read at a time.
+    Returns:
+        offsets (List):  Offsets where each chunk starts, followed by the offset where the last chunk ends.
+        record_count (Integer):  The number of records after start_offset.
+
+    Notes:
+        A record that is larger than chunk_bytes on its own is put in a chunk of its own.
+    '''
+    offsets = [start_offset]
+    intRecordCount = 0
+    intFileSize = os.path.getsize(source_file_path)
+    intStart = start_offset
+
+    with open(source_file_path, 'rb') as filehandler:
+        while intStart < intFileSize:
+            intTarget = min(intStart + max(chunk_bytes, 0), intFileSize)
+
+            # Count the records up to the byte limit and get the quote state there
+            filehandler.seek(intStart)
+            intRecords = 0
+            blnInQuotes = False
+            intPosition = intStart
+            while intPosition < intTarget:
+                block = filehandler.read(min(block_size, intTarget - intPosition))
+                intCount, blnInQuotes = scanBlock(block, blnInQuotes)
+                intRecords += intCount
+                intPosition += len(block)
+
+            if intTarget == intFileSize:
+                intEnd = intFileSize
+                filehandler.seek(intFileSize - 1)
+                # A last record without a line feed is still a record
+                if blnInQuotes or filehandler.read(1) != NEWLINE:
+                    intRecords += 1
+            else:
+                # Walk back from the limit to the last record terminator
+                intEnd = -1
+                intBlockEnd = intTarget
+                while intBlockEnd > intStart:
+                    intBlockStart = max(intStart, intBlockEnd - block_size)
+                    filehandler.seek(intBlockStart)
+                    block = filehandler.read(intBlockEnd - intBlockStart)
+                    intRecordEnd = lastRecordEnd(block, blnInQuotes)
+                    if intRecordEnd != -1:
+                        intEnd = intBlockStart + intRecordEnd
+                        break
+                    blnInQuotes ^= bool(block.count(QUOTE) & 1)
+                    intBlockEnd = intBlockStart
+
+                if intEnd == -1:
+                    # A single record is larger than the limit
+                    with RecordLocator(source_file_path, intStart, block_size=block_size) as locator:
+                        intRecords = locator.skipRecords(1)
+                        intEnd = locator.offset
+
+            if chunk_size is not None and intRecords > chunk_size:
+                with RecordLocator(source_file_path, intStart, block_size=block_size) as locator:
+                    intRecords = locator.skipRecords(chunk_size)
+                    intEnd = locator.offset
+
+            intRecordCount += intRecords
+            offsets.append(intEnd)
+            intStart = intEnd
+
+    return offsets, intRecordCount
+
+def scanRange(source_file_path, start, end, block_size=BLOCK_SIZE):
+    ''' Scans a range of bytes of a CSV file for the counts that are needed to combine it with the ranges before it.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        start (Integer):  Offset of the first byte of the range.
+        end (Integer):  Offset right after the last byte of the range.
+        block_size (Integer):  Number of bytes read at a time.
+    Returns:
+        records (Integer):  The number of record terminators, assuming the range starts outside of quotes.
+        newlines (Integer):  The number of line feeds.
+        odd_quotes (Boolean):  Whether the range holds an odd number of quotes.
+
+    Notes:
+        If the range actually starts inside a quoted field, every line feed flips between quoted and not quoted, so the number of record
+        terminators is newlines - records.
+    '''
+    intRecords = 0
+    intNewlines = 0
+    blnInQuotes = False
+    with open(source_file_path, 'rb') as filehandler:
+        filehandler.seek(start)
+        intPosition = start
+        while intPosition < end:
+            block = filehandler.read(min(block_size, end - intPosition))
+            if not block:
+                break
+            intCount, blnInQuotes = scanBlock(block, blnInQuotes)
+            intRecords += intCount
+            intNewlines += block.count(NEWLINE)
+            intPosition += len(block)
+    return intRecords, intNewlines, blnInQuotes
+
+def splitRanges(start, end, workers):
+    ''' Splits a range of bytes into one range per worker.
+    Args:
+        start (Integer):  Offset of the first byte.
+        end (Integer):  Offset right after the last byte.
+        workers (Integer):  Number of worker processes.  Defaults to the number of cores.  Ranges are never smaller than PARALLEL_MIN_BYTES.
+    Returns:
+        (List):  (start, end) tuples covering the range in order.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    intRanges = max(1, min(workers, (end - start) // PARALLEL_MIN_BYTES))
+    intStep = -(-(end - start) // intRanges)
+    return [(i, min(i + intStep, end)) for i in range(start, end, intStep)] or [(start, end)]
+
+def countRecords(source_file_path, start_offset=0, workers=None):
+    ''' Counts the records of a CSV file from its raw bytes.  Line feeds inside quoted fields are not counted and large files are split into
+    ranges that are scanned by a pool of worker processes.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        start_offset (Integer):  Byte offset of a record start to count from.
+        workers (Integer):  Number of worker processes.  Defaults to the number of cores.  1 scans the file in this process.
+    Returns:
+        (Integer):  The number of records after start_offset, including a last record that does not end with a line feed.
+    '''
+    intFileSize = os.path.getsize(source_file_path)
+    if intFileSize <= start_offset:
+        return 0
+
+    ranges = splitRanges(start_offset, intFileSize, workers)
+    if len(ranges) == 1:
+        results = [scanRange(source_file_path, start_offset, intFileSize)]
+    else:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            results = list(executor.map(scanRange, [source_file_path] * len(ranges), *zip(*ranges)))
+
+    # Combine the ranges in order, carrying the quote state from one range to the next
+    intRecordCount = 0
+    blnInQuotes = False
+    for intRecords, intNewlines, blnOddQuotes in results:
+        intRecordCount += intNewlines - intRecords if blnInQuotes else intRecords
+        blnInQuotes ^= blnOddQuotes
+
+    # A last record without a line feed is still a record
+    with open(source_file_path, 'rb') as filehandler:
+        filehandler.seek(intFileSize - 1)
+        if blnInQuotes or filehandler.read(1) != NEWLINE:
+            intRecordCount += 1
+
+    return intRecordCount
+
+def findRecordRanges(source_file_path, start_offset=0, workers=None):
+    ''' Splits a CSV file into byte ranges that start and end at record boundaries, e.g. to hand them out to worker processes.  The quote state
+    at each split point comes from a parallel scan of the ranges before it, so a split never lands inside a quoted field.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        start_offset (Integer):  Byte offset of the first record to split (e.g. right after the header).
+        workers (Integer):  Number of ranges wanted.  Defaults to the number of cores.  Ranges are never smaller than PARALLEL_MIN_BYTES.
+    Returns:
+        (List):  (start offset, end offset) tuples covering the records in order.
+    '''
+    intFileSize = os.path.getsize(source_file_path)
+    ranges = splitRanges(start_offset, intFileSize, workers)
+    if len(ranges) <= 1:
+        return [(start_offset, intFileSize)]
+
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        results = list(executor.map(scanRange, [source_file_path] * (len(ranges) - 1), *zip(*ranges[:-1])))
+
+    # Move each split point forward to the next record start, using the quote state carried over from the ranges before it
+    starts = [start_offset]
+    blnInQuotes = False
+    for (intStart, intEnd), (intRecords, intNewlines, blnOddQuotes) in zip(ranges[1:], results):
+        blnInQuotes ^= blnOddQuotes
+        with RecordLocator(source_file_path, intStart, in_quotes=blnInQuotes) as locator:
+            locator.skipRecords(1)
+            starts.append(max(locator.offset, starts[-1]))
+
+    starts.append(intFileSize)
+    return [(starts[i], starts[i + 1]) for i in range(len(starts) - 1) if starts[i] < starts[i + 1]] or [(start_offset, intFileSize)]
+
+def readHeader(source_file_path):
+    ''' Reads the raw bytes of the header record.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+    Returns:
+        (Bytes):  The header record including its line terminator.
+    '''
+    with RecordLocator(source_file_path) as locator:
+        locator.skipRecords(1)
+        intHeaderEnd = locator.offset
+
+    with open(source_file_path, 'rb') as filehandler:
+        return filehandler.read(intHeaderEnd)
+
+def copyByteRange(source_fd, target_fd, offset, length, delete_bytes=None):
+    ''' Copies a range of bytes from one file descriptor to the current position of another.  The copy is done by the operating system
+    with os.copy_file_range or os.sendfile where possible, otherwise through a bounded buffer.
+    Args:
+        source_fd (Integer):  File descriptor of the source file.
+        target_fd (Integer):  File descriptor of the target file.
+        offset (Integer):  Offset of the first byte to copy in the source file.
+        length (Integer):  Number of bytes to copy.
+        delete_bytes (Bytes):  Bytes to leave out of the copy (e.g. NUL).  The copy then always goes through the buffer.
+    '''
+    intRemaining = length
+
+    if delete_bytes:
+        os.lseek(source_fd, offset, os.SEEK_SET)
+        while intRemaining > 0:
+            data = os.read(source_fd, min(COPY_BUFFER_SIZE, intRemaining))
+            if not data:
+                break
+            intRemaining -= len(data)
+            os.write(target_fd, data.translate(None, delete_bytes))
+        return
+
+    if intRemaining > 0 and hasattr(os, 'copy_file_range'):
+        try:
+            while intRemaining > 0:
+                intCopied = os.copy_file_range(source_fd, target_fd, intRemaining, offset_src=offset)
+                if intCopied == 0:
+                    break
+                offset += intCopied
+                intRemaining -= intCopied
+        except OSError:
+            # e.g. copies across file systems on older kernels
+            pass
+
+    if intRemaining > 0 and hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            while intRemaining > 0:
+                intCopied = os.sendfile(target_fd, source_fd, offset, intRemaining)
+                if intCopied == 0:
+                    break
+                offset += intCopied
+                intRemaining -= intCopied
+        except OSError:
+            pass
+
+    if intRemaining > 0:
+        os.lseek(source_fd, offset, os.SEEK_SET)
+        while intRemaining > 0:
+            data = os.read(source_fd, min(COPY_BUFFER_SIZE, intRemaining))
+            if not data:
+                break
+            os.write(target_fd, data)
+            intRemaining -= len(data)
+
+def writeByteChunk(source_file_path, target_file_path, header, offset, length, line_terminator=b'\r\n', delete_bytes=None):
+    ''' Writes one chunk file: the header bytes followed by a range of raw records copied from the source file.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        target_file_path (String):  Contains the full file path and file name of the chunk file.
+        header (Bytes):  The header record written at the top of the chunk.  Empty to leave the header out.
+        offset (Integer):  Offset of the first record of the chunk in the source file.
+        length (Integer):  Number of bytes of records in the chunk.
+        line_terminator (Bytes):  Added when the last record of the source file does not end with a line feed.
+        delete_bytes (Bytes):  Bytes to leave out of the chunk (e.g. NUL).
+    Returns:
+        (String):  The target_file_path that was written.
+    '''
+    if delete_bytes:
+        header = header.translate(None, delete_bytes)
+
+    source_fd = os.open(source_file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        target_fd = os.open(target_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            if header:
+                os.write(target_fd, header if header.endswith(NEWLINE) else header + line_terminator)
+            copyByteRange(source_fd, target_fd, offset, length, delete_bytes)
+            if length > 0:
+                os.lseek(source_fd, offset + length - 1, os.SEEK_SET)
+                if os.read(source_fd, 1) != NEWLINE:
+                    os.write(target_fd, line_terminator)
+        finally:
+            os.close(target_fd)
+    finally:
+        os.close(source_fd)
+    return target_file_path
+
+def writeByteChunks(source_file_path, target_file_paths, header, ranges, line_terminator=b'\r\n', workers=None, delete_bytes=None):
+    ''' Writes one chunk file per range of bytes.  Each chunk is independent, so they are written by a pool of worker processes.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        target_file_paths (List):  Path of each chunk file.
+        header (Bytes):  The header record written at the top of each chunk.  Empty to leave the header out.
+        ranges (List):  (start offset, end offset) of the records of each chunk.
+        line_terminator (Bytes):  Added when the last record of the source file does not end with a line feed.
+        workers (Integer):  Number of worker processes.  Defaults to the number of cores.  1 writes the chunks in this process.
+        delete_bytes (Bytes):  Bytes to leave out of the chunks (e.g. NUL).
+    Returns:
+        (Generator):  Yields the path of each chunk file, in order, once it has been written.
+    '''
+    tasks = [(source_file_path, target_file_paths[i], header, ranges[i][0], ranges[i][1] - ranges[i][0], line_terminator, delete_bytes) for i in range(len(target_file_paths))]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+
+    if workers == 1:
+        for task in tasks:
+            yield writeByteChunk(*task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for target_file_path in executor.map(writeByteChunk, *zip(*tasks)):
+            yield target_file_path
+
+def scrubFile(source_file_path, target_file_path, delete_bytes=NUL, block_size=BLOCK_SIZE):
+    ''' Copies a file without the given bytes (e.g. NUL bytes in a polluted export).  The file is processed in fixed-size blocks, so memory stays constant whatever the size of the file.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        target_file_path (String):  Contains the full file path and file name of the scrubbed file.
+        delete_bytes (Bytes):  Bytes to remove.  Defaults to NUL.
+        block_size (Integer):  Number of bytes read at a time.
+    Returns:
+        (Integer):  Number of bytes that were removed.
+    '''
+    intRemoved = 0
+    with open(source_file_path, 'rb') as source, open(target_file_path, 'wb') as target:
+        while True:
+            block = source.read(block_size)
+            if not block:
+                break
+            scrubbed = block.translate(None, delete_bytes)
+            intRemoved += len(block) - len(scrubbed)
+            target.write(scrubbed)
+    return intRemoved
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+import hashlib
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+'''
+CSVCache is a function script that keeps the parsed records of CSV files in a cache directory, so later runs on the same file open them
+without parsing the file again.  Each cache file holds the header and the records as utf-8 text, with the fields separated by the ASCII unit
+separator and the records by the record separator, followed by the end offset of every record.  A cache file is memory mapped when it is
+opened, and its records are only decoded when they are read.
+
+Notes:
+    A cache file is named after the full path, encoding, delimiter and NUL handling of its source file, and holds the size and modification
+    time the source file had when it was parsed.  When the source file changes, the cache file no longer matches it and is rebuilt by the
+    next run.  Files whose fields contain the unit or record separator are not cached.
+'''
+
+CACHE_EXTENSION = '.coticache'
+CACHE_MAGIC = b'COTIPC01'
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+DEFAULT_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), 'coti-cache')
+FIELD_SEPARATOR = '\x1f'
+RECORD_SEPARATOR = '\x1e'
+# Number of records encoded or decoded together
+CACHE_BATCH_SIZE = 4096
+
+# magic, source file size, source mtime (ns), number of records, number of empty records, source key length, header length, records length
+HEADER_FORMAT = '<8sQqQQQQQ'
+
+def getSourceKey(source_file_path, encoding, delimiter, strip_nul):
+    ''' Builds the text that identifies the parsed records of a source file.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+        encoding (String):  Encoding the source file is read with.
+        delimiter (String):  Delimiter used to separate the data columns within a CSV record.
+        strip_nul (Boolean):  Defines whether NUL characters are removed from the records while they are read.
+    Returns:
+        (String):  The key of the records.
+    '''
+    return '\n'.join([os.path.abspath(source_file_path), encoding.lower(), delimiter, str(bool(strip_nul))])
+
+class CSVCachedData(object):
+    ''' Records of a cache file, exposed through the same hasData, dataHeader and data attributes as a CSVData.  data is a read-only view that decodes the records when they are read.
+    '''
+    __slots__ = ('hasData', 'dataHeader', 'data')
+
+    def __init__(self, header, data):
+        ''' Class instantiation method
+        Args:
+            header (List):  The fields of the header record.
+            data (CSVCachedRows):  The records.
+        '''
+        self.hasData = len(data) != 0
+        self.dataHeader = header
+        self.data = data
+
+class CSVCachedRows(object):
+    ''' List-like view of the records of a memory mapped cache file (len(), indexing and iteration).
+    '''
+    __slots__ = ('__map', '__ends', '__start', '__empty')
+
+    def __init__(self, mapped, ends, start, empty):
+        ''' Class instantiation method
+        Args:
+            mapped (mmap):  The mapped cache file.
+            ends (memoryview):  End offset of each record, relative to start.
+            start (Integer):  Offset of the first record in the cache file.
+            empty (Set):  Numbers of the records without any field, which are stored the same as records with one blank field.
+        '''
+        self.__map = mapped
+        self.__ends = ends
+        self.__start = start
+        self.__empty = empty
+
+    def __len__(self):
+        return len(self.__ends)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('row index out of range')
+        if index in self.__empty:
+            return []
+        intStart = self.__start + (self.__ends[index - 1] if index > 0 else 0)
+        return self.__map[intStart:self.__start + self.__ends[index] - 1].decode('utf-8', 'surrogatepass').split(FIELD_SEPARATOR)
+
+    def __iter__(self):
+        ends = self.__ends
+        intRows = len(ends)
+        intOffset = 0
+        for intFirst in range(0, intRows, CACHE_BATCH_SIZE):
+            intLast = min(intFirst + CACHE_BATCH_SIZE, intRows)
+            intEnd = ends[intLast - 1]
+            text = self.__map[self.__start + intOffset:self.__start + intEnd].decode('utf-8', 'surrogatepass')
+            intOffset = intEnd
+            rows = [record.split(FIELD_SEPARATOR) for record in text.split(RECORD_SEPARATOR)]
+            # Every record ends with a record separator, so the last item of the split is blank
+            rows.pop()
+            if self.__empty:
+                for i in range(intFirst, intLast):
+                    if i in self.__empty:
+                        rows[i - intFirst] = []
+            yield from rows
+
+class ParseCache(object):
+    ''' Cache directory of parsed CSV files, limited to a total size.  The least recently used cache files are deleted first.
+    '''
+    def __init__(self, cache_directory=None, max_bytes=DEFAULT_CACHE_SIZE):
+        ''' Class instantiation method
+        Args:
+            cache_directory (String):  Directory of the cache files.  Created when it does not exist.  Defaults to coti-cache in the system temporary directory.
+            max_bytes (Integer):  Total size of the cache files kept in the directory.
+        '''
+        self.cache_directory = cache_directory or DEFAULT_CACHE_DIRECTORY
+        self.max_bytes = max_bytes
+
+    def getCachePath(self, source_key):
+        ''' Builds the full path of the cache file of a source file.
+        Args:
+            source_key (String):  The key from getSourceKey().
+        Returns:
+            (String):  Full path of the cache file.
+        '''
+        return os.path.join(self.cache_directory, hashlib.blake2b(source_key.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest() + CACHE_EXTENSION)
+
+    def load(self, source_file_path, encoding='utf-8', delimiter=',', strip_nul=False):
+        ''' Opens the cache file of a source file if it matches the source file.
+        Args:
+            source_file_path (String):  Contains the full file path and file name of the source file.
+            encoding (String):  Encoding the source file is read with.
+            delimiter (String):  Delimiter used to separate the data columns within a CSV record.
+            strip_nul (Boolean):  Defines whether NUL characters are removed from the records while they are read.
+        Returns:
+            (CSVCachedData):  The cached records, or None when there is no cache file, it is invalid, or the source file changed since it was saved.
+        '''
+        strSourceKey = getSourceKey(source_file_path, encoding, delimiter, strip_nul)
+        strCachePath = self.getCachePath(strSourceKey)
+        stat = os.stat(source_file_path)
+        intHeaderSize = struct.calcsize(HEADER_FORMAT)
+        try:
+            with open(strCachePath, 'rb') as filehandler:
+                mapped = mmap.mmap(filehandler.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, file_size, mtime_ns, intRows, intEmpty, intKey, intHeader, intRecords = struct.unpack_from(HEADER_FORMAT, mapped)
+            # The end offsets start on an 8 byte boundary
+            intPadding = -(intHeaderSize + intKey + intHeader + intRecords) % 8
+            if magic != CACHE_MAGIC or file_size != stat.st_size or mtime_ns != stat.st_mtime_ns or len(mapped) != intHeaderSize + intKey + intHeader + intRecords + intPadding + (intRows + intEmpty) * 8:
+                mapped.close()
+                return None
+            intOffset = intHeaderSize
+            if mapped[intOffset:intOffset + intKey].decode('utf-8', 'surrogatepass') != strSourceKey:
+                mapped.close()
+                return None
+            intOffset += intKey
+            header = mapped[intOffset:intOffset + intHeader].decode('utf-8', 'surrogatepass').split(FIELD_SEPARATOR) if intHeader else []
+            intOffset += intHeader
+            intRecordStart = intOffset
+            intOffset += intRecords + intPadding
+            ends = memoryview(mapped)[intOffset:intOffset + intRows * 8].cast('Q')
+            intOffset += intRows * 8
+            empty = set(array('Q', mapped[intOffset:intOffset + intEmpty * 8]))
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            return None
+
+        # Marks the cache file as recently used for the eviction
+        try:
+            os.utime(strCachePath)
+        except OSError:
+            pass
+        print('[INFO] Using parse cache: ', strCachePath)
+        return CSVCachedData(header, CSVCachedRows(mapped, ends, intRecordStart, empty))
+
+    def save(self, csv_data, source_file_path, encoding='utf-8', delimiter=',', strip_nul=False, file_stat=None):
+        ''' Writes the parsed records of a source file to its cache file, then deletes the least recently used cache files over the size limit.
+        Args:
+            csv_data (CSVData):  The parsed header and records (a CSVData or CSVColumnarData).
+            source_file_path (String):  Contains the full file path and file name of the source file.
+            encoding (String):  Encoding the source file was read with.
+            delimiter (String):  Delimiter used to separate the data columns within a CSV record.
+            strip_nul (Boolean):  Defines whether NUL characters were removed from the records while they were read.
+            file_stat (os.stat_result):  Size and modification time of the source file taken before it was read, so a file changed during the read is not cached as current.  Defaults to the current ones.
+        Returns:
+            (String):  Full path of the cache file, or None when the records cannot be cached.
+        '''
+        stat = file_stat or os.stat(source_file_path)
+        strSourceKey = getSourceKey(source_file_path, encoding, delimiter, strip_nul)
+        strCachePath = self.getCachePath(strSourceKey)
+        if FIELD_SEPARATOR in ''.join(csv_data.dataHeader) or RECORD_SEPARATOR in ''.join(csv_data.dataHeader):
+            print('[INFO] Not cached: the header contains a unit or record separator character.')
+            return None
+
+        os.makedirs(self.cache_directory, exist_ok=True)
+        intHandle, strTempPath = tempfile.mkstemp(prefix='coti-cache-', suffix='.tmp', dir=self.cache_directory)
+        try:
+            with os.fdopen(intHandle, 'wb') as filehandler:
+                key = strSourceKey.encode('utf-8', 'surrogatepass')
+                header = FIELD_SEPARATOR.join(csv_data.dataHeader).encode('utf-8', 'surrogatepass')
+                filehandler.write(b'\x00' * struct.calcsize(HEADER_FORMAT))
+                filehandler.write(key)
+                filehandler.write(header)
+
+                ends = array('Q')
+                empty = array('Q')
+                intRecords = 0
+                intRow = 0
+                rows = iter(csv_data.data)
+                while True:
+                    batch = list(itertools.islice(rows, CACHE_BATCH_SIZE))
+                    if not batch:
+                        break
+                    records = [FIELD_SEPARATOR.join(row) + RECORD_SEPARATOR for row in batch]
+                    text = ''.join(records)
+                    if text.count(RECORD_SEPARATOR) != len(batch) or text.count(FIELD_SEPARATOR) != sum([max(len(row) - 1, 0) for row in batch]):
+                        print('[INFO] Not cached: a record contains a unit or record separator character.')
+                        return None
+                    encoded = text.encode('utf-8', 'surrogatepass')
+                    # Characters and bytes only differ in number when the batch is not plain ASCII
+                    lengths = map(len, records) if len(encoded) == len(text) else [len(record.encode('utf-8', 'surrogatepass')) for record in records]
+                    for intLength in lengths:
+                        intRecords += intLength
+                        ends.append(intRecords)
+                    for i, row in enumerate(batch):
+                        if not row:
+                            empty.append(intRow + i)
+                    intRow += len(batch)
+                    filehandler.write(encoded)
+
+                filehandler.write(b'\x00' * (-filehandler.tell() % 8))
+                ends.tofile(filehandler)
+                empty.tofile(filehandler)
+                filehandler.seek(0)
+                filehandler.write(struct.pack(HEADER_FORMAT, CACHE_MAGIC, stat.st_size, stat.st_mtime_ns, len(ends), len(empty), len(key), len(header), intRecords))
+            os.replace(strTempPath, strCachePath)
+        except OSError as e:
+            print('[WARNING] The parse cache could not be saved: ', e)
+            return None
+        finally:
+            if os.path.exists(strTempPath):
+                os.remove(strTempPath)
+
+        print('[INFO] Saved parse cache: ', strCachePath)
+        self.evict(strCachePath)
+        return strCachePath
+
+    def evict(self, keep_path=None):
+        ''' Deletes the least recently used cache files until the cache directory is under its size limit.
+        Args:
+            keep_path (String):  Full path of a cache file that is never deleted (e.g. the one just saved), even when it is larger than the limit on its own.
+        Returns:
+            (Integer):  Number of cache files deleted.
+        '''
+        entries = []
+        try:
+            for entry in os.scandir(self.cache_directory):
+                if entry.name.endswith(CACHE_EXTENSION) and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except OSError:
+            return 0
+
+        intTotal = sum(size for mtime_ns, size, path in entries)
+        intDeleted = 0
+        for mtime_ns, size, path in sorted(entries):
+            if intTotal <= self.max_bytes:
+                break
+            if keep_path is not None and os.path.abspath(path) == os.path.abspath(keep_path):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # e.g. the file is mapped by another run on Windows
+                continue
+            intTotal -= size
+            intDeleted += 1
+        if intDeleted:
+            print('[INFO] Cache files evicted: ', intDeleted)
+        return intDeleted
@@ -1,13 +1,152 @@
 #!/usr/bin/env python3
+from array import array
+
 class CSVData (object):
-    # Class Attributes
-    hasData = None
-    dataHeader = None
-    data = None
+    # Attributes of each instance, kept in slots instead of a __dict__
+    __slots__ = ('hasData', 'dataHeader', 'data')
+
+    def __init__(self):
+        ''' Class instantiation method
+        '''
+        self.hasData = False
+        self.dataHeader = []
+        self.data = []
+
+# Number of distinct values a column can have before it stops being dictionary encoded
+DICTIONARY_LIMIT = 65536
+# Largest end offset an 'I' array can hold before the offsets of a column are widened to 'Q'
+MAX_NARROW_OFFSET = 2 ** 32 - 1
+
+class CSVColumn(object):
+    ''' Values of one column, stored either dictionary encoded (a code per row pointing into a list of distinct values) or as utf-8 bytes in one buffer with an end offset per row.
+    '''
+    __slots__ = ('values', 'lookup', 'codes', 'buffer', 'offsets')
+
+    def __init__(self):
+        ''' Class instantiation method.  Columns start dictionary encoded and move to the buffer once they have more than DICTIONARY_LIMIT distinct values.
+        '''
+        self.values = []
+        self.lookup = {}
+        self.codes = array('I')
+        self.buffer = None
+        self.offsets = None
+
+    def __len__(self):
+        return len(self.codes) if self.buffer is None else len(self.offsets)
+
+    def append(self, value):
+        ''' Adds the value of the next row.
+        Args:
+            value (String):  Value of the field.
+        '''
+        if self.buffer is None:
+            code = self.lookup.get(value)
+            if code is None:
+                if len(self.values) >= DICTIONARY_LIMIT:
+                    self.__toBuffer()
+                    self.append(value)
+                    return
+                code = len(self.values)
+                self.values.append(value)
+                self.lookup[value] = code
+            self.codes.append(code)
+        else:
+            self.buffer += value.encode('utf-8', 'surrogatepass')
+            if len(self.buffer) > MAX_NARROW_OFFSET and self.offsets.typecode == 'I':
+                self.offsets = array('Q', self.offsets)
+            self.offsets.append(len(self.buffer))
+
+    def __toBuffer(self):
+        ''' Moves the values from the dictionary encoding to the buffer.
+        '''
+        codes = self.codes
+        encoded = [value.encode('utf-8', 'surrogatepass') for value in self.values]
+        self.buffer = bytearray()
+        self.offsets = array('I')
+        self.values = None
+        self.lookup = None
+        self.codes = None
+        for code in codes:
+            self.buffer += encoded[code]
+            if len(self.buffer) > MAX_NARROW_OFFSET and self.offsets.typecode == 'I':
+                self.offsets = array('Q', self.offsets)
+            self.offsets.append(len(self.buffer))
+
+    def get(self, index):
+        ''' Returns the value of a row.
+        Args:
+            index (Integer):  Number of the row, starting at 0.
+        Returns:
+            (String):  Value of the field.
+        '''
+        if self.buffer is None:
+            return self.values[self.codes[index]]
+        start = self.offsets[index - 1] if index > 0 else 0
+        return self.buffer[start:self.offsets[index]].decode('utf-8', 'surrogatepass')
+
+class CSVRowView(object):
+    ''' List-like view of the rows of a CSVColumnarData, so code written for CSVData.data (len(), indexing, iteration and append()) keeps working.
+    '''
+    __slots__ = ('__owner',)
+
+    def __init__(self, owner):
+        ''' Class instantiation method
+        Args:
+            owner (CSVColumnarData):  The columnar data the rows are read from.
+        '''
+        self.__owner = owner
+
+    def __len__(self):
+        return len(self.__owner.widths)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('row index out of range')
+        columns = self.__owner.columns
+        return [columns[i].get(index) for i in range(self.__owner.widths[index])]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, row):
+        self.__owner.append(row)
+
+class CSVColumnarData(object):
+    ''' Compact alternative to CSVData.  Rows are stored column by column: low cardinality columns (e.g. status, currency) as a code per row into their distinct values, the others as utf-8 bytes in one buffer per column with array-backed offsets.  CSVData.data is available as a view.
+    '''
+    __slots__ = ('hasData', 'dataHeader', 'data', 'columns', 'widths')
 
     def __init__(self):
         ''' Class instantiation method
         '''
         self.hasData = False
         self.dataHeader = []
-        self.data = []
\ No newline at end of file
+        self.columns = []
+        # Number of fields of each row, so rows that are shorter or longer than the header come back unchanged
+        self.widths = array('I')
+        self.data = CSVRowView(self)
+
+    def append(self, row):
+        ''' Adds a row.
+        Args:
+            row (List):  The fields of the row.
+        '''
+        intRows = len(self.widths)
+        while len(self.columns) < len(row):
+            # A row wider than any before it: the new column is padded for the earlier rows
+            column = CSVColumn()
+            for i in range(intRows):
+                column.append('')
+            self.columns.append(column)
+
+        for i, value in enumerate(row):
+            self.columns[i].append(value)
+        for i in range(len(row), len(self.columns)):
+            self.columns[i].append('')
+
+        self.widths.append(len(row))
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import codecs
+import io
+import itertools
+import re
+from CSVBytes import isByteSafeEncoding
+'''
+CSVDecode is a function script that reads the lines of a CSV file through an incremental decoder over large binary blocks, with a policy
+for the bytes that are not valid in the encoding of the file:  stop the run at the first one (strict), replace them with U+FFFD (replace),
+or set aside the records that hold them (quarantine) so they can be fixed and loaded later while the rest of the file is processed.
+
+Notes:
+    Lines are translated as in a file opened in text mode:  \\r\\n and \\r end a line and are read as \\n.  With the quarantine policy each
+    invalid byte is decoded as a lone surrogate (U+DC00 plus the byte), so a record that holds any can be encoded back to its original bytes
+    with the ESCAPE_ERRORS error handler.  Unlike surrogateescape, it also escapes the bytes under 0x80, which UTF-16 and UTF-32 need.
+'''
+
+DECODE_ERROR_POLICIES = ['strict', 'replace', 'quarantine']
+# Size of the binary blocks decoded at once
+DECODE_BLOCK_SIZE = 1024 * 1024
+# Name of the codec error handler that escapes the invalid bytes on decode and writes them back on encode
+ESCAPE_ERRORS = 'csvdecode.escape'
+# Characters an invalid byte is decoded to by the ESCAPE_ERRORS handler
+ESCAPED_BYTE_PATTERN = re.compile('[\udc00-\udcff]')
+ESCAPED_BYTES_PATTERN = re.compile('[\udc00-\udcff]+')
+# A line with its line feed, or the last line of the file without one
+LINE_PATTERN = re.compile(r'[^\n]*\n|[^\n]+\Z')
+
+def escapeBytes(error):
+    ''' Codec error handler registered as ESCAPE_ERRORS.
+    Args:
+        error (UnicodeError):  The decoding or encoding error.
+    Returns:
+        (Tuple):  (replacement, position where the codec resumes):  a lone surrogate for each invalid byte when decoding, and the byte of
+        each escaped character when encoding.
+    Raises:
+        UnicodeError:  The error, when encoding characters that are not escaped bytes.
+    '''
+    if isinstance(error, UnicodeDecodeError):
+        return (''.join(chr(0xDC00 + byte) for byte in error.object[error.start:error.end]), error.end)
+    if isinstance(error, UnicodeEncodeError):
+        # The whole run of escaped bytes is written at once:  UTF-16 and UTF-32 only accept replacements of whole code units
+        match = ESCAPED_BYTES_PATTERN.match(error.object, error.start)
+        if match is not None and match.end() >= error.end:
+            return (bytes(ord(char) - 0xDC00 for char in match.group()), match.end())
+    raise error
+
+codecs.register_error(ESCAPE_ERRORS, escapeBytes)
+
+class DecodeError(ValueError):
+    ''' Raised by the strict policy when the source file holds bytes that are not valid in its encoding.
+    '''
+    pass
+
+class DecodedLines(object):
+    ''' The decoded lines of a byte range of a file.  With the quarantine policy, the lines of the current record are kept until
+    nextRecord() is called, so a record that holds invalid bytes can be set aside.
+    '''
+    def __init__(self, source_file_path, encoding='utf-8', errors='strict', start=0, end=None, block_size=DECODE_BLOCK_SIZE):
+        ''' Class instantiation method
+        Args:
+            source_file_path (String):  Contains the full file path and file name of the source file.
+            encoding (String):  Encoding of the file.
+            errors (String):  One of DECODE_ERROR_POLICIES.
+            start (Integer):  Offset of the first byte read.  Must be 0 or the start of a line.
+            end (Integer):  Offset right after the last byte read.  None reads up to the end of the file.
+            block_size (Integer):  Number of bytes decoded at a time.
+        '''
+        if errors not in DECODE_ERROR_POLICIES:
+            raise ValueError('Unknown decode error policy ' + str(errors) + '.  Valid policies are: ' + str(DECODE_ERROR_POLICIES))
+        self.source_file_path = source_file_path
+        self.encoding = encoding
+        self.errors = errors
+        self.start = start
+        self.end = end
+        self.block_size = block_size
+        # Whether a line of the current record holds invalid bytes, and the lines of the current record (quarantine policy only)
+        self.record_invalid = False
+        self.record_lines = []
+        self.__filehandler = open(source_file_path, 'rb')
+        self.__filehandler.seek(start)
+        strHandler = {'strict': 'strict', 'replace': 'replace', 'quarantine': ESCAPE_ERRORS}[errors]
+        self.__decoder = codecs.getincrementaldecoder(encoding)(errors=strHandler)
+        self.__offset = start
+        self.__newlines = 0
+        self.__blocks = self.__readBlocks()
+        if errors == 'quarantine':
+            self.__lines = self.__trackRecords(self.__blocks)
+        else:
+            # The lines are chained in C, so the lines of a block are not handed out by the generator one at a time
+            self.__lines = itertools.chain.from_iterable(self.__blocks)
+
+    def __iter__(self):
+        return self.__lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        ''' Closes the source file.
+        '''
+        self.__blocks.close()
+        self.__filehandler.close()
+
+    def nextRecord(self):
+        ''' Starts a new record:  the lines read from now on belong to the next record.
+        '''
+        self.record_invalid = False
+        self.record_lines = []
+
+    def __readBlocks(self):
+        ''' Decodes the file block by block and splits the text into lines.  A line that runs past the end of a block is kept until the
+        block that ends it is decoded.
+        Returns:
+            (Generator):  Yields the lines of each block as a list, each line with its line feed.
+        '''
+        # The text of a line that runs over several blocks (e.g. a huge field) is kept in parts and joined once the line ends, so it is not copied again for each block
+        carry = []
+        blnFinal = False
+        while not blnFinal:
+            intSize = self.block_size if self.end is None else min(self.block_size, self.end - self.__offset)
+            block = self.__filehandler.read(intSize) if intSize > 0 else b''
+            blnFinal = not block
+            text = self.__decode(block, blnFinal)
+            self.__offset += len(block)
+            rest = ''
+            if not blnFinal:
+                # A \r at the end of the text may be the first half of a \r\n
+                intCut = max(text.rfind('\n'), text.rfind('\r', 0, len(text) - 1))
+                if intCut < 0:
+                    carry.append(text)
+                    continue
+                rest = text[intCut + 1:]
+                text = text[:intCut + 1]
+            if carry:
+                carry.append(text)
+                text = ''.join(carry)
+            carry = [rest] if rest else []
+            if len(text) <= 2 * self.block_size:
+                if text:
+                    yield io.StringIO(text, newline=None).readlines()
+            else:
+                # A line joined from many blocks:  StringIO would hold it at 4 bytes per character
+                if '\r' in text:
+                    text = text.replace('\r\n', '\n').replace('\r', '\n')
+                yield LINE_PATTERN.findall(text)
+
+    def __trackRecords(self, blocks):
+        ''' Hands out the lines one at a time, keeping the lines of the current record and whether they hold invalid bytes (quarantine policy).
+        Args:
+            blocks (Generator):  The lines of each block, from __readBlocks().
+        Returns:
+            (Generator):  Yields each line with its line feed.
+        '''
+        for lines in blocks:
+            blnEscaped = ESCAPED_BYTE_PATTERN.search(''.join(lines)) is not None
+            for line in lines:
+                self.record_lines.append(line)
+                if blnEscaped and ESCAPED_BYTE_PATTERN.search(line) is not None:
+                    self.record_invalid = True
+                yield line
+
+    def __decode(self, block, final):
+        ''' Decodes a block, reporting where the first invalid bytes are with the strict policy.
+        Args:
+            block (Bytes):  The block.
+            final (Boolean):  Whether it is the last block.
+        Returns:
+            (String):  The decoded text.
+        Raises:
+            DecodeError:  The block holds bytes that are not valid in the encoding (strict policy).
+        '''
+        intPending = len(self.__decoder.getstate()[0])
+        try:
+            text = self.__decoder.decode(block, final)
+        except UnicodeDecodeError as e:
+            # e.start counts from the bytes the decoder kept from the previous block
+            intOffset = self.__offset - intPending + e.start
+            strLocation = 'byte offset ' + str(intOffset)
+            if isByteSafeEncoding(self.encoding):
+                strLocation += ' (line ' + str(self.__newlines + block[:max(e.start - intPending, 0)].count(b'\n') + 1) + ')'
+            raise DecodeError('The file holds bytes that are not valid ' + self.encoding + ' (' + e.object[e.start:e.end].hex() + ') at ' + strLocation + '.  Use -decodeerrors=replace or -decodeerrors=quarantine to read it anyway.')
+        self.__newlines += block.count(b'\n')
+        return text
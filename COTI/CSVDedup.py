@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+import hashlib
+import heapq
+import os
+import pickle
+import tempfile
+from operator import itemgetter
+from CSVSort import DEFAULT_MEMORY_BUDGET, ROW_OVERHEAD, FIELD_OVERHEAD, SPILL_BATCH_SIZE, writeRun, readRun
+from CSVTransform import resolveColumn
+'''
+CSVDedup is a function script that drops the records whose key columns repeat a previous record, keeping either the first or the last
+occurrence of each key.  Keys are kept in memory as 16 byte hashes.  Once the memory budget is reached, the records whose key is not
+already known are spilled to hash partitioned temporary files, each partition is de-duplicated on its own, and the survivors are merged
+back in source order.
+
+Notes:
+    With keep='first', the records are handed out as soon as they are read until the memory budget is reached, so the output is written in
+    the same pass as the source is read.  With keep='last', a record can only be written once it is known that its key does not come
+    again, so the survivors are held (or spilled) until the end of the source.  A partition whose survivors do not fit in the memory budget
+    is partitioned again on other bytes of the key hashes, up to MAX_PARTITION_DEPTH times, so the budget holds whatever the number of
+    distinct keys.
+'''
+
+KEEP_OPTIONS = ['first', 'last']
+DIGEST_SIZE = 16
+# Estimated memory of a key hash held in a set or dict: the bytes object and its hash table slot
+KEY_OVERHEAD = 100
+# Number of hash partitions the records are spilled to once the memory budget is reached
+SPILL_PARTITIONS = 64
+# Number of times a partition that does not fit in the memory budget is partitioned again.  Each depth uses 4 other bytes of the key hash.
+MAX_PARTITION_DEPTH = DIGEST_SIZE // 4 - 1
+# Joins the key fields before they are hashed.  A unit separator is not expected inside a field.
+KEY_SEPARATOR = '\x1f'
+
+def makeDigestFunction(header, columns=None):
+    ''' Builds the function that hashes the key of a record.  Column references are resolved once against the header.
+    Args:
+        header (List):  The fields of the header record.
+        columns (List):  Names or positions of the key columns.  None uses the whole record as the key.
+    Returns:
+        (Callable):  Returns the 16 byte hash of the key of a record.
+    '''
+    def digest(value):
+        return hashlib.blake2b(value.encode('utf-8', 'surrogatepass'), digest_size=DIGEST_SIZE).digest()
+
+    if not columns:
+        return lambda row: digest(KEY_SEPARATOR.join(row))
+
+    indexes = [resolveColumn(header, column) for column in columns]
+    if len(indexes) == 1:
+        intColumn = indexes[0]
+        return lambda row: digest(row[intColumn] if intColumn < len(row) else '')
+    return lambda row: digest(KEY_SEPARATOR.join([row[i] if i < len(row) else '' for i in indexes]))
+
+def digestPartition(digest, depth, partitions):
+    ''' Returns the spill partition of a key hash.
+    Args:
+        digest (Bytes):  Hash of the key of a record.
+        depth (Integer):  Number of times the records were partitioned.  Each depth reads other bytes of the hash, so a partition is split again.
+        partitions (Integer):  Number of partitions.
+    Returns:
+        (Integer):  The partition of the key, from 0 to partitions - 1.
+    '''
+    return int.from_bytes(digest[4 * depth:4 * depth + 4], 'little') % partitions
+
+class Deduplicator(object):
+    ''' Drops the records with a repeated key from a stream of records, within a memory budget.
+    '''
+    def __init__(self, digest_function, keep='first', memory_budget=DEFAULT_MEMORY_BUDGET, temp_directory=None, partitions=SPILL_PARTITIONS):
+        ''' Class instantiation method
+        Args:
+            digest_function (Callable):  Returns the hash of the key of a record (see makeDigestFunction()).
+            keep (String):  Occurrence of each key that is kept:  'first' or 'last'.
+            memory_budget (Integer):  Estimated bytes of keys (and, with keep='last', records) held in memory before the records are spilled.
+            temp_directory (String):  Directory of the spill files.  Defaults to the system temporary directory.
+            partitions (Integer):  Number of hash partitions the records are spilled to.
+        '''
+        if keep not in KEEP_OPTIONS:
+            raise ValueError('Unknown keep option ' + str(keep) + '.  Valid keep options are: ' + str(KEEP_OPTIONS))
+        self.digest_function = digest_function
+        self.keep = keep
+        self.memory_budget = memory_budget
+        self.temp_directory = temp_directory
+        self.partitions = partitions
+        self.duplicate_count = 0
+        self.spilled_bytes = 0
+        self.__files = []
+        self.__buffers = []
+        self.__paths = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def isSpilled(self):
+        ''' Returns whether the memory budget was reached and records were spilled to disk.
+        Returns:
+            (Boolean):  True once the spill files were created.
+        '''
+        return len(self.__paths) > 0
+
+    def filter(self, rows):
+        ''' Drops the records whose key was already seen (keep='first') or comes again later (keep='last').
+        Args:
+            rows (Iterable):  The records, each as a list of fields.
+        Returns:
+            (Generator):  Yields the kept records in the order of the source.
+        '''
+        rows = iter(rows)
+        if self.keep == 'first':
+            yield from self.__keepFirst(rows)
+        else:
+            yield from self.__keepLast(rows)
+        yield from self.__mergeSpills()
+
+    def close(self):
+        ''' Deletes the spill files.
+        '''
+        for filehandler in self.__files:
+            if filehandler is not None:
+                filehandler.close()
+        for path in self.__paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.__files = []
+        self.__buffers = []
+        self.__paths = []
+
+    def __keepFirst(self, rows):
+        ''' Hands out the first record of each key while the key hashes fit in the memory budget, then spills the records with a new key.
+        Args:
+            rows (Iterator):  The records.
+        Returns:
+            (Generator):  Yields the records kept before the memory budget was reached.
+        '''
+        digestFunction = self.digest_function
+        seen = set()
+        intLimit = max(self.memory_budget // KEY_OVERHEAD, 1)
+        intSequence = -1
+        for intSequence, row in enumerate(rows):
+            digest = digestFunction(row)
+            if digest in seen:
+                self.duplicate_count += 1
+                continue
+            seen.add(digest)
+            yield row
+            if len(seen) >= intLimit:
+                break
+        else:
+            return
+
+        # The known keys stay in memory, so their repeats are still dropped right away; only the records with a new key are spilled
+        for intSequence, row in enumerate(rows, intSequence + 1):
+            digest = digestFunction(row)
+            if digest in seen:
+                self.duplicate_count += 1
+            else:
+                self.__spill(digest, intSequence, row)
+
+    def __keepLast(self, rows):
+        ''' Holds the last record of each key while they fit in the memory budget, then spills them with the rest of the records.
+        Args:
+            rows (Iterator):  The records.
+        Returns:
+            (Generator):  Yields the kept records when the memory budget was not reached.
+        '''
+        digestFunction = self.digest_function
+        latest = {}
+        intBytes = 0
+        intBudget = self.memory_budget
+        intSequence = -1
+        for intSequence, row in enumerate(rows):
+            digest = digestFunction(row)
+            previous = latest.get(digest)
+            if previous is not None:
+                self.duplicate_count += 1
+                intBytes -= ROW_OVERHEAD + FIELD_OVERHEAD * len(previous[1]) + sum(map(len, previous[1]))
+            else:
+                intBytes += KEY_OVERHEAD
+            latest[digest] = (intSequence, row)
+            intBytes += ROW_OVERHEAD + FIELD_OVERHEAD * len(row) + sum(map(len, row))
+            if intBytes >= intBudget:
+                break
+        else:
+            yield from (row for intSequence, row in sorted(latest.values(), key=itemgetter(0)))
+            return
+
+        for digest, (intHeldSequence, row) in latest.items():
+            self.__spill(digest, intHeldSequence, row)
+        latest = None
+        for intSequence, row in enumerate(rows, intSequence + 1):
+            self.__spill(digestFunction(row), intSequence, row)
+
+    def __spill(self, digest, sequence, row):
+        ''' Adds a record to the spill file of the partition of its key.
+        Args:
+            digest (Bytes):  Hash of the key of the record.
+            sequence (Integer):  Position of the record in the source, which puts the survivors back in order.
+            row (List):  The fields of the record.
+        '''
+        if not self.__paths:
+            self.__files = [None] * self.partitions
+            self.__buffers = [[] for i in range(self.partitions)]
+            for i in range(self.partitions):
+                intHandle, strPath = tempfile.mkstemp(prefix='coti-dedup-', suffix='.part', dir=self.temp_directory)
+                self.__files[i] = os.fdopen(intHandle, 'wb')
+                self.__paths.append(strPath)
+        intPartition = digestPartition(digest, 0, self.partitions)
+        buffer = self.__buffers[intPartition]
+        buffer.append((digest, sequence, row))
+        if len(buffer) >= SPILL_BATCH_SIZE:
+            pickle.dump(buffer, self.__files[intPartition], pickle.HIGHEST_PROTOCOL)
+            self.__buffers[intPartition] = []
+
+    def __dedupPartition(self, partition_path, depth):
+        ''' De-duplicates a spill partition on its own.  When its survivors go over the memory budget, the partition is partitioned again and
+        the survivors of its sub-partitions are merged.  The partition file is deleted.
+        Args:
+            partition_path (String):  Full path of the spill file of the partition.
+            depth (Integer):  Number of times the records of the partition were partitioned, from 0.
+        Returns:
+            (String):  Full path of a run file with the survivors, in the order of the source.
+        '''
+        blnKeepLast = self.keep == 'last'
+        intBudget = self.memory_budget
+        survivors = {}
+        intBytes = 0
+        intDuplicates = 0
+        for digest, intSequence, row in readRun(partition_path):
+            current = survivors.get(digest)
+            if current is None:
+                survivors[digest] = (intSequence, row)
+                intBytes += KEY_OVERHEAD + ROW_OVERHEAD + FIELD_OVERHEAD * len(row) + sum(map(len, row))
+                if intBytes >= intBudget and depth < MAX_PARTITION_DEPTH:
+                    break
+                continue
+            intDuplicates += 1
+            if (intSequence > current[0]) == blnKeepLast:
+                survivors[digest] = (intSequence, row)
+        else:
+            self.duplicate_count += intDuplicates
+            strRunPath = self.__addPath(writeRun(sorted(survivors.values(), key=itemgetter(0)), self.temp_directory, 'coti-dedup-'))
+            self.__removePath(partition_path)
+            return strRunPath
+
+        survivors = None
+        subPaths = self.__splitPartition(partition_path, depth + 1)
+        self.__removePath(partition_path)
+        runs = [self.__dedupPartition(strPath, depth + 1) for strPath in subPaths]
+        strRunPath = self.__addPath(writeRun(heapq.merge(*[readRun(path) for path in runs], key=itemgetter(0)), self.temp_directory, 'coti-dedup-'))
+        for strPath in runs:
+            self.__removePath(strPath)
+        return strRunPath
+
+    def __splitPartition(self, partition_path, depth):
+        ''' Spills the records of a partition to sub-partitions, on other bytes of their key hash.
+        Args:
+            partition_path (String):  Full path of the spill file of the partition.
+            depth (Integer):  Depth of the sub-partitions.
+        Returns:
+            (List):  Full paths of the spill files of the sub-partitions that have records.
+        '''
+        files = [None] * self.partitions
+        buffers = [[] for i in range(self.partitions)]
+        paths = [None] * self.partitions
+
+        def dump(partition):
+            # The file of a sub-partition is created with its first batch, so a sub-partition without records has no file
+            if files[partition] is None:
+                intHandle, paths[partition] = tempfile.mkstemp(prefix='coti-dedup-', suffix='.part', dir=self.temp_directory)
+                files[partition] = os.fdopen(intHandle, 'wb')
+                self.__addPath(paths[partition])
+            pickle.dump(buffers[partition], files[partition], pickle.HIGHEST_PROTOCOL)
+            buffers[partition] = []
+
+        try:
+            for record in readRun(partition_path):
+                intPartition = digestPartition(record[0], depth, self.partitions)
+                buffers[intPartition].append(record)
+                if len(buffers[intPartition]) >= SPILL_BATCH_SIZE:
+                    dump(intPartition)
+            for i in range(self.partitions):
+                if buffers[i]:
+                    dump(i)
+                if files[i] is not None:
+                    self.spilled_bytes += files[i].tell()
+        finally:
+            for filehandler in files:
+                if filehandler is not None:
+                    filehandler.close()
+        return [path for path in paths if path is not None]
+
+    def __addPath(self, path):
+        ''' Registers a temporary file, so close() deletes it if the run stops early.
+        Args:
+            path (String):  Full path of the file.
+        Returns:
+            (String):  path.
+        '''
+        self.__paths.append(path)
+        return path
+
+    def __removePath(self, path):
+        ''' Deletes a temporary file that was read.
+        Args:
+            path (String):  Full path of the file.
+        '''
+        self.__paths.remove(path)
+        os.remove(path)
+
+    def __mergeSpills(self):
+        ''' De-duplicates each spill partition on its own, then merges their survivors by their position in the source.
+        Returns:
+            (Generator):  Yields the kept records that were spilled, in the order of the source.
+        '''
+        if not self.__paths:
+            return
+        for i, filehandler in enumerate(self.__files):
+            if self.__buffers[i]:
+                pickle.dump(self.__buffers[i], filehandler, pickle.HIGHEST_PROTOCOL)
+            self.spilled_bytes += filehandler.tell()
+            filehandler.close()
+        self.__files = []
+        self.__buffers = []
+
+        runs = [self.__dedupPartition(strPath, 0) for strPath in list(self.__paths)]
+        yield from (row for intSequence, row in heapq.merge(*[readRun(path) for path in runs], key=itemgetter(0)))
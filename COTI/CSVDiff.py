@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import hashlib
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from CSVSort import DEFAULT_MEMORY_BUDGET, ROW_OVERHEAD, FIELD_OVERHEAD, writeRun, readRun
+from CSVDedup import DIGEST_SIZE, KEY_OVERHEAD, KEY_SEPARATOR, SPILL_PARTITIONS
+from CSVJoin import SpillPartitions, makeJoinKeyFunction
+from CSVTransform import resolveColumn
+'''
+CSVDiff is a function script that compares two extracts of the same data (e.g. yesterday's file and its re-extract) record by record on
+key columns, so reordered records are not reported, and reports the records that were added, removed and changed.  Each record is read
+once and reduced to its key and a 16 byte fingerprint of its fields; the fields are only compared one by one when the fingerprints of a
+key differ.
+
+Notes:
+    The records of the old file are held in memory until the memory budget is reached.  Past it, the records of both files are spilled to
+    hash partitioned temporary files and the partitions are compared by a pool of worker processes.  The diff is then written partition
+    by partition:  the number of partitions and the partition of each key only depend on the size of the old file and the memory budget,
+    so the records come out in the same order on every run, whatever the number of workers.  A key that repeats within a file is only
+    compared on its first record; the repeats are counted as duplicates.
+'''
+
+DIFF_CHANGES = ['added', 'removed', 'changed']
+# Columns written before the compared columns of each record of the diff
+DIFF_COLUMNS = ['change', 'changed_columns']
+# Separates the names of the changed columns of a changed record
+CHANGED_COLUMN_SEPARATOR = '+'
+# Estimated bytes of memory used by the records of a file for each byte of the file, which sizes the spill partitions
+MEMORY_PER_FILE_BYTE = 4
+MAX_PARTITIONS = 1024
+# Number of spill partitions that fit in the memory budget together, so up to as many workers compare partitions at once
+PARTITIONS_PER_BUDGET = 4
+
+def getFingerprint(fields):
+    ''' Hashes the compared fields of a record.
+    Args:
+        fields (List):  The compared fields.
+    Returns:
+        (Bytes):  The DIGEST_SIZE byte hash of the fields.
+    '''
+    return hashlib.blake2b(KEY_SEPARATOR.join(fields).encode('utf-8', 'surrogatepass'), digest_size=DIGEST_SIZE).digest()
+
+def newDiffCounts():
+    ''' Returns the counters of a diff.
+    Returns:
+        (Dictionary):  The number of added, removed, changed and unchanged records, and of the repeated keys of each file.
+    '''
+    return {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0, 'old_duplicates': 0, 'new_duplicates': 0}
+
+def buildTable(old_records, counts):
+    ''' Holds the records of the old file by key.
+    Args:
+        old_records (Iterable):  (key, fingerprint, fields) of the records of the old file.
+        counts (Dictionary):  Counters of the diff.  The repeated keys are added to it.
+    Returns:
+        (Dictionary):  (fingerprint, fields) by key, for the first record of each key.
+    '''
+    table = {}
+    for key, digest, fields in old_records:
+        if key in table:
+            counts['old_duplicates'] += 1
+        else:
+            table[key] = (digest, fields)
+    return table
+
+def diffRecords(table, new_records, column_names, counts):
+    ''' Compares the records of the new file with the records of the old file held by key.
+    Args:
+        table (Dictionary):  (fingerprint, fields) of the old records by key, from buildTable().  The keys found in the new file are removed from it.
+        new_records (Iterable):  (key, fingerprint, fields) of the records of the new file.
+        column_names (List):  Names of the compared columns.
+        counts (Dictionary):  Counters of the diff.  Updated as the records are compared.
+    Returns:
+        (Generator):  Yields the records of the diff:  the change, the changed columns and the compared fields (of the new record, or of the old record when it was removed).  The added and changed records come in the order of the new file, followed by the removed records.
+    '''
+    seen = set()
+    for key, digest, fields in new_records:
+        if key in seen:
+            counts['new_duplicates'] += 1
+            continue
+        seen.add(key)
+        old = table.pop(key, None)
+        if old is None:
+            counts['added'] += 1
+            yield ['added', ''] + fields
+        elif old[0] != digest:
+            counts['changed'] += 1
+            oldFields = old[1]
+            changed = [column_names[i] for i in range(len(fields)) if fields[i] != oldFields[i]]
+            yield ['changed', CHANGED_COLUMN_SEPARATOR.join(changed)] + fields
+        else:
+            counts['unchanged'] += 1
+    # The old records whose key was not found in the new file
+    for key, (digest, fields) in table.items():
+        counts['removed'] += 1
+        yield ['removed', ''] + fields
+    table.clear()
+
+def diffPartition(old_partition_path, new_partition_path, column_names, temp_directory=None):
+    ''' Compares one spill partition of each file, in a worker process.
+    Args:
+        old_partition_path (String):  Full path of the spill file of the old records, or None when the partition has no old record.
+        new_partition_path (String):  Full path of the spill file of the new records, or None when the partition has no new record.
+        column_names (List):  Names of the compared columns.
+        temp_directory (String):  Directory of the result file.  Defaults to the system temporary directory.
+    Returns:
+        (Tuple):  (full path of a run file with the records of the diff, counters of the partition).
+    '''
+    counts = newDiffCounts()
+    table = buildTable(((key, digest, fields) for key, (digest, fields) in readRun(old_partition_path)), counts) if old_partition_path else {}
+    newRecords = ((key, digest, fields) for key, (digest, fields) in readRun(new_partition_path)) if new_partition_path else []
+    return (writeRun(diffRecords(table, newRecords, column_names, counts), temp_directory, 'coti-diff-'), counts)
+
+class KeyedDiff(object):
+    ''' Compares the records of an old and a new file on their key columns, within a memory budget.
+    '''
+    def __init__(self, old_header, new_header, old_columns, new_columns, memory_budget=DEFAULT_MEMORY_BUDGET, workers=None, temp_directory=None, old_size=0):
+        ''' Class instantiation method
+        Args:
+            old_header (List):  The fields of the header record of the old file.
+            new_header (List):  The fields of the header record of the new file.
+            old_columns (List):  Names or positions of the key columns in the old file.
+            new_columns (List):  Names or positions of the matching key columns in the new file.
+            memory_budget (Integer):  Estimated bytes of old records held in memory before both files are spilled, shared by the workers.
+            workers (Integer):  Largest number of worker processes comparing the spill partitions, fewer when the partitions of the budget are large.  Defaults to the number of cores.
+            temp_directory (String):  Directory of the spill files.  Defaults to the system temporary directory.
+            old_size (Integer):  Size in bytes of the old file, which sizes the spill partitions.
+        Raises:
+            ColumnError:  A key column is not in its header.
+            ValueError:  The number of old and new key columns differ.
+        '''
+        if len(old_columns) != len(new_columns):
+            raise ValueError('The diff has ' + str(len(old_columns)) + ' old key columns and ' + str(len(new_columns)) + ' new key columns.')
+        self.memory_budget = memory_budget
+        self.workers = workers or os.cpu_count() or 1
+        self.temp_directory = temp_directory
+        self.old_size = old_size
+        self.counts = newDiffCounts()
+        self.spilled_bytes = 0
+        self.__old_key = makeJoinKeyFunction([resolveColumn(old_header, column) for column in old_columns])
+        self.__new_key = makeJoinKeyFunction([resolveColumn(new_header, column) for column in new_columns])
+        # The columns are compared by name, in the order of the old file
+        self.column_names = [name for name in old_header if name in new_header]
+        self.old_only = [name for name in old_header if name not in new_header]
+        self.new_only = [name for name in new_header if name not in old_header]
+        self.__old_indexes = [old_header.index(name) for name in self.column_names]
+        self.__new_indexes = [new_header.index(name) for name in self.column_names]
+        self.__spills = []
+        self.__results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def getHeader(self):
+        ''' Returns the header of the records of the diff.
+        Returns:
+            (List):  DIFF_COLUMNS followed by the compared columns.
+        '''
+        return DIFF_COLUMNS + self.column_names
+
+    def compare(self, old_rows, new_rows):
+        ''' Compares the records of the two files.
+        Args:
+            old_rows (Iterable):  The records of the old file.
+            new_rows (Iterable):  The records of the new file.
+        Returns:
+            (Generator):  Yields the records of the diff (see diffRecords()).
+        '''
+        oldRecords = self.__fingerprint(old_rows, self.__old_key, self.__old_indexes)
+        newRecords = self.__fingerprint(new_rows, self.__new_key, self.__new_indexes)
+        table = {}
+        intBytes = 0
+        intBudget = self.memory_budget
+        for key, digest, fields in oldRecords:
+            if key in table:
+                self.counts['old_duplicates'] += 1
+                continue
+            table[key] = (digest, fields)
+            intBytes += KEY_OVERHEAD + DIGEST_SIZE + ROW_OVERHEAD + FIELD_OVERHEAD * len(fields) + sum(map(len, fields))
+            if intBytes >= intBudget:
+                break
+        else:
+            yield from diffRecords(table, newRecords, self.column_names, self.counts)
+            return
+
+        intPartitions = min(max(SPILL_PARTITIONS, math.ceil(self.old_size * MEMORY_PER_FILE_BYTE * PARTITIONS_PER_BUDGET / max(intBudget, 1))), MAX_PARTITIONS)
+        # Each worker holds one partition of the old records at a time, so fewer workers run when the partitions are large
+        intWorkers = max(1, min(self.workers, intBudget * intPartitions // max(self.old_size * MEMORY_PER_FILE_BYTE, 1)))
+        oldSpill = SpillPartitions(intPartitions, 0, self.temp_directory)
+        newSpill = SpillPartitions(intPartitions, 0, self.temp_directory)
+        self.__spills += [oldSpill, newSpill]
+        for key, (digest, fields) in table.items():
+            oldSpill.add(key, (digest, fields))
+        table = None
+        for key, digest, fields in oldRecords:
+            oldSpill.add(key, (digest, fields))
+        for key, digest, fields in newRecords:
+            newSpill.add(key, (digest, fields))
+        self.spilled_bytes += oldSpill.finish() + newSpill.finish()
+
+        pairs = [(strOld, strNew) for strOld, strNew in zip(oldSpill.paths, newSpill.paths) if strOld is not None or strNew is not None]
+        if intWorkers == 1 or len(pairs) < 2:
+            for strOld, strNew in pairs:
+                yield from self.__readResult(diffPartition(strOld, strNew, self.column_names, self.temp_directory))
+        else:
+            with ProcessPoolExecutor(max_workers=min(intWorkers, len(pairs))) as executor:
+                futures = [executor.submit(diffPartition, strOld, strNew, self.column_names, self.temp_directory) for strOld, strNew in pairs]
+                try:
+                    for future in futures:
+                        yield from self.__readResult(future.result())
+                finally:
+                    # The result files of the partitions that were not read when the diff stopped early
+                    for future in futures:
+                        if not future.cancel() and future.exception() is None:
+                            self.__results.append(future.result()[0])
+        oldSpill.close()
+        newSpill.close()
+
+    def close(self):
+        ''' Deletes the spill and result files.
+        '''
+        for spill in self.__spills:
+            spill.close()
+        self.__spills = []
+        for path in self.__results:
+            if os.path.exists(path):
+                os.remove(path)
+        self.__results = []
+
+    def __fingerprint(self, rows, key_function, indexes):
+        ''' Reduces the records of a file to their key, fingerprint and compared fields.
+        Args:
+            rows (Iterable):  The records of the file.
+            key_function (Callable):  Returns the key of a record.
+            indexes (List):  Positions of the compared columns in the file.
+        Returns:
+            (Generator):  Yields (key, fingerprint, fields) for each record.  Missing fields are blank.
+        '''
+        intWidth = max(indexes) + 1 if indexes else 0
+        for row in rows:
+            if len(row) < intWidth:
+                row = row + [''] * (intWidth - len(row))
+            fields = [row[i] for i in indexes]
+            yield (key_function(row), getFingerprint(fields), fields)
+
+    def __readResult(self, result):
+        ''' Hands out the records of the diff of a partition and deletes its result file.
+        Args:
+            result (Tuple):  (result file, counters) of the partition, from diffPartition().
+        Returns:
+            (Generator):  Yields the records of the diff of the partition.
+        '''
+        strResultPath, counts = result
+        self.__results.append(strResultPath)
+        for name, value in counts.items():
+            self.counts[name] += value
+        yield from readRun(strResultPath)
+        os.remove(strResultPath)
+        self.__results.remove(strResultPath)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import contextlib
+import csv
+'''
+CSVFields is a function script that lets the csv module parse records with fields of any size (e.g. multi-megabyte free-text fields).  By
+default the csv reader stops with "field larger than field limit (131072)" on the first field over 128KB.
+
+Notes:
+    csv.field_size_limit() is shared by every reader of the process, so the limit is only raised while the records of a large field read
+    are parsed, and put back afterwards.  The limit is stored in a C long, which has 32 bits on Windows, so sys.maxsize cannot be used there.
+'''
+
+# Largest field size limit accepted on every platform
+MAX_FIELD_SIZE_LIMIT = 2 ** 31 - 1
+
+class FieldSizeError(ValueError):
+    ''' Raised when a record has a field over the field size limit of the csv reader.
+    '''
+    pass
+
+def isFieldSizeError(error):
+    ''' Checks whether a csv.Error was raised by a field over the field size limit.
+    Args:
+        error (csv.Error):  The error raised by a csv reader.
+    Returns:
+        (Boolean):  True if the field was over the limit.
+    '''
+    return 'field larger than field limit' in str(error)
+
+@contextlib.contextmanager
+def fieldSizeLimit(limit=MAX_FIELD_SIZE_LIMIT):
+    ''' Raises the longest field the csv readers accept for the duration of a with block.
+    Args:
+        limit (Integer):  Longest field in characters.  None keeps the current limit.
+    Returns:
+        (ContextManager):  Puts the previous limit back when the block exits.
+    '''
+    if limit is None:
+        yield
+        return
+    intPrevious = csv.field_size_limit(limit)
+    try:
+        yield
+    finally:
+        csv.field_size_limit(intPrevious)
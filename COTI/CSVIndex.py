@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import struct
+from array import array
+from CSVBytes import RecordLocator
+'''
+CSVIndex is a function script that keeps a sidecar index of record offsets next to a CSV file, so that later runs can seek straight to any
+record instead of scanning the file from the beginning.
+
+Notes:
+    The index file (<source file>.idx) holds the byte offset where every stride-th record starts (record 0 is the header), keyed on the size
+    and modification time of the source file.  When a file only grew (e.g. a log-style extract that is appended to), only the new tail is scanned.
+'''
+
+INDEX_EXTENSION = '.idx'
+INDEX_MAGIC = b'COTIIDX1'
+DEFAULT_STRIDE = 10000
+# Number of bytes before the end of the indexed records that are hashed to check that a grown file was only appended to
+SIGNATURE_BYTES = 4096
+
+# magic, stride, file size, mtime (ns), record count, terminated record count, scanned offset, signature, number of offsets
+HEADER_FORMAT = '<8sQQqQQQ16sQ'
+
+class CSVIndex(object):
+    ''' Sampled record offsets of a CSV file.
+    '''
+    def __init__(self, source_file_path, stride=DEFAULT_STRIDE):
+        ''' Class instantiation method
+        Args:
+            source_file_path (String):  Contains the full file path and file name of the source file.
+            stride (Integer):  The offset of every stride-th record is kept.  Smaller values make seeks faster and the index larger.
+        '''
+        self.source_file_path = source_file_path
+        self.index_file_path = source_file_path + INDEX_EXTENSION
+        self.stride = stride
+        self.file_size = 0
+        self.mtime_ns = 0
+        # Number of records, including the header and a last record that does not end with a line feed
+        self.record_count = 0
+        # Number of records that end with a line feed, and the offset right after the last one
+        self.terminated_count = 0
+        self.scanned_offset = 0
+        self.signature = b''
+        self.offsets = array('Q')
+
+    def refresh(self):
+        ''' Makes the index match the source file: loads the sidecar if it is current, scans only the appended tail if the file grew, otherwise rebuilds it.  The sidecar is saved when it changed.
+        Returns:
+            (CSVIndex):  This index.
+        '''
+        stat = os.stat(self.source_file_path)
+        blnLoaded = self.load()
+
+        if blnLoaded and self.file_size == stat.st_size and self.mtime_ns == stat.st_mtime_ns:
+            print('[INFO] Using record index: ', self.index_file_path)
+            return self
+
+        if blnLoaded and stat.st_size > self.file_size and self.signature == self.__readSignature(self.scanned_offset):
+            print('[INFO] Source file grew.  Updating record index from offset ', self.scanned_offset)
+            # Drop the samples of the last record if it was not complete, it is scanned again with the new tail
+            del self.offsets[-(-self.terminated_count // self.stride):]
+            self.__scan(self.scanned_offset, self.terminated_count)
+        else:
+            print('[INFO] Building record index: ', self.index_file_path)
+            self.offsets = array('Q')
+            self.__scan(0, 0)
+
+        self.file_size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.save()
+        return self
+
+    def __scan(self, start_offset, records):
+        ''' Scans the source file from a record start and adds the offset of every stride-th record.
+        Args:
+            start_offset (Integer):  Offset right after a record terminator.
+            records (Integer):  Number of records before start_offset.  The offsets of the samples before it must already be in offsets.
+        '''
+        with RecordLocator(self.source_file_path, start_offset) as locator:
+            while True:
+                if records % self.stride == 0:
+                    self.offsets.append(locator.offset)
+                intSkipped = locator.skipRecords(self.stride - records % self.stride)
+                if intSkipped == 0:
+                    break
+                records += intSkipped
+
+            if locator.unterminated_offset is not None:
+                self.terminated_count = records - 1
+                self.scanned_offset = locator.unterminated_offset
+            else:
+                self.terminated_count = records
+                self.scanned_offset = locator.offset
+
+        # The last sample is only a record start if that record exists
+        self.record_count = records
+        del self.offsets[-(-records // self.stride):]
+        self.signature = self.__readSignature(self.scanned_offset)
+
+    def __readSignature(self, end_offset):
+        ''' Hashes the bytes right before an offset of the source file.
+        Args:
+            end_offset (Integer):  Offset right after the last byte to hash.
+        Returns:
+            (Bytes):  16 byte digest.
+        '''
+        intStart = max(0, end_offset - SIGNATURE_BYTES)
+        with open(self.source_file_path, 'rb') as filehandler:
+            filehandler.seek(intStart)
+            return hashlib.blake2b(filehandler.read(end_offset - intStart), digest_size=16).digest()
+
+    def load(self):
+        ''' Reads the sidecar index file if there is one.
+        Returns:
+            (Boolean):  True if the index was read.  False if there is no index file, or it is invalid or built with another stride.
+        '''
+        try:
+            with open(self.index_file_path, 'rb') as filehandler:
+                header = filehandler.read(struct.calcsize(HEADER_FORMAT))
+                magic, stride, file_size, mtime_ns, record_count, terminated_count, scanned_offset, signature, intOffsets = struct.unpack(HEADER_FORMAT, header)
+                if magic != INDEX_MAGIC or stride != self.stride:
+                    return False
+                offsets = array('Q')
+                offsets.fromfile(filehandler, intOffsets)
+        except (OSError, struct.error, EOFError):
+            return False
+
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+        self.record_count = record_count
+        self.terminated_count = terminated_count
+        self.scanned_offset = scanned_offset
+        self.signature = signature
+        self.offsets = offsets
+        return True
+
+    def save(self):
+        ''' Writes the sidecar index file.  It is written to a temporary file first and then renamed, so a reader never sees a partial index.
+        '''
+        strTempPath = self.index_file_path + '.tmp'
+        with open(strTempPath, 'wb') as filehandler:
+            filehandler.write(struct.pack(HEADER_FORMAT, INDEX_MAGIC, self.stride, self.file_size, self.mtime_ns, self.record_count, self.terminated_count, self.scanned_offset, self.signature, len(self.offsets)))
+            self.offsets.tofile(filehandler)
+        os.replace(strTempPath, self.index_file_path)
+
+    def getRecordOffset(self, record_number):
+        ''' Finds the byte offset where a record starts by seeking to the closest sample and skipping the records after it.
+        Args:
+            record_number (Integer):  Number of the record, where 0 is the header.
+        Returns:
+            (Integer):  Offset where the record starts, or the size of the file if record_number is past the last record.
+        '''
+        if record_number >= self.record_count:
+            return self.file_size
+        intSample = record_number // self.stride
+        intOffset = self.offsets[intSample]
+        intSkip = record_number - intSample * self.stride
+        if intSkip == 0:
+            return intOffset
+        with RecordLocator(self.source_file_path, intOffset) as locator:
+            locator.skipRecords(intSkip)
+            return locator.offset
+
+    def getChunkOffsets(self, chunk_size, first_record=1):
+        ''' Finds the byte offsets that split the records into chunks of chunk_size records.
+        Args:
+            chunk_size (Integer):  The number of records in each chunk.
+            first_record (Integer):  Number of the first record to chunk.  Defaults to the first record after the header.
+        Returns:
+            (List):  Offsets where each chunk starts, followed by the offset where the last chunk ends.
+        '''
+        return [self.getRecordOffset(i) for i in range(first_record, self.record_count, chunk_size)] + [self.file_size]
+
+    def getRecordRanges(self, parts, first_record=1):
+        ''' Splits the records into byte ranges that start and end at record boundaries, e.g. to hand them out to worker processes.
+        Args:
+            parts (Integer):  Number of ranges wanted.  There can be less of them for files with fewer records than parts.
+            first_record (Integer):  Number of the first record to split.  Defaults to the first record after the header.
+        Returns:
+            (List):  (start offset, end offset, number of the first record) tuples covering the records in order.
+        '''
+        intRecords = max(self.record_count - first_record, 0)
+        intStep = max(-(-intRecords // max(parts, 1)), 1)
+        starts = list(range(first_record, self.record_count, intStep)) or [first_record]
+        offsets = [self.getRecordOffset(i) for i in starts] + [self.file_size]
+        return [(offsets[i], offsets[i + 1], starts[i]) for i in range(len(starts))]
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+import os
+import pickle
+import tempfile
+import zlib
+from operator import itemgetter
+from CSVSort import DEFAULT_MEMORY_BUDGET, ROW_OVERHEAD, FIELD_OVERHEAD, SPILL_BATCH_SIZE, readRun
+from CSVDedup import KEY_OVERHEAD, KEY_SEPARATOR, SPILL_PARTITIONS
+from CSVTransform import resolveColumn
+'''
+CSVJoin is a function script that joins the records of two CSV files on key columns (e.g. payment records with the employee master file).
+A hash table is built on the records of the smaller file and the records of the larger file are streamed through it, so only the smaller
+file is held in memory.  When the smaller file does not fit in the memory budget, the records of both files are spilled to hash
+partitioned temporary files (grace hash join) and the partitions are joined one at a time.
+
+Notes:
+    Each output record is the left record followed by the right record without its key columns.  With a left join, a left record without
+    a matching right record is written once with blank right fields.  The records follow the order of the streamed file as long as nothing
+    is spilled.  A partition that still does not fit is partitioned again, up to MAX_PARTITION_DEPTH times (the records of one key cannot
+    be split any further).
+'''
+
+JOIN_TYPES = ['inner', 'left']
+# Separates the left and right column of a key that has a different name in each file (e.g. PersonnelNo=EmployeeId)
+KEY_PAIR_SEPARATOR = '='
+# Number of times a partition that does not fit in the memory budget is partitioned again
+MAX_PARTITION_DEPTH = 2
+
+def parseJoinKeys(specification):
+    ''' Reads the key columns of a join from their command line form:  comma separated columns, each with an optional right column.
+        e.g. "EmployeeId", "CompanyCode,PersonnelNo=EmployeeId"
+    Args:
+        specification (String):  The key columns in their command line form.
+    Returns:
+        (Tuple):  (left columns, right columns), in the same order.
+    Raises:
+        ValueError:  A column is blank.
+    '''
+    leftColumns = []
+    rightColumns = []
+    for key in specification.split(','):
+        left, strSeparator, right = key.partition(KEY_PAIR_SEPARATOR)
+        if not strSeparator:
+            right = left
+        if left == '' or right == '':
+            raise ValueError('Invalid key ' + key + '.  A key is a column, or a column of -file and a column of the other file separated with ' + KEY_PAIR_SEPARATOR + ' (e.g. PersonnelNo=EmployeeId).')
+        leftColumns.append(left)
+        rightColumns.append(right)
+    return (leftColumns, rightColumns)
+
+def makeJoinKeyFunction(indexes):
+    ''' Builds the function that returns the join key of a record.
+    Args:
+        indexes (List):  Positions of the key columns.
+    Returns:
+        (Callable):  Returns the key field of a record, or a tuple of its key fields.  A missing field is blank.
+    '''
+    if len(indexes) == 1:
+        intColumn = indexes[0]
+        return lambda row: row[intColumn] if intColumn < len(row) else ''
+    return lambda row: tuple([row[i] if i < len(row) else '' for i in indexes])
+
+def getPartition(key, depth, partitions):
+    ''' Returns the spill partition of a key.  Unlike hash() of a string, which is salted for each process, the partition of a key is the
+    same on every run, so the spilled records come out in the same order.
+    Args:
+        key (String):  The key of a record (a tuple for several key columns).
+        depth (Integer):  Number of times the records were partitioned, which changes the hash so a partition is split again.
+        partitions (Integer):  Number of partitions.
+    Returns:
+        (Integer):  The partition of the key, from 0 to partitions - 1.
+    '''
+    if not isinstance(key, str):
+        key = KEY_SEPARATOR.join(key)
+    # Each depth takes the next bits of the CRC32, so the keys of one partition are spread again.  A different CRC seed would not do:
+    # the CRC is linear, so the keys of one length would only move to another partition together.
+    return (zlib.crc32(key.encode('utf-8', 'surrogatepass')) // partitions ** depth) % partitions
+
+class SpillPartitions(object):
+    ''' Temporary files the (key, record) pairs of one side of a join are spilled to, one per hash partition of the keys.
+    '''
+    def __init__(self, partitions, depth, temp_directory=None):
+        ''' Class instantiation method
+        Args:
+            partitions (Integer):  Number of hash partitions.
+            depth (Integer):  Number of times the records were partitioned, which changes the hash so a partition is split again.
+            temp_directory (String):  Directory of the spill files.  Defaults to the system temporary directory.
+        '''
+        self.partitions = partitions
+        self.depth = depth
+        self.temp_directory = temp_directory
+        # The file of a partition is created with its first record, so a partition without records has no path
+        self.paths = [None] * partitions
+        self.__files = [None] * partitions
+        self.__buffers = [[] for i in range(partitions)]
+
+    def add(self, key, row):
+        ''' Adds a record to the spill file of the partition of its key.
+        Args:
+            key (String):  The join key of the record (a tuple for several key columns).
+            row (List):  The fields of the record.
+        '''
+        intPartition = getPartition(key, self.depth, self.partitions)
+        buffer = self.__buffers[intPartition]
+        buffer.append((key, row))
+        if len(buffer) >= SPILL_BATCH_SIZE:
+            self.__write(intPartition)
+
+    def __write(self, partition):
+        ''' Writes the buffered records of a partition to its spill file, creating the file the first time.
+        Args:
+            partition (Integer):  Number of the partition.
+        '''
+        if self.__files[partition] is None:
+            intHandle, self.paths[partition] = tempfile.mkstemp(prefix='coti-join-', suffix='.part', dir=self.temp_directory)
+            self.__files[partition] = os.fdopen(intHandle, 'wb')
+        pickle.dump(self.__buffers[partition], self.__files[partition], pickle.HIGHEST_PROTOCOL)
+        self.__buffers[partition] = []
+
+    def finish(self):
+        ''' Writes the buffered records and closes the spill files, so they can be read back with CSVSort.readRun().
+        Returns:
+            (Integer):  Total size in bytes of the spill files.
+        '''
+        intBytes = 0
+        for i in range(self.partitions):
+            if self.__buffers[i]:
+                self.__write(i)
+            if self.__files[i] is not None:
+                intBytes += self.__files[i].tell()
+                self.__files[i].close()
+        self.__files = []
+        self.__buffers = []
+        return intBytes
+
+    def close(self):
+        ''' Closes and deletes the spill files that are left.
+        '''
+        for filehandler in self.__files:
+            if filehandler is not None:
+                filehandler.close()
+        self.__files = []
+        for path in self.paths:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+        self.paths = []
+
+class HashJoiner(object):
+    ''' Joins the records of a left and a right file on their key columns, within a memory budget.
+    '''
+    def __init__(self, left_header, right_header, left_columns, right_columns, join_type='inner', build_side='right', memory_budget=DEFAULT_MEMORY_BUDGET, temp_directory=None, partitions=SPILL_PARTITIONS):
+        ''' Class instantiation method
+        Args:
+            left_header (List):  The fields of the header record of the left file.
+            right_header (List):  The fields of the header record of the right file.
+            left_columns (List):  Names or positions of the key columns in the left file.
+            right_columns (List):  Names or positions of the matching key columns in the right file.
+            join_type (String):  'inner' writes the matching records only, 'left' also writes the left records without a match.
+            build_side (String):  File whose records are held in the hash table:  'left' or 'right', normally the smaller file.
+            memory_budget (Integer):  Estimated bytes of records held in the hash table before both files are spilled.
+            temp_directory (String):  Directory of the spill files.  Defaults to the system temporary directory.
+            partitions (Integer):  Number of hash partitions the records are spilled to.
+        Raises:
+            ColumnError:  A key column is not in its header.
+            ValueError:  The join type or the build side is not valid, or the number of left and right key columns differ.
+        '''
+        if join_type not in JOIN_TYPES:
+            raise ValueError('Unknown join type ' + str(join_type) + '.  Valid join types are: ' + str(JOIN_TYPES))
+        if build_side not in ['left', 'right']:
+            raise ValueError('Unknown build side ' + str(build_side) + '.  The build side is left or right.')
+        if len(left_columns) != len(right_columns):
+            raise ValueError('The join has ' + str(len(left_columns)) + ' left key columns and ' + str(len(right_columns)) + ' right key columns.')
+        self.join_type = join_type
+        self.build_side = build_side
+        self.memory_budget = memory_budget
+        self.temp_directory = temp_directory
+        self.partitions = partitions
+        self.matched_count = 0
+        self.unmatched_count = 0
+        self.spilled_bytes = 0
+        self.__left_width = len(left_header)
+        rightIndexes = [resolveColumn(right_header, column) for column in right_columns]
+        self.__left_key = makeJoinKeyFunction([resolveColumn(left_header, column) for column in left_columns])
+        self.__right_key = makeJoinKeyFunction(rightIndexes)
+        # The right key columns are not repeated in the output, since they hold the same values as the left ones
+        self.__right_kept = [i for i in range(len(right_header)) if i not in rightIndexes]
+        self.__header = list(left_header) + [right_header[i] for i in self.__right_kept]
+        self.__project = self.__makeProjection(self.__right_kept)
+        self.__blank = [''] * len(self.__right_kept)
+        self.__spills = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def getHeader(self):
+        ''' Returns the header of the joined records.
+        Returns:
+            (List):  The left header followed by the right header without its key columns.
+        '''
+        return self.__header
+
+    def isSpilled(self):
+        ''' Returns whether the build side did not fit in the memory budget and the records were spilled to disk.
+        Returns:
+            (Boolean):  True once spill files were written.
+        '''
+        return self.spilled_bytes > 0
+
+    def join(self, left_rows, right_rows):
+        ''' Joins the records of the two files.
+        Args:
+            left_rows (Iterable):  The records of the left file.
+            right_rows (Iterable):  The records of the right file.
+        Returns:
+            (Generator):  Yields the joined records.
+        '''
+        if self.build_side == 'right':
+            buildPairs = ((self.__right_key(row), row) for row in right_rows)
+            probePairs = ((self.__left_key(row), row) for row in left_rows)
+        else:
+            buildPairs = ((self.__left_key(row), row) for row in left_rows)
+            probePairs = ((self.__right_key(row), row) for row in right_rows)
+        yield from self.__joinPairs(buildPairs, probePairs, 0)
+
+    def close(self):
+        ''' Deletes the spill files.
+        '''
+        for spill in self.__spills:
+            spill.close()
+        self.__spills = []
+
+    def __joinPairs(self, build_pairs, probe_pairs, depth):
+        ''' Joins (key, record) pairs:  builds the hash table and probes it, or spills both sides when the build side does not fit.
+        Args:
+            build_pairs (Iterable):  The pairs of the build side.
+            probe_pairs (Iterable):  The pairs of the probe side.
+            depth (Integer):  Number of times these pairs were partitioned.
+        Returns:
+            (Generator):  Yields the joined records.
+        '''
+        build_pairs = iter(build_pairs)
+        table = {}
+        intBytes = 0
+        # Past the last depth the records are all held, since the records of one key cannot be split any further
+        intBudget = self.memory_budget if depth < MAX_PARTITION_DEPTH else None
+        for key, row in build_pairs:
+            rows = table.get(key)
+            if rows is None:
+                table[key] = [row]
+                intBytes += KEY_OVERHEAD
+            else:
+                rows.append(row)
+            intBytes += ROW_OVERHEAD + FIELD_OVERHEAD * len(row) + sum(map(len, row))
+            if intBudget is not None and intBytes >= intBudget:
+                break
+        else:
+            yield from self.__probe(table, probe_pairs)
+            return
+
+        buildSpill = SpillPartitions(self.partitions, depth, self.temp_directory)
+        probeSpill = SpillPartitions(self.partitions, depth, self.temp_directory)
+        self.__spills += [buildSpill, probeSpill]
+        for key, rows in table.items():
+            for row in rows:
+                buildSpill.add(key, row)
+        table = None
+        for key, row in build_pairs:
+            buildSpill.add(key, row)
+        for key, row in probe_pairs:
+            probeSpill.add(key, row)
+        self.spilled_bytes += buildSpill.finish() + probeSpill.finish()
+
+        for i, (strBuildPath, strProbePath) in enumerate(zip(buildSpill.paths, probeSpill.paths)):
+            if strBuildPath is None and strProbePath is None:
+                continue
+            yield from self.__joinPairs(readRun(strBuildPath) if strBuildPath else [], readRun(strProbePath) if strProbePath else [], depth + 1)
+            for strPath in [strBuildPath, strProbePath]:
+                if strPath is not None:
+                    os.remove(strPath)
+            buildSpill.paths[i] = probeSpill.paths[i] = None
+
+    def __probe(self, table, probe_pairs):
+        ''' Streams the probe side through the hash table of the build side.
+        Args:
+            table (Dictionary):  The records of the build side by key.
+            probe_pairs (Iterable):  The (key, record) pairs of the probe side.
+        Returns:
+            (Generator):  Yields the joined records.
+        '''
+        project = self.__project
+        intMatched = 0
+        intUnmatched = 0
+        try:
+            if self.build_side == 'right':
+                blnLeft = self.join_type == 'left'
+                for key, row in probe_pairs:
+                    row = self.__padLeft(row)
+                    matches = table.get(key)
+                    if matches is not None:
+                        intMatched += len(matches)
+                        for match in matches:
+                            yield row + project(match)
+                    elif blnLeft:
+                        intUnmatched += 1
+                        yield row + self.__blank
+                return
+
+            matchedKeys = set()
+            for key, row in probe_pairs:
+                matches = table.get(key)
+                if matches is not None:
+                    matchedKeys.add(key)
+                    intMatched += len(matches)
+                    right = project(row)
+                    for match in matches:
+                        yield self.__padLeft(match) + right
+            if self.join_type == 'left':
+                # The left records held in the hash table that no right record matched
+                for key, matches in table.items():
+                    if key not in matchedKeys:
+                        intUnmatched += len(matches)
+                        for match in matches:
+                            yield self.__padLeft(match) + self.__blank
+        finally:
+            self.matched_count += intMatched
+            self.unmatched_count += intUnmatched
+
+    def __padLeft(self, row):
+        ''' Fills the missing fields of a short left record, so the right fields line up with the header.
+        Args:
+            row (List):  A left record.
+        Returns:
+            (List):  The record, with blank fields added when it is shorter than the left header.
+        '''
+        if len(row) < self.__left_width:
+            return row + [''] * (self.__left_width - len(row))
+        return row
+
+    def __makeProjection(self, indexes):
+        ''' Builds the function that keeps the fields of a right record that are written.
+        Args:
+            indexes (List):  Positions of the right columns that are not key columns.
+        Returns:
+            (Callable):  Returns a new list with the fields.  Missing fields are blank.
+        '''
+        if not indexes:
+            return lambda row: []
+        getter = itemgetter(*indexes)
+        intWidth = max(indexes) + 1
+
+        def project(row):
+            if len(row) < intWidth:
+                row = row + [''] * (intWidth - len(row))
+            return [getter(row)] if len(indexes) == 1 else list(getter(row))
+        return project
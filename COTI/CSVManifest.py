@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import threading
+import time
+from CSVBytes import RecordLocator
+'''
+CSVManifest is a function script that keeps the manifest of a chunk run:  the output path, record range, source byte offsets and size of
+every chunk file that was completely written, together with a fingerprint of the source file and the chunking settings.  A run that died
+can then be resumed from the first chunk that was not finished, seeking straight to its offset in the source file.
+
+Notes:
+    The manifest is written to a temporary file and renamed, so a reader never sees a partial manifest.  It is saved at most every
+    MANIFEST_SAVE_SECONDS while chunks are written (and when the run ends), so a resumed run redoes at most the chunks of those seconds.
+    Before a run is resumed, the chunk files of the manifest are checked against their recorded sizes, and the run resumes from the first
+    chunk file that is missing or was changed.
+'''
+
+MANIFEST_VERSION = 1
+MANIFEST_SAVE_SECONDS = 5.0
+# Number of bytes at the start of the source file hashed into its fingerprint
+FINGERPRINT_BYTES = 65536
+
+def getFingerprint(source_file_path):
+    ''' Identifies the content of a source file without reading all of it.
+    Args:
+        source_file_path (String):  Contains the full file path and file name of the source file.
+    Returns:
+        (Dictionary):  Size, modification time (ns) and hash of the first FINGERPRINT_BYTES of the file.
+    '''
+    stat = os.stat(source_file_path)
+    with open(source_file_path, 'rb') as filehandler:
+        strDigest = hashlib.blake2b(filehandler.read(FINGERPRINT_BYTES), digest_size=16).hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'head_digest': strDigest}
+
+class ChunkManifest(object):
+    ''' Chunks completely written by a chunk run.  addChunk() can be called from the writer thread.
+    '''
+    def __init__(self, manifest_file_path, source_file_path, settings, save_seconds=MANIFEST_SAVE_SECONDS):
+        ''' Class instantiation method
+        Args:
+            manifest_file_path (String):  Full path of the manifest file.
+            source_file_path (String):  Contains the full file path and file name of the source file.
+            settings (Dictionary):  The chunking settings (chunk size, encoding...) that must be the same to resume a run.  Must be JSON serializable.
+            save_seconds (Float):  Least number of seconds between two saves of the manifest while chunks are added.
+        '''
+        self.manifest_file_path = manifest_file_path
+        self.source_file_path = source_file_path
+        self.settings = settings
+        self.save_seconds = save_seconds
+        self.fingerprint = None
+        # Offset of the first record after the header, where the first chunk starts
+        self.start_offset = 0
+        self.chunks = []
+        self.complete = False
+        self.record_count = 0
+        self.__saved = 0.0
+        self.__lock = threading.Lock()
+
+    def load(self):
+        ''' Reads the manifest file if it belongs to the current source file and settings.
+        Returns:
+            (Boolean):  True if the manifest was read.  False if there is no manifest file, it is invalid, or the source file or the settings changed.
+        '''
+        try:
+            with open(self.manifest_file_path, 'r', encoding='utf-8') as filehandler:
+                manifest = json.load(filehandler)
+            if manifest.get('version') != MANIFEST_VERSION or manifest.get('settings') != self.settings:
+                return False
+            if manifest.get('fingerprint') != getFingerprint(self.source_file_path):
+                return False
+            self.fingerprint = manifest['fingerprint']
+            self.start_offset = manifest['start_offset']
+            self.chunks = manifest['chunks']
+            self.complete = manifest['complete']
+            self.record_count = manifest['record_count']
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        return True
+
+    def start(self, start_offset):
+        ''' Starts a new manifest for a run from the first record.
+        Args:
+            start_offset (Integer):  Offset of the first record after the header.
+        '''
+        self.fingerprint = getFingerprint(self.source_file_path)
+        self.start_offset = start_offset
+        self.chunks = []
+        self.complete = False
+        self.record_count = 0
+        self.save()
+
+    def verifyChunks(self):
+        ''' Drops the chunks from the first one whose file is missing or does not have its recorded size, since the run has to write it again.
+        Returns:
+            (Integer):  Number of chunks kept.
+        '''
+        for i, chunk in enumerate(self.chunks):
+            try:
+                blnValid = os.path.getsize(chunk['path']) == chunk['bytes']
+            except OSError:
+                blnValid = False
+            if not blnValid:
+                del self.chunks[i:]
+                self.complete = False
+                break
+        return len(self.chunks)
+
+    def getResumePoint(self):
+        ''' Returns where a resumed run continues:  right after the last chunk that was finished.
+        Returns:
+            (Tuple):  (number of the next chunk, number of its first record, its byte offset in the source file).
+        '''
+        if not self.chunks:
+            return (1, 1, self.start_offset)
+        last = self.chunks[-1]
+        return (last['piece'] + 1, last['last_record'] + 1, last['end_offset'])
+
+    def addChunk(self, piece, output_path, first_record, last_record, start_offset, end_offset):
+        ''' Adds a chunk once its file is completely written and closed.
+        Args:
+            piece (Integer):  Number of the chunk.
+            output_path (String):  Full path of the chunk file.
+            first_record (Integer):  Number of the first record of the chunk in the source file, where 1 is the first record after the header.
+            last_record (Integer):  Number of its last record.
+            start_offset (Integer):  Offset of its first record in the source file.
+            end_offset (Integer):  Offset right after its last record.
+        '''
+        with self.__lock:
+            self.chunks.append({
+                'piece': piece,
+                'path': output_path,
+                'first_record': first_record,
+                'last_record': last_record,
+                'start_offset': start_offset,
+                'end_offset': end_offset,
+                'bytes': os.path.getsize(output_path),
+            })
+            if time.perf_counter() - self.__saved >= self.save_seconds:
+                self.save()
+
+    def finish(self, record_count):
+        ''' Marks the run as complete and saves the manifest.
+        Args:
+            record_count (Integer):  Number of records written across all the chunks, including the chunks of the runs it resumed.
+        '''
+        with self.__lock:
+            self.complete = True
+            self.record_count = record_count
+            self.save()
+
+    def save(self):
+        ''' Writes the manifest file.  It is written to a temporary file first and then renamed, so a reader never sees a partial manifest.
+        '''
+        strTempPath = self.manifest_file_path + '.tmp'
+        with open(strTempPath, 'w', encoding='utf-8') as filehandler:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'source': os.path.abspath(self.source_file_path),
+                'fingerprint': self.fingerprint,
+                'settings': self.settings,
+                'start_offset': self.start_offset,
+                'complete': self.complete,
+                'record_count': self.record_count,
+                'chunks': self.chunks,
+            }, filehandler, indent=1)
+        os.replace(strTempPath, self.manifest_file_path)
+        self.__saved = time.perf_counter()
+
+class ManifestRecorder(object):
+    ''' Follows the chunks written from the source file and adds each one to a ChunkManifest once its file is closed.  The source offset
+    where each chunk ends is found by skipping its records at the byte level (see CSVBytes.RecordLocator), alongside the parsing.
+    '''
+    def __init__(self, manifest, first_record, start_offset):
+        ''' Class instantiation method
+        Args:
+            manifest (ChunkManifest):  The manifest of the run.
+            first_record (Integer):  Number of the first record of the next chunk, where 1 is the first record after the header.
+            start_offset (Integer):  Offset of that record in the source file.
+        '''
+        self.manifest = manifest
+        self.__next_record = first_record
+        self.__locator = RecordLocator(manifest.source_file_path, start_offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def chunkWritten(self, piece, output_path, record_count):
+        ''' Moves past the records of a chunk whose records were all handed to the writer.
+        Args:
+            piece (Integer):  Number of the chunk.
+            output_path (String):  Full path of the chunk file.
+            record_count (Integer):  Number of records of the chunk.
+        Returns:
+            (Callable):  Adds the chunk to the manifest.  To be called once the chunk file is closed (see ChunkWriter.closeFile()).
+        '''
+        intStart = self.__locator.offset
+        self.__locator.skipRecords(record_count)
+        intFirst = self.__next_record
+        self.__next_record += record_count
+        chunk = (piece, output_path, intFirst, intFirst + record_count - 1, intStart, self.__locator.offset)
+        return lambda: self.manifest.addChunk(*chunk)
+
+    def close(self):
+        ''' Closes the source file.
+        '''
+        self.__locator.close()
+
+def describeTransforms(transforms):
+    ''' Describes transforms for the settings of a manifest, so a run is not resumed with other transforms.
+    Args:
+        transforms (List):  RowTransform instances, before they are bound to the header.
+    Returns:
+        (List):  The class and the arguments of each transform.  Functions are described by their module and name.
+    '''
+    descriptions = []
+    for transform in transforms or []:
+        arguments = {}
+        for name, value in vars(transform).items():
+            if callable(value):
+                arguments[name] = getattr(value, '__module__', '') + '.' + getattr(value, '__qualname__', '')
+            elif isinstance(value, (str, int, float, bool, list, type(None))):
+                arguments[name] = value
+        descriptions.append([type(transform).__name__, arguments])
+    return descriptions
@@ -1,19 +1,61 @@
 #!/usr/bin/env python3
+import codecs
+import contextlib
 import csv
+import io
+import itertools
 import os
+import re
+import types
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from CSVData import *
+import CSVBytes
+from CSVIndex import CSVIndex, DEFAULT_STRIDE
+from CSVTransform import RowExploder, TransformPipeline, resolveColumn
+from CSVSort import ExternalSorter, makeKeyFunction, readRun, DEFAULT_MEMORY_BUDGET
+from CSVDedup import Deduplicator, makeDigestFunction
+from CSVAggregate import Aggregator
+from CSVJoin import HashJoiner
+from CSVDiff import KeyedDiff
+from CSVValidate import DEFAULT_MAX_FIELD_SIZE, REPORT_HEADER, VALIDATION_ERRORS, validateHeader, validateRange
+from CSVDecode import DecodedLines, DecodeError, ESCAPE_ERRORS
+from CSVFields import MAX_FIELD_SIZE_LIMIT, FieldSizeError, fieldSizeLimit, isFieldSizeError
+from CSVManifest import ChunkManifest, ManifestRecorder, describeTransforms
+from CSVStats import timePhase
+from CSVWriter import ChunkWriter, PartitionWriter, MAX_OPEN_FILES
 '''
 CSVReader is a functon script that enables other scripts to read CSVs.
 '''
 
+# Longest partition name used in an output filename, before a hash of the key is added
+PARTITION_NAME_LENGTH = 100
+
 class CSVOps(object):
      # Private Class Attributes
      __working_directory = ''
      __source_file_name = ''
      __source_file_extension = ''
      __output_filename_template = ''
+     __source_file_path = ''
+     __encoding = 'utf-8'
+     __delimiter = ','
      __current_output_writer = None
+     __written_files = None
      __data_csv = None
+     __data_loaded = False
+     __index = None
+     __strip_nul = False
+     __stats = None
+     __selection = None
+     __cache = None
+     __validation_error_count = None
+     __decode_errors = 'strict'
+     __header_lines = None
+     __quarantine_file = None
+     __quarantine_encoder = None
+     __quarantine_count = 0
+     __large_fields = False
 
      def __init__(self):
           ''' Class instantiation method
@@ -21,28 +63,59 @@ class CSVOps(object):
           self.__delimiter = ','  # default delimiter to comma (,)
           self.instantiateDataCSV()
 
-     def __init__(self, source_file_path, encoding='utf-8', delimiter=','):
-          ''' Class instantiation method with parameters
+     def __init__(self, source_file_path, encoding='utf-8', delimiter=',', read_data=True, compact=False, strip_nul=False, stats=None, selection=None, cache=None, decode_errors='strict', large_fields=False):
+          r''' Class instantiation method with parameters
           Args:
                source_file_path (String):  Contains the full file path and file name of the source file (e.g. C:\directory\filepath\file.csv).
                encoding (String):  Defines the encoding which the source file should be read.  By code, defaults to utf-8.
                delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               read_data (Boolean):  Defines whether the whole file is read into CSVData.data (in-memory mode).  When False, only the source file is registered and the records are streamed by the operations that need them.
+               compact (Boolean):  Defines whether the records are stored in a CSVColumnarData instead of a CSVData, which takes a fraction of the memory for the same records.
+               strip_nul (Boolean):  Defines whether NUL characters are removed from the records while they are read or copied, instead of scrubbing the file first.
+               stats (RunStats):  Collects the runtime metrics of the reads and writes (see CSVStats).  None does not collect them.
+               selection (RowSelection):  Columns and records kept when the records are read (see CSVSelect).  CSVData.dataHeader then holds the selected columns, and the other columns and records are never kept.  None reads every column and record.
+               cache (ParseCache):  Cache directory the records read by readFile() are opened from, or saved to when the source file has no current cache file (see CSVCache).  None always parses the source file.
+               decode_errors (String):  What is done with the bytes of the source file that are not valid in its encoding (see CSVDecode):  'strict' stops with a DecodeError, 'replace' reads them as U+FFFD, 'quarantine' writes the records that hold them, with the invalid bytes unchanged, to a side file (e.g. Filename(quarantine).csv) instead of handing them out, and the records are then read by a single process.
+               large_fields (Boolean):  Defines whether records with fields over the 128KB the csv reader accepts by default are parsed (see CSVFields).  Each record is still held in memory with its fields, so the records that are only copied should be copied as bytes instead (see writeFileChunkRaw()).
+          Raises:
+               ValueError:  The quarantine policy is used with a row selection that has predicates.
           '''
-          self.instantiateDataCSV()
-          self.readFile(source_file_path, encoding, delimiter)
+          if decode_errors == 'quarantine' and selection is not None and selection.predicates:
+               raise ValueError('Records cannot be quarantined with a row selection that drops lines before they are parsed.')
+          self.__decode_errors = decode_errors
+          self.__large_fields = large_fields
+          self.__strip_nul = strip_nul
+          self.__stats = stats
+          self.__selection = selection
+          self.__cache = cache
+          self.__written_files = []
+          self.instantiateDataCSV(compact)
+          if read_data:
+               self.readFile(source_file_path, encoding, delimiter)
+          else:
+               self.setSourceFile(source_file_path, encoding, delimiter)
      
-     def instantiateDataCSV(self):
+     def instantiateDataCSV(self, compact=False):
           ''' Instantiates the CSVData object to store the data from the CSV file.
+          Args:
+               compact (Boolean):  Defines whether a CSVColumnarData is used instead.  It stores the records column by column and exposes them through the same data and dataHeader attributes.
           '''
-          self.__data_csv = CSVData()
+          if compact:
+               self.__data_csv = CSVColumnarData()
+          else:
+               self.__data_csv = CSVData()
 
-     def readFile(self, source_file_path, encoding='utf-8', delimiter=','):
-          ''' Reads a csv file and converts each line and its field into an array where the element of the arrays contains the column data for each CSV record.
+     def setSourceFile(self, source_file_path, encoding='utf-8', delimiter=','):
+          r''' Registers the source file and builds the output filename template without reading any records.
           Args:
                source_file_path (String):  Contains the full file path and file name of the source file (e.g. C:\directory\filepath\file.csv).
                encoding (String):  Defines the encoding which the source file should be read.  By code, defaults to utf-8.
                delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
           '''
+          self.__source_file_path = source_file_path
+          self.__encoding = encoding
+          self.__delimiter = delimiter
+
           # Get working directory
           self.__working_directory = source_file_path[0:source_file_path.rfind('\\')+1]
           self.__source_file_name = source_file_path[source_file_path.rfind('\\')+1:len(source_file_path)-4]
@@ -51,16 +124,212 @@ class CSVOps(object):
           print('[INFO] Source filename and extension: ', self.__source_file_name + self.__source_file_extension)
           self.__output_filename_template = self.__source_file_name + '(%s)' + self.__source_file_extension
 
-          # Open csv file using 'with'.  The with statement simplifies exception handling by encapsulating common preparation and cleanup tasks.  In addition, it will automatically close the file.  The with statement provides a way for ensuring that a clean-up is always used
-          with open(source_file_path, 'r', encoding=encoding) as filehandler:
-               reader = csv.reader(filehandler, delimiter=delimiter)
-               self.__data_csv.dataHeader = next(reader)
-          
-               for i, row in enumerate(reader):
-                    self.__data_csv.data.append(row)
+     def readFile(self, source_file_path, encoding='utf-8', delimiter=','):
+          r''' Reads a csv file and converts each line and its field into an array where the element of the arrays contains the column data for each CSV record.
+          Args:
+               source_file_path (String):  Contains the full file path and file name of the source file (e.g. C:\directory\filepath\file.csv).
+               encoding (String):  Defines the encoding which the source file should be read.  By code, defaults to utf-8.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+          Notes:
+               With a parse cache, the records are opened from the cache file of the source file when it is current, without parsing the source file.  Otherwise they are parsed and the cache file is saved for the next run.
+          '''
+          self.setSourceFile(source_file_path, encoding, delimiter)
+
+          # Records read with a row selection or decoded leniently depend on it, so they are neither opened from nor saved to the cache
+          blnCache = self.__cache is not None and self.__selection is None and self.__decode_errors == 'strict'
+          blnCacheHit = False
+          with timePhase(self.__stats, 'read'):
+               if blnCache:
+                    stat = os.stat(source_file_path)
+                    cachedData = self.__cache.load(source_file_path, encoding, delimiter, self.__strip_nul)
+                    if cachedData is not None:
+                         self.__data_csv = cachedData
+                         blnCacheHit = True
+               if not blnCacheHit:
+                    for row in self.readRows():
+                         self.__data_csv.data.append(row)
+
+          if len(self.__data_csv.data) != 0:
+               self.__data_csv.hasData = True
+          self.__data_loaded = True
+
+          if blnCache and not blnCacheHit:
+               with timePhase(self.__stats, 'cache'):
+                    self.__cache.save(self.__data_csv, source_file_path, encoding, delimiter, self.__strip_nul, stat)
+
+          if self.__stats is not None:
+               self.__stats.count('rows_read', len(self.__data_csv.data))
+               if blnCacheHit:
+                    self.__stats.count('cache_hits', 1)
+               else:
+                    self.__stats.count('bytes_read', os.path.getsize(source_file_path))
+
+     def readRows(self, start_row=1, start_offset=None):
+          ''' Opens the source file for streaming.  The header is read into CSVData.dataHeader right away and the remaining records are handed out one at a time, so only the current record is held in memory.
+          Args:
+               start_row (Integer):  Number of the first record to read, where 1 is the first record after the header.  The file is opened at the byte offset of that record (from the record index when it was built with getIndex(), otherwise from a raw byte scan), so the records before it are not parsed.
+               start_offset (Integer):  Byte offset of start_row when it is already known (e.g. from a chunk manifest), so it is not looked up.
+          Returns:
+               (Generator):  Yields each CSV record (excluding the header) as a list of fields.
+          '''
+          # The file handle is owned by the generator below and is closed once the records are exhausted or the generator is discarded.
+          filehandler = self.__openLines()
+          lines = self.__filterLines(filehandler)
+          reader = csv.reader(lines, delimiter=self.__delimiter)
+          self.__data_csv.dataHeader = self.__bindSelection(self.__readHeaderRecord(filehandler, reader))
+
+          if start_row > 1:
+               if CSVBytes.isByteSafeEncoding(self.__encoding):
+                    filehandler.close()
+                    filehandler = self.__openLines(self.getRecordOffset(start_row) if start_offset is None else start_offset)
+                    lines = self.__filterLines(filehandler)
+               else:
+                    for row in itertools.islice(self.__iterateRows(filehandler, reader, close=False), start_row - 1):
+                         pass
+
+          # The csv reader does not read ahead, so the records are parsed from the line after the last one it consumed
+          return self.__iterateRows(filehandler, self.__parseLines(lines), append=start_row > 1)
+
+     def readRangeRows(self, start, end):
+          ''' Reads the records of a byte range of the source file, e.g. the range given to a worker process by getRecordRanges().  The header is read into CSVData.dataHeader right away.
+          Args:
+               start (Integer):  Offset of the first record of the range.
+               end (Integer):  Offset right after the last record of the range.
+          Returns:
+               (Iterator):  Yields each CSV record of the range as a list of fields.
+          '''
+          self.__readHeader()
+          filehandler = self.__openLines(start, end)
+          return self.__iterateRows(filehandler, self.__parseLines(self.__filterLines(filehandler)), append=True)
+
+     def __readHeader(self):
+          ''' Reads the header record of the source file into CSVData.dataHeader.
+          '''
+          with self.__openLines() as filehandler:
+               self.__data_csv.dataHeader = self.__bindSelection(self.__readHeaderRecord(filehandler, csv.reader(self.__filterLines(filehandler), delimiter=self.__delimiter)))
+
+     def __openLines(self, start=0, end=None):
+          ''' Opens a byte range of the source file for reading, decoded with the decode error policy.
+          Args:
+               start (Integer):  Offset of the first line read.  Must be 0 or the start of a record.
+               end (Integer):  Offset right after the last line read.  None reads up to the end of the file.
+          Returns:
+               (DecodedLines):  The decoded lines of the range.
+          '''
+          return DecodedLines(self.__source_file_path, self.__encoding, self.__decode_errors, start, end)
+
+     def __readHeaderRecord(self, filehandler, reader):
+          ''' Reads the header record from the start of the source file.
+          Args:
+               filehandler (DecodedLines):  The source file, opened at its start.
+               reader (csv.reader):  The reader of its lines.
+          Returns:
+               (List):  The fields of the header record.
+          Raises:
+               DecodeError:  The header holds bytes that are not valid in the encoding (quarantine policy), so the columns of the records are unknown.
+          '''
+          header = next(reader, [])
+          if filehandler.record_invalid:
+               raise DecodeError('The header of the file holds bytes that are not valid ' + self.__encoding + ', its records cannot be quarantined.')
+          self.__header_lines = filehandler.record_lines
+          filehandler.nextRecord()
+          return header
+
+     def __bindSelection(self, header):
+          ''' Resolves the row selection against the header of the source file.
+          Args:
+               header (List):  The fields of the header record of the source file.
+          Returns:
+               (List):  The header of the records handed out:  the selected columns, or the header itself without a selection.
+          '''
+          if self.__selection is None:
+               return header
+          return self.__selection.bind(header)
+
+     def __parseLines(self, lines):
+          ''' Parses the lines of the source file after the header into records.  With a row selection, the lines that cannot match are dropped before they are parsed, and the records are filtered and projected right after.
+          Args:
+               lines (Iterable):  The lines of the source file.
+          Returns:
+               (Iterator):  Yields each selected record as a list of fields.
+          '''
+          if self.__selection is None:
+               return csv.reader(lines, delimiter=self.__delimiter)
+          return self.__selection.select(csv.reader(self.__selection.filterLines(lines), delimiter=self.__delimiter))
 
-               if len(self.__data_csv.data) != 0:
-                    self.__data_csv.hasData = True
+     def __filterLines(self, filehandler):
+          ''' Applies the read filters to the lines of the source file before they reach the csv reader.
+          Args:
+               filehandler (File):  The opened source file.
+          Returns:
+               (Iterable):  The lines of the file, without NUL characters when strip_nul is set.
+          '''
+          if not self.__strip_nul:
+               return filehandler
+          return (line.replace('\x00', '') for line in filehandler)
+
+     def __iterateRows(self, filehandler, reader, append=False, close=True):
+          ''' Generator used by readRows() to yield the records and close the file handle afterwards.  With the quarantine policy, the records that hold bytes that are not valid in the encoding are written to the quarantine file instead.
+          Args:
+               filehandler (DecodedLines):  The opened source file.
+               reader (csv.reader):  The reader positioned after the header record.
+               append (Boolean):  Defines whether the quarantined records are added to the quarantine file of a previous read, instead of replacing it (e.g. when the read starts after the first record).
+               close (Boolean):  Defines whether the file handle is closed once the records are exhausted.
+          Raises:
+               FieldSizeError:  A field is over the field size limit of the csv reader (without large_fields).
+          '''
+          try:
+               with fieldSizeLimit(MAX_FIELD_SIZE_LIMIT if self.__large_fields else None):
+                    if self.__decode_errors != 'quarantine':
+                         for row in reader:
+                              yield row
+                         return
+                    if not append:
+                         self.__quarantine_count = 0
+                    for row in reader:
+                         if filehandler.record_invalid:
+                              self.__quarantine(filehandler.record_lines, append)
+                         else:
+                              yield row
+                         filehandler.nextRecord()
+          except csv.Error as e:
+               if not isFieldSizeError(e):
+                    raise
+               raise FieldSizeError('The file has a field over ' + str(csv.field_size_limit()) + ' characters, the longest the csv reader accepts.  Use -largefields to read it.') from e
+          finally:
+               if close:
+                    filehandler.close()
+                    self.__closeQuarantine()
+
+     def __quarantine(self, lines, append):
+          ''' Writes a record that holds bytes that are not valid in the encoding to the quarantine file (e.g. Filename(quarantine).csv), which is opened with the header record the first time.  The invalid bytes are written back as they were read.
+          Args:
+               lines (List):  The decoded lines of the record.
+               append (Boolean):  Defines whether an existing quarantine file is added to instead of replaced.
+          '''
+          if self.__quarantine_file is None:
+               strPath = self.getOutputPath('quarantine')
+               if strPath not in self.__written_files:
+                    self.__written_files.append(strPath)
+               blnAppend = append and os.path.exists(strPath)
+               self.__quarantine_file = open(strPath, 'ab' if blnAppend else 'wb')
+               self.__quarantine_encoder = codecs.getincrementalencoder(self.__encoding)(ESCAPE_ERRORS)
+               if blnAppend:
+                    # The file already starts with its byte order mark, if the encoding has one
+                    self.__quarantine_encoder.setstate(0)
+               else:
+                    self.__quarantine_file.write(self.__quarantine_encoder.encode(''.join(self.__header_lines or [])))
+               print('[WARNING] Records with bytes that are not valid ' + self.__encoding + ' are written to: ', strPath)
+          self.__quarantine_file.write(self.__quarantine_encoder.encode(''.join(lines)))
+          self.__quarantine_count += 1
+
+     def __closeQuarantine(self):
+          ''' Closes the quarantine file, if records were quarantined, and reports them.
+          '''
+          if self.__quarantine_file is not None:
+               self.__quarantine_file.close()
+               self.__quarantine_file = None
+               print('[WARNING] Quarantined records: ', self.__quarantine_count)
 
      def getCSVData(self):
           ''' Returns the CSVData object.
@@ -69,15 +338,115 @@ class CSVOps(object):
           '''
           return self.__data_csv
      
-     def getCSVLength(self):
+     def getCSVLength(self, workers=None):
           ''' Returns the number of records in the CSV file.
+          Args:
+               workers (Integer):  Number of worker processes used to count a file that was not loaded with readFile().  Defaults to the number of cores.
           Returns:
-               (Integer):  The number of records in CSVData.data that was read from readFile().
+               (Integer):  The number of records in CSVData.data that was read from readFile(), otherwise the number of records counted in the source file by countRecords().
           '''
-          return len(self.__data_csv.data)
+          if self.__data_loaded:
+               return len(self.__data_csv.data)
+          return self.countRecords(workers)
+
+     def countRecords(self, workers=None):
+          ''' Counts the records (excluding the header) of the source file without loading them.  The count is read from the record index when it was built with getIndex().  Otherwise the raw bytes are scanned in large blocks, in parallel for large files, when quotes and line feeds are single bytes in the source encoding.  Otherwise the records are streamed and parsed.
+          Args:
+               workers (Integer):  Number of worker processes.  Defaults to the number of cores.
+          Returns:
+               (Integer):  The number of records in the source file.
+          '''
+          if self.__index is not None:
+               return max(self.__index.record_count - 1, 0)
+
+          if CSVBytes.isByteSafeEncoding(self.__encoding):
+               return max(CSVBytes.countRecords(self.__source_file_path, workers=workers) - 1, 0)
+
+          intRecordCount = 0
+          for row in self.readRows():
+               intRecordCount += 1
+          return intRecordCount
+
+     def getIndex(self, stride=DEFAULT_STRIDE):
+          ''' Returns the sidecar record index of the source file (<source file>.idx).  The index is loaded if it matches the source file, updated if the source file only grew, otherwise built and saved.
+          Args:
+               stride (Integer):  The offset of every stride-th record is kept in the index.
+          Returns:
+               (CSVIndex):  The record index, or None if the source encoding does not allow records to be located at the byte level.
+          '''
+          if not CSVBytes.isByteSafeEncoding(self.__encoding):
+               print('[WARNING] A record index cannot be used with the encoding ' + self.__encoding + '.')
+               return None
+          if self.__index is None or self.__index.stride != stride:
+               self.__index = CSVIndex(self.__source_file_path, stride)
+          return self.__index.refresh()
+
+     def getRecordOffset(self, record_number):
+          ''' Finds the byte offset where a record starts, using the record index when it was built with getIndex().
+          Args:
+               record_number (Integer):  Number of the record, where 0 is the header and 1 is the first record after it.
+          Returns:
+               (Integer):  Offset where the record starts, or the size of the file if record_number is past the last record.
+          '''
+          if self.__index is not None:
+               return self.__index.getRecordOffset(record_number)
+          with CSVBytes.RecordLocator(self.__source_file_path) as locator:
+               locator.skipRecords(record_number)
+               return locator.offset
+
+     def getRecordRanges(self, parts=None):
+          ''' Splits the records (excluding the header) into byte ranges that start and end at record boundaries, using the record index when it was built with getIndex().
+          Args:
+               parts (Integer):  Number of ranges wanted.  Defaults to the number of cores.  Without a record index, small files are not split.
+          Returns:
+               (List):  (start offset, end offset) tuples covering the records in order.
+          '''
+          if self.__index is not None:
+               return [(intStart, intEnd) for intStart, intEnd, intFirstRecord in self.__index.getRecordRanges(parts or os.cpu_count() or 1)]
+          return CSVBytes.findRecordRanges(self.__source_file_path, len(CSVBytes.readHeader(self.__source_file_path)), parts)
+
+     def isDataLoaded(self):
+          ''' Returns whether the records were read into CSVData.data (in-memory mode) or are streamed from the source file.
+          Returns:
+               (Boolean):  True if readFile() has loaded the records into memory.
+          '''
+          return self.__data_loaded
+
+     def getWrittenFiles(self):
+          ''' Returns the output files written by this instance.
+          Returns:
+               (List):  Full paths of the files, in the order they were written.
+          '''
+          return self.__written_files
+
+     def getValidationErrorCount(self):
+          ''' Returns the number of errors found by validateFile().
+          Returns:
+               (Integer):  The number of errors, or None when the source file was not validated.
+          '''
+          return self.__validation_error_count
+
+     def getQuarantineCount(self):
+          ''' Returns the number of records written to the quarantine file by the last read of the source file (quarantine decode error policy).
+          Returns:
+               (Integer):  The number of quarantined records.
+          '''
+          return self.__quarantine_count
+
+     def getOutputPath(self, current_piece):
+          ''' Builds the full path of an output file from the output filename template.
+          Args:
+               current_piece (String):  Defines different parts / batches of the same output file.  (e.g. Filename (1), Filename (2)...)
+          Returns:
+               (String):  Full path of the output file.
+          '''
+          return os.path.join(
+               self.__working_directory, 
+               self.__output_filename_template % current_piece
+          )
 
      def setWriter(self, encoding, delimiter, current_piece, newline=''):
-          ''' Sets a new CSV writer to output a new CSV file.
+          ''' Sets a new CSV writer to output a new CSV file.  The writer is a CSVWriter.ChunkWriter: the records are written in batches by a background thread, and the previous file of the writer is closed when the new one is opened.
           Args:
                encoding (String):  Note: Python's default encoding is ASCII.  This parameter forces default encoding for the writer to be utf-8.
                delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
@@ -87,35 +456,818 @@ class CSVOps(object):
           Notes:
                newline:  When writing output to the stream, if newline is None , any '\n' characters written are translated to the system default line separator, os.linesep. If newline is '' or '\n' , no translation takes place. If newline is any of the other legal values, any '\n' characters written are translated to the given string.
           '''
-          current_output_path = os.path.join(
-               self.__working_directory, 
-               self.__output_filename_template % current_piece
-          )
-          self.__current_output_writer = csv.writer(open(current_output_path, 'w', encoding=encoding, newline=newline), delimiter=delimiter)
+          writer = self.__current_output_writer
+          if writer is None or writer.binary or (writer.encoding, writer.delimiter, writer.newline) != (encoding, delimiter, newline):
+               self.closeWriter()
+               self.__current_output_writer = ChunkWriter(encoding, delimiter, newline)
+          self.__current_output_writer.open(self.__registerOutputPath(current_piece))
 
-     def writeFileChunk(self, chunk_size, keep_header=True, encoding='utf-8', delimiter=','):
+     def closeWriter(self):
+          ''' Writes the remaining records of the current CSV writer and closes its file, if there is one.
           '''
+          if self.__current_output_writer is not None:
+               writer = self.__current_output_writer
+               self.__current_output_writer = None
+               writer.close()
+               if self.__stats is not None:
+                    self.__stats.addWriter(writer)
+
+     def __registerOutputPath(self, current_piece):
+          ''' Builds the full path of an output file and adds it to the files returned by getWrittenFiles().
           Args:
-               chunk_size (Integer):  The size of each chunk / batch CSV file to be written.
+               current_piece (String):  Defines different parts / batches of the same output file.
+          Returns:
+               (String):  Full path of the output file.
+          '''
+          current_output_path = self.getOutputPath(current_piece)
+          self.__written_files.append(current_output_path)
+          return current_output_path
+
+     def __finishChunk(self, current_piece):
+          ''' Reports that a chunk file was written.
+          Args:
+               current_piece (Integer):  Number of the chunk.
+          '''
+          print('[INFO] Finish writing chunk ' + str(current_piece) + '.')
+          if self.__stats is not None:
+               self.__stats.chunkDone(self.__written_files[-1] if self.__written_files else '')
+
+     def __countWritten(self, record_count):
+          ''' Adds the records written by an operation to the runtime metrics.
+          Args:
+               record_count (Integer):  Number of records written (excluding the headers).
+          Returns:
+               (Integer):  record_count.
+          '''
+          if self.__stats is not None:
+               self.__stats.count('rows_written', record_count)
+          return record_count
+
+     def writeFileChunk(self, chunk_size=None, keep_header=True, encoding='utf-8', delimiter=',', chunk_bytes=None, rows=None, output_label=None, transforms=None, header=None, keep_manifest=False, resume=False):
+          ''' Writes the records into multiple CSV files of chunk_size records each.  If the records were not loaded with readFile(), they are streamed from the source file and written in the same pass, so memory stays bounded to the record being written.
+          Args:
+               chunk_size (Integer):  The size of each chunk / batch CSV file to be written.  None writes all the records to one file unless chunk_bytes is defined.
                keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
                encoding (String):  Note: Python's default encoding is ASCII.  This parameter forces default encoding for the writer to be utf-8.
                delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               chunk_bytes (Integer):  The maximum size in bytes of each chunk file, header included.  When defined, chunk_size becomes optional and a chunk is closed by whichever limit is reached first.
+               rows (Iterable):  The records to write instead of the records of the source file, e.g. the output of a row operation such as RowExploder.explode().
+               output_label (String):  Added in front of the chunk numbers of the output files (e.g. Filename(explode-1), Filename(explode-2)...).
+               transforms (List):  RowTransform instances (see CSVTransform) applied in order to each record between the read and the write, so the records are fixed up in the same pass that chunks them.  Their column references are resolved once against the header.
+               header (List):  Header written instead of the header of the source file, for rows with other columns (e.g. the results of an aggregation).
+               keep_manifest (Boolean):  Defines whether a manifest of the finished chunks (output path, record range and source byte offsets) is kept next to the chunk files, so the run can be resumed if it dies (see CSVManifest).  Only used when the records are streamed from the source file, one chunk record per source record.
+               resume (Boolean):  Defines whether the run continues from the manifest of a previous run with the same source file and settings:  the chunk files it lists are kept and the source file is read from the first record after them.  Starts from the first record when there is no such manifest.
+          Returns:
+               (Integer):  The number of records written across all the chunks (excluding the headers), including the chunks kept from a resumed run.
           '''
-          intCurrentPiece = 1
-          intCurrentLimit = chunk_size
+          recorder = None
+          intPreviousRecords = 0
+          intFirstPiece = 1
+          if (keep_manifest or resume) and rows is None and not self.__data_loaded:
+               manifest = self.__getManifest(chunk_size, chunk_bytes, keep_header, encoding, delimiter, output_label, transforms)
+               if manifest is not None:
+                    intFirstRecord = 1
+                    if resume and manifest.load():
+                         intKept = manifest.verifyChunks()
+                         if manifest.complete:
+                              print('[INFO] All the chunks of the manifest are already written: ', manifest.manifest_file_path)
+                              return manifest.record_count
+                         intFirstPiece, intFirstRecord, intStartOffset = manifest.getResumePoint()
+                         intPreviousRecords = intFirstRecord - 1
+                         print('[INFO] Resuming from chunk ' + str(intFirstPiece) + ', record ' + str(intFirstRecord) + ' (byte offset ' + str(intStartOffset) + ').  Chunks already written: ' + str(intKept))
+                         if self.__stats is not None:
+                              self.__stats.count('rows_resumed', intPreviousRecords)
+                    else:
+                         if resume:
+                              print('[INFO] No chunk manifest matches the source file and settings.  Chunking from the first record.')
+                         intStartOffset = self.getRecordOffset(1)
+                         manifest.start(intStartOffset)
+                    rows = self.readRows(intFirstRecord, start_offset=intStartOffset)
+                    recorder = ManifestRecorder(manifest, intFirstRecord, intStartOffset)
+
+          if rows is None:
+               rows = self.__data_csv.data if self.__data_loaded else self.readRows()
 
-          self.setWriter(encoding, delimiter, intCurrentPiece)
+          if header is None:
+               header = self.__data_csv.dataHeader
+          if transforms:
+               pipeline = TransformPipeline(transforms)
+               header = pipeline.bind(header)
+               # Records kept in memory are copied so the transforms do not modify CSVData.data
+               rows = pipeline.transform(rows, copy_rows=self.__data_loaded)
 
-          if keep_header:
-               self.__current_output_writer.writerow(self.__data_csv.dataHeader)
+          if self.__stats is not None:
+               self.__stats.startChunks()
 
-          for i, row in enumerate(self.__data_csv.data):
-               if i + 1 > intCurrentLimit:
-                    print('[INFO] Finish writing chunk ' + str(intCurrentPiece) + '.')
+          try:
+               if chunk_bytes is not None:
+                    intRecordCount = self.__writeFileChunkBytes(chunk_size, chunk_bytes, keep_header, encoding, delimiter, rows, output_label, header, intFirstPiece, recorder)
+               else:
+                    intRecordCount = self.__writeFileChunkRecords(chunk_size, keep_header, encoding, delimiter, rows, output_label, header, intFirstPiece, recorder)
+          finally:
+               if recorder is not None:
+                    recorder.close()
+          if recorder is not None:
+               recorder.manifest.finish(intPreviousRecords + intRecordCount)
+
+          return intPreviousRecords + self.__countWritten(intRecordCount)
+
+     def __writeFileChunkRecords(self, chunk_size, keep_header, encoding, delimiter, rows, output_label=None, header=None, first_piece=1, recorder=None):
+          ''' Writes the records into chunk files of chunk_size records each.
+          Args:
+               chunk_size (Integer):  The number of records of each chunk file.  None writes all the records to one file.
+               keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
+               encoding (String):  Encoding of the chunk files.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               rows (Iterable):  The records to write.
+               output_label (String):  Added in front of the chunk numbers of the output files.
+               header (List):  The header record to write.
+               first_piece (Integer):  Number of the first chunk file.
+               recorder (ManifestRecorder):  Adds each chunk to the manifest of the run once its file is closed.  None keeps no manifest.
+          Returns:
+               (Integer):  The number of records written across all the chunks (excluding the headers).
+          '''
+          intCurrentPiece = first_piece
+          rows = iter(rows)
+
+          # Each chunk takes the next chunk_size records as a batch; a new chunk is only started when a record is left for it
+          try:
+               self.setWriter(encoding, delimiter, self.__pieceName(intCurrentPiece, output_label))
+               if keep_header:
+                    self.__current_output_writer.writerow(header)
+               intPieceRecords = self.__current_output_writer.writerows(itertools.islice(rows, chunk_size))
+               intRecordCount = intPieceRecords
+
+               while chunk_size is not None and intPieceRecords == chunk_size:
+                    row = next(rows, None)
+                    if row is None:
+                         break
+                    self.__closeChunk(self.__current_output_writer, intCurrentPiece, intPieceRecords, recorder)
+                    self.__finishChunk(intCurrentPiece)
                     intCurrentPiece += 1
-                    intCurrentLimit = chunk_size * intCurrentPiece
-                    self.setWriter(encoding, delimiter, intCurrentPiece)
+                    self.setWriter(encoding, delimiter, self.__pieceName(intCurrentPiece, output_label))
                     if keep_header:
-                         self.__current_output_writer.writerow(self.__data_csv.dataHeader)
-               self.__current_output_writer.writerow(row)
-          print('[INFO] Finish writing chunk ' + str(intCurrentPiece) + '.')
\ No newline at end of file
+                         self.__current_output_writer.writerow(header)
+                    self.__current_output_writer.writerow(row)
+                    intPieceRecords = 1 + self.__current_output_writer.writerows(itertools.islice(rows, chunk_size - 1))
+                    intRecordCount += intPieceRecords
+               self.__closeChunk(self.__current_output_writer, intCurrentPiece, intPieceRecords, recorder)
+          finally:
+               self.closeWriter()
+          self.__finishChunk(intCurrentPiece)
+
+          return intRecordCount
+
+     def __closeChunk(self, writer, current_piece, record_count, recorder):
+          ''' Closes the file of a chunk whose records were all handed to the writer, and adds the chunk to the manifest once the writer thread has closed it.
+          Args:
+               writer (ChunkWriter):  The writer of the chunk.
+               current_piece (Integer):  Number of the chunk.
+               record_count (Integer):  Number of records of the chunk.
+               recorder (ManifestRecorder):  Records the chunk in the manifest of the run.  None keeps no manifest and leaves the file open until the next one is opened.
+          '''
+          if recorder is not None:
+               writer.closeFile(recorder.chunkWritten(current_piece, self.__written_files[-1], record_count))
+
+     def __getManifest(self, chunk_size, chunk_bytes, keep_header, encoding, delimiter, output_label, transforms):
+          ''' Builds the manifest of a chunk run of the source file, named after its output files (e.g. Filename(chunk-manifest).json).
+          Args:
+               chunk_size (Integer):  The number of records of each chunk file.
+               chunk_bytes (Integer):  The maximum size in bytes of each chunk file.
+               keep_header (Boolean):  Defines whether the headers are kept in the chunk files.
+               encoding (String):  Encoding of the chunk files.
+               delimiter (String):  Delimiter of the chunk files.
+               output_label (String):  Added in front of the chunk numbers of the output files.
+               transforms (List):  RowTransform instances applied to each record, before they are bound to the header.
+          Returns:
+               (ChunkManifest):  The manifest, or None when the chunks cannot be located in the source file:  an encoding where records cannot be found at the byte level, or predicates that drop records.
+          '''
+          if not CSVBytes.isByteSafeEncoding(self.__encoding):
+               print('[WARNING] A chunk manifest cannot be kept with the encoding ' + self.__encoding + '.')
+               return None
+          if self.__selection is not None and self.__selection.predicates:
+               print('[WARNING] A chunk manifest cannot be kept when records are dropped by predicates.')
+               return None
+          settings = {
+               'chunk_size': chunk_size,
+               'chunk_bytes': chunk_bytes,
+               'keep_header': keep_header,
+               'encoding': encoding,
+               'delimiter': delimiter,
+               'output_label': output_label,
+               'source_encoding': self.__encoding,
+               'source_delimiter': self.__delimiter,
+               'strip_nul': self.__strip_nul,
+               'columns': None if self.__selection is None else self.__selection.columns,
+               'transforms': describeTransforms(transforms),
+          }
+          strManifestPath = os.path.splitext(self.getOutputPath((output_label or 'chunk') + '-manifest'))[0] + '.json'
+          return ChunkManifest(strManifestPath, self.__source_file_path, settings)
+
+     def __pieceName(self, current_piece, output_label=None):
+          ''' Builds the part of an output filename that tells the chunks apart.
+          Args:
+               current_piece (Integer):  Number of the chunk.
+               output_label (String):  Added in front of the chunk number.
+          Returns:
+               (String):  The chunk number, with the label in front of it when there is one (e.g. explode-1).
+          '''
+          if output_label is None:
+               return current_piece
+          return output_label + '-' + str(current_piece)
+
+     def __writeFileChunkBytes(self, chunk_size, chunk_bytes, keep_header, encoding, delimiter, rows, output_label=None, header=None, first_piece=1, recorder=None):
+          ''' Writes the records into chunk files of at most chunk_bytes bytes each, header included.  Each record is formatted and encoded before it is written, so a chunk is closed at a record boundary before it would go over the limit.
+          Args:
+               chunk_size (Integer):  The maximum number of records of each chunk file.  None to only limit by bytes.
+               chunk_bytes (Integer):  The maximum size in bytes of each chunk file.
+               keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
+               encoding (String):  Encoding of the chunk files.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               rows (Iterable):  The records to write.
+               output_label (String):  Added in front of the chunk numbers of the output files.
+               header (List):  The header record to write.  Defaults to CSVData.dataHeader.
+               first_piece (Integer):  Number of the first chunk file.
+               recorder (ManifestRecorder):  Adds each chunk to the manifest of the run once its file is closed.  None keeps no manifest.
+          Returns:
+               (Integer):  The number of records written across all the chunks (excluding the headers).
+
+          Notes:
+               A record that is larger than chunk_bytes on its own is written to a chunk file of its own.
+          '''
+          intCurrentPiece = first_piece
+          intRecordCount = 0
+
+          # csv.writer hands each formatted record to write() in one piece, so the encoded size of a record is known before it is written.  The
+          # record is taken from a list rather than a text buffer, which would hold another copy of a large record at 4 bytes per character.
+          lines = []
+          formatter = csv.writer(types.SimpleNamespace(write=lines.append), delimiter=delimiter)
+
+          def formatRow(row):
+               formatter.writerow(row)
+               return lines.pop()
+
+          if header is None:
+               header = self.__data_csv.dataHeader
+          strHeader = formatRow(header) if keep_header else ''
+
+          # The records are encoded here to measure them, the writer thread only writes the bytes
+          outputWriter = ChunkWriter(binary=True)
+          try:
+               encoder = codecs.getincrementalencoder(encoding)()
+               data = encoder.encode(strHeader)
+               outputWriter.open(self.__registerOutputPath(self.__pieceName(intCurrentPiece, output_label)), data)
+               intPieceBytes = len(data)
+               intPieceRecords = 0
+
+               for row in rows:
+                    strRecord = formatRow(row)
+                    data = encoder.encode(strRecord)
+                    if intPieceRecords > 0 and (intPieceBytes + len(data) > chunk_bytes or (chunk_size is not None and intPieceRecords >= chunk_size)):
+                         outputWriter.write(encoder.encode('', final=True))
+                         self.__closeChunk(outputWriter, intCurrentPiece, intPieceRecords, recorder)
+                         self.__finishChunk(intCurrentPiece)
+                         intCurrentPiece += 1
+                         encoder = codecs.getincrementalencoder(encoding)()
+                         data = encoder.encode(strHeader)
+                         outputWriter.open(self.__registerOutputPath(self.__pieceName(intCurrentPiece, output_label)), data)
+                         intPieceBytes = len(data)
+                         intPieceRecords = 0
+                         data = encoder.encode(strRecord)
+                    outputWriter.write(data)
+                    intPieceBytes += len(data)
+                    intPieceRecords += 1
+                    intRecordCount += 1
+
+               outputWriter.write(encoder.encode('', final=True))
+               self.__closeChunk(outputWriter, intCurrentPiece, intPieceRecords, recorder)
+          finally:
+               outputWriter.close()
+               if self.__stats is not None:
+                    self.__stats.addWriter(outputWriter)
+          self.__finishChunk(intCurrentPiece)
+
+          return intRecordCount
+
+     def writeFileChunkRaw(self, chunk_size=None, keep_header=True, workers=None, chunk_bytes=None, pieces=None):
+          ''' Writes the records into multiple CSV files of chunk_size records each without parsing them.  The record boundaries are found at the byte level and each chunk is copied as a raw byte range from the source file, with the chunks written in parallel by worker processes.
+          Args:
+               chunk_size (Integer):  The size of each chunk / batch CSV file to be written.
+               keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
+               workers (Integer):  Number of worker processes writing the chunks.  Defaults to the number of cores.
+               chunk_bytes (Integer):  The maximum size in bytes of each chunk file, header included.  When defined, chunk_size becomes optional and a chunk is closed by whichever limit is reached first.
+               pieces (List):  Numbers of the chunks to write (e.g. to rebuild a chunk that failed).  Defaults to all the chunks.
+          Returns:
+               (Integer):  The number of records written across all the chunks (excluding the headers).
+
+          Notes:
+               When the record index was built with getIndex(), the chunk boundaries by chunk_size are read from it instead of scanning the source file.
+               The records are copied byte for byte, so the source file encoding is kept and it must be one where quotes and line feeds are single bytes (see CSVBytes.isByteSafeEncoding).
+          '''
+          header = CSVBytes.readHeader(self.__source_file_path)
+          deleteBytes = CSVBytes.NUL if self.__strip_nul else None
+          # Use the line terminator of the source when the last record needs one
+          lineTerminator = b'\r\n' if header.endswith(b'\r\n') or not header.endswith(b'\n') else b'\n'
+
+          if chunk_bytes is not None:
+               intDataBytes = chunk_bytes - (len(header) if keep_header else 0)
+               offsets, intRecordCount = CSVBytes.findByteChunkOffsets(self.__source_file_path, intDataBytes, chunk_size, start_offset=len(header))
+          elif self.__index is not None:
+               offsets = self.__index.getChunkOffsets(chunk_size)
+               intRecordCount = max(self.__index.record_count - 1, 0)
+          else:
+               offsets, intRecordCount = CSVBytes.findChunkOffsets(self.__source_file_path, chunk_size, start_offset=len(header))
+          if len(offsets) == 1:
+               # Keep the header-only output of writeFileChunk() for files without records
+               offsets.append(offsets[0])
+
+          ranges = list(zip(offsets, offsets[1:]))
+          selectedPieces = range(1, len(ranges) + 1) if pieces is None else [i for i in pieces if 1 <= i <= len(ranges)]
+          if pieces is not None and len(selectedPieces) != len(pieces):
+               print('[WARNING] The file only has ' + str(len(ranges)) + ' chunks.  Chunks out of that range are skipped.')
+
+          targetFilePaths = [self.getOutputPath(i) for i in selectedPieces]
+          if not keep_header:
+               header = b''
+
+          if self.__stats is not None:
+               self.__stats.startChunks()
+          for i, target_file_path in zip(selectedPieces, CSVBytes.writeByteChunks(self.__source_file_path, targetFilePaths, header, [ranges[i - 1] for i in selectedPieces], lineTerminator, workers, deleteBytes)):
+               self.__written_files.append(target_file_path)
+               self.__finishChunk(i)
+
+          return self.__countWritten(intRecordCount)
+
+     def writeRowRange(self, start_row, end_row=None, keep_header=True):
+          ''' Copies a range of records to a new CSV file without parsing them.  The file is opened at the byte offset of start_row, so only the records in the range are read.
+          Args:
+               start_row (Integer):  Number of the first record to copy, where 1 is the first record after the header.
+               end_row (Integer):  Number of the last record to copy.  Defaults to the last record of the file.
+               keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
+          Returns:
+               (String):  Full path of the file that was written (e.g. Filename(5000000-5010000).csv).
+          '''
+          header = CSVBytes.readHeader(self.__source_file_path)
+          lineTerminator = b'\r\n' if header.endswith(b'\r\n') or not header.endswith(b'\n') else b'\n'
+          intStart = self.getRecordOffset(start_row)
+          intEnd = os.path.getsize(self.__source_file_path) if end_row is None else self.getRecordOffset(end_row + 1)
+
+          targetFilePath = self.__registerOutputPath(str(start_row) + '-' + ('end' if end_row is None else str(end_row)))
+          CSVBytes.writeByteChunk(self.__source_file_path, targetFilePath, header if keep_header else b'', intStart, max(intEnd - intStart, 0), lineTerminator, CSVBytes.NUL if self.__strip_nul else None)
+          print('[INFO] Finish writing records to: ', targetFilePath)
+          return targetFilePath
+
+     def writeScrubbedFile(self):
+          ''' Writes a copy of the source file without NUL bytes (e.g. Filename(NoNUL).csv).  The file is copied in fixed-size binary blocks, so memory stays constant whatever the size of the file.
+          Returns:
+               (String):  Full path of the file that was written.
+          '''
+          targetFilePath = self.__registerOutputPath('NoNUL')
+          intRemoved = CSVBytes.scrubFile(self.__source_file_path, targetFilePath)
+          print('[INFO] Removed NUL bytes: ', intRemoved)
+          print('[INFO] Finish writing scrubbed file to: ', targetFilePath)
+          return targetFilePath
+
+     def writePartitionedFile(self, column, buckets=None, keep_header=True, encoding='utf-8', delimiter=',', max_open=MAX_OPEN_FILES, transforms=None):
+          ''' Writes each record to an output file chosen by the value of a column (e.g. Filename(CompanyCode=1000).csv), or by a hash of the value into a fixed number of buckets (e.g. Filename(CompanyCode-bucket-3).csv).  The source is read once.
+          Args:
+               column (String):  Name of the column, or its position using a 0 number counting system.
+               buckets (Integer):  Number of buckets the values are hashed into.  None writes one file per distinct value.
+               keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
+               encoding (String):  Encoding of the output files.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               max_open (Integer):  Number of output files kept open at once (see CSVWriter.PartitionWriter).
+               transforms (List):  RowTransform instances applied to each record before it is routed (see writeFileChunk()).  The column is looked up in the transformed header.
+          Returns:
+               (Integer):  The number of records written across all the output files (excluding the headers).
+
+          Notes:
+               The buckets use a CRC32 of the value, so a value lands in the same bucket on every run and every machine.
+          '''
+          rows = self.__data_csv.data if self.__data_loaded else self.readRows()
+          header = self.__data_csv.dataHeader
+          if transforms:
+               pipeline = TransformPipeline(transforms)
+               header = pipeline.bind(header)
+               rows = pipeline.transform(rows, copy_rows=self.__data_loaded)
+
+          intColumn = resolveColumn(header, column)
+          strColumnName = header[intColumn] if intColumn < len(header) else str(column)
+          outputPaths = {}
+          usedNames = set()
+          intRecordCount = 0
+
+          writer = PartitionWriter(encoding, delimiter, header if keep_header else None, max_open)
+          try:
+               for row in rows:
+                    key = row[intColumn] if intColumn < len(row) else ''
+                    if buckets is not None:
+                         key = zlib.crc32(key.encode('utf-8', 'surrogatepass')) % buckets
+                    strPath = outputPaths.get(key)
+                    if strPath is None:
+                         strPath = outputPaths[key] = self.__partitionPath(strColumnName, key, buckets is not None, usedNames)
+                    writer.writerow(strPath, row)
+                    intRecordCount += 1
+          finally:
+               writer.close()
+
+          if self.__stats is not None:
+               self.__stats.count('partition_file_opens', writer.opens)
+          print('[INFO] Partitions written: ', len(outputPaths))
+          return self.__countWritten(intRecordCount)
+
+     def __partitionPath(self, column_name, key, bucket, used_names):
+          ''' Builds the output file of a partition.  Characters that are not allowed in filenames are replaced, and a name that would clash with another partition once replaced (or on a case-insensitive file system) gets a hash of the key added.
+          Args:
+               column_name (String):  Name of the partition column.
+               key (String):  Value of the column, or the bucket number.
+               bucket (Boolean):  Defines whether key is a bucket number.
+               used_names (Set):  Lowercased names of the partitions built so far.  The new name is added to it.
+          Returns:
+               (String):  Full path of the output file.
+          '''
+          if bucket:
+               strName = column_name + '-bucket-' + str(key)
+          else:
+               strName = column_name + '=' + key
+          strSafeName = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', strName)
+          strName = strSafeName[:PARTITION_NAME_LENGTH].rstrip('. ')
+          if strName.lower() in used_names or len(strSafeName) > PARTITION_NAME_LENGTH:
+               strName += '~%08x' % zlib.crc32(str(key).encode('utf-8', 'surrogatepass'))
+          strUniqueName = strName
+          intSuffix = 1
+          while strUniqueName.lower() in used_names:
+               intSuffix += 1
+               strUniqueName = strName + '~' + str(intSuffix)
+          strName = strUniqueName
+          used_names.add(strName.lower())
+          return self.__registerOutputPath(strName)
+
+     def writeSortedFile(self, sort_keys, descending=False, chunk_size=None, encoding='utf-8', delimiter=',', chunk_bytes=None, keep_header=True, memory_budget=DEFAULT_MEMORY_BUDGET, workers=None, temp_directory=None, transforms=None):
+          ''' Sorts the records by one or more typed columns and writes them straight to the chunk writer (e.g. Filename(sorted-1).csv, Filename(sorted-2).csv...).  Records are sorted in runs that fit in memory_budget, the runs are spilled to temporary files and merged with a heap, so files larger than memory can be sorted.
+          Args:
+               sort_keys (List):  (column, type, date format) tuples from CSVSort.parseSortKeys().
+               descending (Boolean):  Defines whether the records are sorted from the largest key to the smallest.
+               chunk_size (Integer):  The maximum number of records of each output file.  None writes all the records to one file unless chunk_bytes is defined.
+               encoding (String):  Encoding of the output files.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               chunk_bytes (Integer):  The maximum size in bytes of each output file, header included.
+               keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
+               memory_budget (Integer):  Estimated bytes of records held in memory at once, shared by the workers.
+               workers (Integer):  Number of worker processes sorting runs.  Defaults to the number of cores.  Large files that are streamed from the source are split into record ranges that are sorted in parallel.
+               temp_directory (String):  Directory of the run files.  Defaults to the system temporary directory.
+               transforms (List):  RowTransform instances applied to the sorted records before they are written (see writeFileChunk()).
+          Returns:
+               (Integer):  The number of records written across all the output files (excluding the headers).
+          '''
+          ranges = []
+          if not self.__data_loaded and workers != 1 and CSVBytes.isByteSafeEncoding(self.__encoding) and self.__decode_errors != 'quarantine':
+               ranges = self.getRecordRanges(workers)
+
+          if len(ranges) > 1:
+               self.__readHeader()
+               rows = None
+          else:
+               rows = self.__data_csv.data if self.__data_loaded else self.readRows()
+
+          sorter = ExternalSorter(makeKeyFunction(self.__data_csv.dataHeader, sort_keys), memory_budget, temp_directory, descending)
+          try:
+               with timePhase(self.__stats, 'sort runs'):
+                    if rows is None:
+                         arguments = [(self.__source_file_path, self.__encoding, self.__delimiter, self.__strip_nul, intStart, intEnd, sort_keys, descending, max(memory_budget // len(ranges), 1), temp_directory, self.__decode_errors, self.__large_fields) for intStart, intEnd in ranges]
+                         with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                              for runs in executor.map(sortRange, *zip(*arguments)):
+                                   sorter.addRuns(runs)
+                    else:
+                         sorter.add(rows)
+               print('[INFO] Sorted runs spilled to disk: ', len(sorter.runs))
+
+               with timePhase(self.__stats, 'merge'):
+                    intRecordCount = self.writeFileChunk(chunk_size, keep_header, encoding, delimiter, chunk_bytes, sorter.sorted(), 'sorted', transforms)
+          finally:
+               if self.__stats is not None:
+                    self.__stats.count('sort_spilled_bytes', sorter.spilled_bytes)
+               sorter.close()
+          return intRecordCount
+
+     def writeDedupFile(self, columns=None, keep='first', chunk_size=None, encoding='utf-8', delimiter=',', chunk_bytes=None, keep_header=True, memory_budget=DEFAULT_MEMORY_BUDGET, temp_directory=None, transforms=None):
+          ''' Drops the records whose key columns repeat another record and writes the remaining records straight to the chunk writer (e.g. Filename(dedup-1).csv, Filename(dedup-2).csv...), so duplicates never reach the output files.  The keys are held in memory as hashes; once memory_budget is reached the records are spilled to hash partitioned temporary files and de-duplicated one partition at a time.
+          Args:
+               columns (List):  Names or positions of the key columns, using a 0 number counting system.  None compares the whole records.
+               keep (String):  Occurrence of each key that is written:  'first' or 'last'.  The records keep the order of the source.
+               chunk_size (Integer):  The maximum number of records of each output file.  None writes all the records to one file unless chunk_bytes is defined.
+               encoding (String):  Encoding of the output files.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               chunk_bytes (Integer):  The maximum size in bytes of each output file, header included.
+               keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
+               memory_budget (Integer):  Estimated bytes of key hashes (and, with keep='last', records) held in memory at once.
+               temp_directory (String):  Directory of the spill files.  Defaults to the system temporary directory.
+               transforms (List):  RowTransform instances applied to the kept records before they are written (see writeFileChunk()).  The keys are taken from the records as they are in the source.
+          Returns:
+               (Integer):  The number of records written across all the output files (excluding the headers).
+          '''
+          rows = self.__data_csv.data if self.__data_loaded else self.readRows()
+          deduplicator = Deduplicator(makeDigestFunction(self.__data_csv.dataHeader, columns), keep, memory_budget, temp_directory)
+          try:
+               with timePhase(self.__stats, 'dedup'):
+                    intRecordCount = self.writeFileChunk(chunk_size, keep_header, encoding, delimiter, chunk_bytes, deduplicator.filter(rows), 'dedup', transforms)
+          finally:
+               if self.__stats is not None:
+                    self.__stats.count('duplicates_dropped', deduplicator.duplicate_count)
+                    self.__stats.count('dedup_spilled_bytes', deduplicator.spilled_bytes)
+               deduplicator.close()
+
+          print('[INFO] Duplicate records dropped: ', deduplicator.duplicate_count)
+          if deduplicator.spilled_bytes:
+               print('[INFO] Records spilled to disk (bytes): ', deduplicator.spilled_bytes)
+          return intRecordCount
+
+     def writeJoinFile(self, join_file_path, left_columns, right_columns, join_type='inner', chunk_size=None, encoding='utf-8', delimiter=',', chunk_bytes=None, keep_header=True, memory_budget=DEFAULT_MEMORY_BUDGET, temp_directory=None, transforms=None):
+          ''' Joins the records of the source file (left) with the records of another CSV file (right) on key columns, and writes the joined records straight to the chunk writer (e.g. Filename(join-1).csv, Filename(join-2).csv...).  A hash table is built on the smaller file and the larger file is streamed through it; when the smaller file does not fit in memory_budget, both files are spilled to hash partitioned temporary files and joined one partition at a time.
+          Args:
+               join_file_path (String):  Full path of the right file.  It is read with the encoding, delimiter and NUL stripping of the source file.
+               left_columns (List):  Names or positions of the key columns in the source file, using a 0 number counting system.
+               right_columns (List):  Names or positions of the matching key columns in the right file.
+               join_type (String):  'inner' writes the matching records only, 'left' also writes the source records without a match, with blank right fields.
+               chunk_size (Integer):  The maximum number of records of each output file.  None writes all the records to one file unless chunk_bytes is defined.
+               encoding (String):  Encoding of the output files.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               chunk_bytes (Integer):  The maximum size in bytes of each output file, header included.
+               keep_header (Boolean):  Defines whether the header (the source header, then the right header without its key columns) is written.
+               memory_budget (Integer):  Estimated bytes of records of the smaller file held in memory at once.
+               temp_directory (String):  Directory of the spill files.  Defaults to the system temporary directory.
+               transforms (List):  RowTransform instances applied to the joined records before they are written (see writeFileChunk()).
+          Returns:
+               (Integer):  The number of records written across all the output files (excluding the headers).
+          '''
+          rows = self.__data_csv.data if self.__data_loaded else self.readRows()
+          joinCSV = CSVOps(join_file_path, self.__encoding, self.__delimiter, read_data=False, strip_nul=self.__strip_nul, decode_errors=self.__decode_errors, large_fields=self.__large_fields)
+          joinRows = joinCSV.readRows()
+          # The records of the smaller file are held in the hash table, the records of the larger file are streamed through it
+          strBuildSide = 'right' if os.path.getsize(join_file_path) <= os.path.getsize(self.__source_file_path) else 'left'
+          print('[INFO] Hash table built on the ' + strBuildSide + ' file.')
+          joiner = HashJoiner(self.__data_csv.dataHeader, joinCSV.getCSVData().dataHeader, left_columns, right_columns, join_type, strBuildSide, memory_budget, temp_directory)
+          try:
+               with timePhase(self.__stats, 'join'):
+                    intRecordCount = self.writeFileChunk(chunk_size, keep_header, encoding, delimiter, chunk_bytes, joiner.join(rows, joinRows), 'join', transforms, header=joiner.getHeader())
+          finally:
+               joinRows.close()
+               if self.__stats is not None:
+                    self.__stats.count('bytes_read', os.path.getsize(join_file_path))
+                    self.__stats.count('join_spilled_bytes', joiner.spilled_bytes)
+               joiner.close()
+
+          print('[INFO] Joined record pairs: ', joiner.matched_count)
+          if join_type == 'left':
+               print('[INFO] Left records without a match: ', joiner.unmatched_count)
+          if joiner.spilled_bytes:
+               print('[INFO] Records spilled to disk (bytes): ', joiner.spilled_bytes)
+          return intRecordCount
+
+     def writeDiffFile(self, diff_file_path, old_columns, new_columns, chunk_size=None, encoding='utf-8', delimiter=',', chunk_bytes=None, keep_header=True, memory_budget=DEFAULT_MEMORY_BUDGET, workers=None, temp_directory=None):
+          ''' Compares the records of the source file (old) with the records of another extract of the same data (new) on key columns, and writes the records that were added, removed or changed straight to the chunk writer (e.g. Filename(diff-1).csv).  Each file is read once; when the old records do not fit in memory_budget, both files are spilled to hash partitioned temporary files that are compared by worker processes.
+          Args:
+               diff_file_path (String):  Full path of the new file.  It is read with the encoding, delimiter and NUL stripping of the source file.
+               old_columns (List):  Names or positions of the key columns in the source file, using a 0 number counting system.
+               new_columns (List):  Names or positions of the matching key columns in the new file.
+               chunk_size (Integer):  The maximum number of records of each output file.  None writes all the records to one file unless chunk_bytes is defined.
+               encoding (String):  Encoding of the output files.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               chunk_bytes (Integer):  The maximum size in bytes of each output file, header included.
+               keep_header (Boolean):  Defines whether the header (change, changed_columns, then the compared columns) is written.
+               memory_budget (Integer):  Estimated bytes of old records held in memory at once, shared by the workers.
+               workers (Integer):  Number of worker processes comparing the spill partitions.  Defaults to the number of cores.
+               temp_directory (String):  Directory of the spill files.  Defaults to the system temporary directory.
+          Returns:
+               (Integer):  The number of records written across all the output files (excluding the headers).
+          '''
+          rows = self.__data_csv.data if self.__data_loaded else self.readRows()
+          diffCSV = CSVOps(diff_file_path, self.__encoding, self.__delimiter, read_data=False, strip_nul=self.__strip_nul, decode_errors=self.__decode_errors, large_fields=self.__large_fields)
+          diffRows = diffCSV.readRows()
+          differ = KeyedDiff(self.__data_csv.dataHeader, diffCSV.getCSVData().dataHeader, old_columns, new_columns, memory_budget, workers, temp_directory, os.path.getsize(self.__source_file_path))
+          if differ.old_only or differ.new_only:
+               print('[WARNING] Columns that are not in both files are not compared: ', differ.old_only + differ.new_only)
+          try:
+               with timePhase(self.__stats, 'diff'):
+                    intRecordCount = self.writeFileChunk(chunk_size, keep_header, encoding, delimiter, chunk_bytes, differ.compare(rows, diffRows), 'diff', header=differ.getHeader())
+          finally:
+               diffRows.close()
+               if self.__stats is not None:
+                    self.__stats.count('bytes_read', os.path.getsize(diff_file_path))
+                    self.__stats.count('diff_spilled_bytes', differ.spilled_bytes)
+               differ.close()
+
+          print('[INFO] Records added: ', differ.counts['added'])
+          print('[INFO] Records removed: ', differ.counts['removed'])
+          print('[INFO] Records changed: ', differ.counts['changed'])
+          print('[INFO] Records unchanged: ', differ.counts['unchanged'])
+          if differ.counts['old_duplicates'] or differ.counts['new_duplicates']:
+               print('[WARNING] Records with a repeated key, only the first record of each key is compared (old, new): ', differ.counts['old_duplicates'], differ.counts['new_duplicates'])
+          if self.__stats is not None:
+               for name, value in differ.counts.items():
+                    self.__stats.count('diff_' + name, value)
+          if differ.spilled_bytes:
+               print('[INFO] Records spilled to disk (bytes): ', differ.spilled_bytes)
+          return intRecordCount
+
+     def validateFile(self, max_field_size=DEFAULT_MAX_FIELD_SIZE, workers=None, keep_header=True, encoding='utf-8', delimiter=',', temp_directory=None):
+          ''' Checks the structure of every record of the source file and writes a report of the errors (e.g. Filename(validation).csv):  records whose number of fields differs from the header, quoted fields that are not closed or are followed by other characters, bytes that are not valid in the source encoding, and fields over max_field_size.  Each error has the record number (1 is the first record after the header), the line number and the byte offset of the record (of the invalid bytes for an encoding error).  The file is split into ranges that start and end at record boundaries, which are checked by worker processes.
+          Args:
+               max_field_size (Integer):  Number of characters over which a field is reported.
+               workers (Integer):  Number of worker processes.  Defaults to the number of cores.
+               keep_header (Boolean):  Defines whether the header of the report is written.
+               encoding (String):  Encoding of the report.
+               delimiter (String):  Defines the delimiter used to separate the data columns within the report.
+               temp_directory (String):  Directory of the temporary error files.  Defaults to the system temporary directory.
+          Returns:
+               (Integer):  The number of records checked (excluding the header).
+          '''
+          headerBytes = CSVBytes.readHeader(self.__source_file_path)
+          header, headerErrors = validateHeader(headerBytes, self.__encoding, self.__delimiter)
+          counts = {name: 0 for name in VALIDATION_ERRORS}
+          for error in headerErrors:
+               counts[error[3]] += 1
+          ranges = self.getRecordRanges(workers) if workers != 1 else [(len(headerBytes), os.path.getsize(self.__source_file_path))]
+          arguments = [(self.__source_file_path, intStart, intEnd, self.__encoding, self.__delimiter, header, max_field_size, self.__strip_nul, temp_directory) for intStart, intEnd in ranges if intStart < intEnd]
+          totals = {'records': 0}
+
+          def errors(results):
+               # The records and lines of each range are numbered from its start, after the records and lines of the ranges before it
+               yield from headerErrors
+               intRecords = 0
+               intLines = headerBytes.count(CSVBytes.NEWLINE) or 1
+               for strErrorPath, rangeCounts, intRangeRecords, intRangeLines in results:
+                    if strErrorPath is not None:
+                         try:
+                              for intRecord, intLine, intOffset, strError, strDetail in readRun(strErrorPath):
+                                   yield [intRecord + intRecords, intLine + intLines, intOffset, strError, strDetail]
+                         finally:
+                              os.remove(strErrorPath)
+                    for name, value in rangeCounts.items():
+                         counts[name] += value
+                    intRecords += intRangeRecords
+                    intLines += intRangeLines
+               totals['records'] = intRecords
+
+          with timePhase(self.__stats, 'validate'):
+               if len(arguments) > 1:
+                    with ProcessPoolExecutor(max_workers=len(arguments)) as executor:
+                         self.writeFileChunk(None, keep_header, encoding, delimiter, None, errors(executor.map(validateRange, *zip(*arguments))), 'validation', header=REPORT_HEADER)
+               else:
+                    self.writeFileChunk(None, keep_header, encoding, delimiter, None, errors(validateRange(*argument) for argument in arguments), 'validation', header=REPORT_HEADER)
+
+          self.__validation_error_count = sum(counts.values())
+          for name, value in counts.items():
+               if value:
+                    print('[WARNING] Validation errors (' + name + '): ', value)
+               if self.__stats is not None:
+                    self.__stats.count('validation_' + name, value)
+          print('[INFO] Records checked: ', totals['records'])
+          print('[INFO] Validation errors: ', self.__validation_error_count)
+          return totals['records']
+
+     def writeAggregateFile(self, group_columns, aggregates, keep_header=True, encoding='utf-8', delimiter=',', workers=None, vectorized=None):
+          ''' Computes counts, sums, minimums, maximums and means of columns grouped by other columns, and writes one record per group (e.g. Filename(aggregate-1).csv).  The records are aggregated in batches in one pass, so files larger than memory can be aggregated as long as their groups fit in memory.
+          Args:
+               group_columns (List):  Names or positions of the columns the records are grouped by, using a 0 number counting system.  An empty list aggregates all the records into one record.
+               aggregates (List):  (function, column) tuples from CSVAggregate.parseAggregates().
+               keep_header (Boolean):  Defines whether the header (the group columns, then e.g. count, sum(Amount)) is written.
+               encoding (String):  Encoding of the output file.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               workers (Integer):  Number of worker processes.  Defaults to the number of cores.  Large files that are streamed from the source are split into record ranges whose partial aggregates are combined.
+               vectorized (Boolean):  Defines whether the batches are aggregated with NumPy.  Defaults to True when NumPy is installed.
+          Returns:
+               (Integer):  The number of groups written.
+          '''
+          ranges = []
+          if not self.__data_loaded and workers != 1 and CSVBytes.isByteSafeEncoding(self.__encoding) and self.__decode_errors != 'quarantine':
+               ranges = self.getRecordRanges(workers)
+
+          with timePhase(self.__stats, 'aggregate'):
+               if len(ranges) > 1:
+                    self.__readHeader()
+                    aggregator = Aggregator(self.__data_csv.dataHeader, group_columns, aggregates, vectorized=vectorized)
+                    arguments = [(self.__source_file_path, self.__encoding, self.__delimiter, self.__strip_nul, intStart, intEnd, group_columns, aggregates, vectorized, self.__decode_errors, self.__large_fields) for intStart, intEnd in ranges]
+                    intRecordCount = 0
+                    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                         # The partial aggregates are combined in the order of the ranges, so the groups keep the order they first appear in
+                         for intRecords, groups in executor.map(aggregateRange, *zip(*arguments)):
+                              intRecordCount += intRecords
+                              aggregator.combine(groups)
+               else:
+                    rows = self.__data_csv.data if self.__data_loaded else self.readRows()
+                    aggregator = Aggregator(self.__data_csv.dataHeader, group_columns, aggregates, vectorized=vectorized)
+                    intRecordCount = aggregator.add(rows)
+
+          print('[INFO] Records aggregated: ', intRecordCount)
+          print('[INFO] Aggregated with NumPy: ', aggregator.vectorized)
+          if aggregator.getIgnoredCount():
+               print('[INFO] Values that are not numbers (left out of sum, min, max and mean): ', aggregator.getIgnoredCount())
+          return self.writeFileChunk(None, keep_header, encoding, delimiter, None, aggregator.results(), 'aggregate', header=aggregator.getHeader())
+
+     def writeExplodedFile(self, field, field_delimiter, split_field_only=True, chunk_size=None, encoding='utf-8', delimiter=',', chunk_bytes=None, keep_header=True, workers=None, transforms=None):
+          ''' Splits the list values of a field into additional rows while keeping the remaining columns the same value, and writes the rows straight to the chunk writer (e.g. Filename(explode-1).csv, Filename(explode-2).csv...).  The records are read, split and written in one pass, so the exploded records never have to be written to an intermediate file.
+          Args:
+               field (String):  Name of the field to split, or its position using a 0 number counting system (e.g. column1 = 0, column2 = 1, etc.).
+               field_delimiter (String):  The delimiter separating the list values of the field.
+               split_field_only (Boolean):  Defines whether only the rows that were split are written.  When False, the other rows are written unchanged.
+               chunk_size (Integer):  The maximum number of records of each output file.  None writes all the records to one file unless chunk_bytes is defined.
+               encoding (String):  Encoding of the output files.
+               delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+               chunk_bytes (Integer):  The maximum size in bytes of each output file, header included.
+               keep_header (Boolean):  Defines whether the headers should be kept or not in the CSV file.
+               workers (Integer):  Number of worker processes.  Defaults to the number of cores.  Large files that are streamed from the source are split into record ranges that are exploded in parallel.
+               transforms (List):  RowTransform instances applied to the exploded records before they are written (see writeFileChunk()).  They must be picklable to be used by the workers.
+          Returns:
+               (Integer):  The number of records written across all the output files (excluding the headers).
+
+          Notes:
+               With more than one worker, each worker closes its own last output file early, so the files are numbered in order but a few of them can hold less than chunk_size records.
+          '''
+          ranges = []
+          if not self.__data_loaded and workers != 1 and CSVBytes.isByteSafeEncoding(self.__encoding) and self.__decode_errors != 'quarantine':
+               ranges = self.getRecordRanges(workers)
+
+          if len(ranges) > 1:
+               self.__readHeader()
+               exploder = RowExploder(resolveColumn(self.__data_csv.dataHeader, field), field_delimiter, split_field_only)
+               intRecordCount = self.__writeExplodedRanges(ranges, exploder, chunk_size, encoding, delimiter, chunk_bytes, keep_header, transforms)
+          else:
+               rows = self.__data_csv.data if self.__data_loaded else self.readRows()
+               exploder = RowExploder(resolveColumn(self.__data_csv.dataHeader, field), field_delimiter, split_field_only)
+               intRecordCount = self.writeFileChunk(chunk_size, keep_header, encoding, delimiter, chunk_bytes, exploder.explode(rows), 'explode', transforms)
+
+          print('[INFO] Rows split: ', exploder.split_count)
+          print('[INFO] Rows not split: ', exploder.not_split_count)
+          print('[INFO] Exploded CSV Record Count: ', intRecordCount)
+          return intRecordCount
+
+     def __writeExplodedRanges(self, ranges, exploder, chunk_size, encoding, delimiter, chunk_bytes, keep_header, transforms=None):
+          ''' Explodes the record ranges in worker processes, then renames the files they wrote so they are numbered in the order of the source records.
+          Args:
+               ranges (List):  (start offset, end offset) tuples from getRecordRanges().
+               exploder (RowExploder):  The split settings.  Its counters are updated with the totals of the workers.
+               chunk_size, encoding, delimiter, chunk_bytes, keep_header, transforms:  See writeExplodedFile().
+          Returns:
+               (Integer):  The number of records written across all the output files (excluding the headers).
+          '''
+          arguments = [(self.__source_file_path, self.__encoding, self.__delimiter, self.__strip_nul, intStart, intEnd, exploder.field_index, exploder.field_delimiter, exploder.split_field_only, chunk_size, encoding, delimiter, chunk_bytes, keep_header, 'explode.part' + str(i + 1), transforms, self.__decode_errors, self.__large_fields) for i, (intStart, intEnd) in enumerate(ranges)]
+          with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+               results = list(executor.map(explodeRange, *zip(*arguments)))
+
+          intRecordCount = sum(result[0] for result in results)
+          intCurrentPiece = 0
+          for i, (intRecords, intSplit, intNotSplit, writtenFiles) in enumerate(results):
+               exploder.split_count += intSplit
+               exploder.not_split_count += intNotSplit
+               for strPath in writtenFiles:
+                    # A range without exploded records only wrote a header, which is kept only when no range had any record
+                    if intRecords == 0 and (intRecordCount > 0 or i > 0):
+                         os.remove(strPath)
+                         continue
+                    intCurrentPiece += 1
+                    strOutputPath = self.getOutputPath(self.__pieceName(intCurrentPiece, 'explode'))
+                    os.replace(strPath, strOutputPath)
+                    self.__written_files.append(strOutputPath)
+                    self.__finishChunk(intCurrentPiece)
+          return self.__countWritten(intRecordCount)
+
+def explodeRange(source_file_path, source_encoding, source_delimiter, strip_nul, start, end, field_index, field_delimiter, split_field_only, chunk_size, encoding, delimiter, chunk_bytes, keep_header, output_label, transforms=None, decode_errors='strict', large_fields=False):
+     ''' Worker process of CSVOps.writeExplodedFile():  explodes the records of one byte range of the source file into its own series of output files.
+     Returns:
+          (Tuple):  The number of records written, of rows split, of rows not split, and the full paths of the files written.
+     '''
+     # The progress messages of the workers are dropped, the parent prints them with the final chunk numbers
+     with contextlib.redirect_stdout(io.StringIO()):
+          csvOps = CSVOps(source_file_path, source_encoding, source_delimiter, read_data=False, strip_nul=strip_nul, decode_errors=decode_errors, large_fields=large_fields)
+          exploder = RowExploder(field_index, field_delimiter, split_field_only)
+          intRecordCount = csvOps.writeFileChunk(chunk_size, keep_header, encoding, delimiter, chunk_bytes, exploder.explode(csvOps.readRangeRows(start, end)), output_label, transforms)
+     return intRecordCount, exploder.split_count, exploder.not_split_count, csvOps.getWrittenFiles()
+
+def sortRange(source_file_path, source_encoding, source_delimiter, strip_nul, start, end, sort_keys, descending, memory_budget, temp_directory, decode_errors='strict', large_fields=False):
+     ''' Worker process of CSVOps.writeSortedFile():  sorts the records of one byte range of the source file into run files.
+     Returns:
+          (List):  Full paths of the run files, in the order of their records in the source.
+     '''
+     with contextlib.redirect_stdout(io.StringIO()):
+          csvOps = CSVOps(source_file_path, source_encoding, source_delimiter, read_data=False, strip_nul=strip_nul, decode_errors=decode_errors, large_fields=large_fields)
+     rows = csvOps.readRangeRows(start, end)
+     sorter = ExternalSorter(makeKeyFunction(csvOps.getCSVData().dataHeader, sort_keys), memory_budget, temp_directory, descending)
+     try:
+          sorter.add(rows)
+          sorter.spill()
+          return sorter.detachRuns()
+     finally:
+          sorter.close()
+
+def aggregateRange(source_file_path, source_encoding, source_delimiter, strip_nul, start, end, group_columns, aggregates, vectorized=None, decode_errors='strict', large_fields=False):
+     ''' Worker process of CSVOps.writeAggregateFile():  aggregates the records of one byte range of the source file.
+     Returns:
+          (Tuple):  The number of records aggregated, and the partial aggregates of each group (Aggregator.groups).
+     '''
+     with contextlib.redirect_stdout(io.StringIO()):
+          csvOps = CSVOps(source_file_path, source_encoding, source_delimiter, read_data=False, strip_nul=strip_nul, decode_errors=decode_errors, large_fields=large_fields)
+     rows = csvOps.readRangeRows(start, end)
+     aggregator = Aggregator(csvOps.getCSVData().dataHeader, group_columns, aggregates, vectorized=vectorized)
+     intRecordCount = aggregator.add(rows)
+     return intRecordCount, aggregator.groups
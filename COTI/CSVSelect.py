@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import re
+from operator import itemgetter
+from CSVTransform import resolveColumn
+'''
+CSVSelect is a function script that keeps only some columns (projection) and some records (predicates) of a CSV file while it is read.
+The columns and predicates are resolved against the header before the first record is parsed, and the records are filtered as early as
+possible:  a line that cannot match an equality or contains predicate is dropped before the csv reader splits it into fields, and the
+records that are parsed but do not match are dropped before they are projected.
+
+Notes:
+    Dropping a line before it is parsed is only done for records on a single line.  A record with a quoted line break is always parsed,
+    since its lines cannot be told apart from records without parsing them.
+'''
+
+PREDICATE_OPERATORS = ['=', '!=', '>', '>=', '<', '<=', '~']
+# Operators in the order they are matched, so != is not read as =
+PREDICATE_PATTERN = re.compile(r'^(.*?)(!=|>=|<=|=|>|<|~)(.*)$', re.DOTALL)
+# Separates the values of a predicate that accepts any of them (e.g. Status=PAID|LATE)
+VALUE_SEPARATOR = '|'
+
+def parsePredicate(specification):
+    ''' Reads a predicate from its command line form:  a column, an operator and a value.  = and ~ (contains) accept several values
+    separated with |.  >, >=, < and <= compare numbers when the value is a number, otherwise they compare text.
+        e.g. "Status=PAID|LATE", "Amount>=1000", "Name~Corp", "CompanyCode!=1000"
+    Args:
+        specification (String):  The predicate in its command line form.
+    Returns:
+        (Tuple):  (column, operator, values).
+    Raises:
+        ValueError:  The specification is not valid.
+    '''
+    match = PREDICATE_PATTERN.match(specification)
+    if match is None or match.group(1) == '':
+        raise ValueError('Invalid predicate ' + specification + '.  A predicate is a column, an operator ' + str(PREDICATE_OPERATORS) + ' and a value (e.g. Status=PAID|LATE, Amount>=1000).')
+    column, strOperator, value = match.groups()
+    values = value.split(VALUE_SEPARATOR) if strOperator in ['=', '!=', '~'] else [value]
+    return (column, strOperator, values)
+
+def toFloat(value):
+    ''' Converts a value to a float for a numeric comparison.
+    Args:
+        value (String):  The value.
+    Returns:
+        (Float):  The number, or None when the value is not a number.
+    '''
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+class RowSelection(object):
+    ''' The columns and records kept from the source file.  bind() resolves them against the header, filterLines() drops the lines that
+    cannot match, and select() drops the records that do not match and projects the rest.
+    '''
+    def __init__(self, columns=None, predicates=None):
+        ''' Class instantiation method
+        Args:
+            columns (List):  Names or positions of the columns kept, in the order they are written.  None keeps every column.
+            predicates (List):  (column, operator, values) tuples from parsePredicate().  A record is kept when it matches all of them.
+        '''
+        self.columns = columns
+        self.predicates = predicates or []
+        # Records dropped by the predicates, and how many of them were dropped before they were parsed
+        self.dropped_count = 0
+        self.unparsed_count = 0
+        self.__tests = []
+        self.__needles = []
+        self.__project = None
+
+    def bind(self, header):
+        ''' Resolves the columns and predicates against the header of the source file.
+        Args:
+            header (List):  The fields of the header record.
+        Returns:
+            (List):  The header of the selected columns.
+        Raises:
+            ColumnError:  A column is not in the header.
+        '''
+        self.__tests = [self.__makeTest(resolveColumn(header, column), strOperator, values) for column, strOperator, values in self.predicates]
+
+        # Values a line has to contain to possibly match:  any value of each = and ~ predicate.  Values with a quote or a line break
+        # are written differently in the source, so their predicates are only checked on the parsed records.
+        self.__needles = [tuple(values) for column, strOperator, values in self.predicates
+            if strOperator in ['=', '~'] and all(value != '' and '"' not in value and '\n' not in value and '\r' not in value for value in values)]
+
+        if self.columns is None:
+            self.__project = None
+            return header
+        indexes = [resolveColumn(header, column) for column in self.columns]
+        self.__project = self.__makeProjection(indexes)
+        return [header[i] if i < len(header) else '' for i in indexes]
+
+    def filterLines(self, lines):
+        ''' Drops the lines of single line records that do not contain a value required by the predicates, before they are parsed.
+        Args:
+            lines (Iterable):  The lines of the source file after the header.
+        Returns:
+            (Generator):  Yields the lines that can hold a matching record.
+        '''
+        needles = self.__needles
+        if not needles:
+            yield from lines
+            return
+
+        blnInRecord = False
+        intDropped = 0
+        try:
+            for line in lines:
+                if blnInRecord:
+                    # A line with an odd number of quotes closes the quoted field that spans the lines
+                    if line.count('"') % 2:
+                        blnInRecord = False
+                    yield line
+                    continue
+                if line.count('"') % 2:
+                    blnInRecord = True
+                    yield line
+                    continue
+                for values in needles:
+                    for value in values:
+                        if value in line:
+                            break
+                    else:
+                        intDropped += 1
+                        break
+                else:
+                    yield line
+        finally:
+            self.dropped_count += intDropped
+            self.unparsed_count += intDropped
+
+    def select(self, rows):
+        ''' Drops the records that do not match the predicates and keeps the selected columns of the others.
+        Args:
+            rows (Iterable):  The parsed records.
+        Returns:
+            (Generator):  Yields the selected records.
+        '''
+        tests = self.__tests
+        project = self.__project
+        intDropped = 0
+        try:
+            for row in rows:
+                for test in tests:
+                    if not test(row):
+                        intDropped += 1
+                        break
+                else:
+                    yield row if project is None else project(row)
+        finally:
+            self.dropped_count += intDropped
+
+    def __makeTest(self, intColumn, strOperator, values):
+        ''' Builds the function that checks a predicate on a parsed record.
+        Args:
+            intColumn (Integer):  Position of the column.
+            strOperator (String):  One of PREDICATE_OPERATORS.
+            values (List):  The values of the predicate.
+        Returns:
+            (Callable):  Returns True when the record matches.  A missing field is blank.
+        '''
+        if strOperator == '=':
+            accepted = frozenset(values)
+            return lambda row: (row[intColumn] if intColumn < len(row) else '') in accepted
+        if strOperator == '!=':
+            rejected = frozenset(values)
+            return lambda row: (row[intColumn] if intColumn < len(row) else '') not in rejected
+        if strOperator == '~':
+            return lambda row: any(value in (row[intColumn] if intColumn < len(row) else '') for value in values)
+
+        compare = {'>': lambda a, b: a > b, '>=': lambda a, b: a >= b, '<': lambda a, b: a < b, '<=': lambda a, b: a <= b}[strOperator]
+        fltValue = toFloat(values[0])
+        if fltValue is None:
+            return lambda row: compare(row[intColumn] if intColumn < len(row) else '', values[0])
+
+        def test(row):
+            fltField = toFloat(row[intColumn] if intColumn < len(row) else '')
+            return fltField is not None and compare(fltField, fltValue)
+        return test
+
+    def __makeProjection(self, indexes):
+        ''' Builds the function that keeps the selected columns of a record.
+        Args:
+            indexes (List):  Positions of the selected columns.
+        Returns:
+            (Callable):  Returns a new record with the selected fields.  Missing fields are blank.
+        '''
+        getter = itemgetter(*indexes)
+        intWidth = max(indexes) + 1
+
+        def project(row):
+            if len(row) < intWidth:
+                row = row + [''] * (intWidth - len(row))
+            return [getter(row)] if len(indexes) == 1 else list(getter(row))
+        return project
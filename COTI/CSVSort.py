@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+import datetime
+import heapq
+import os
+import pickle
+import tempfile
+from CSVTransform import resolveColumn
+'''
+CSVSort is a function script that sorts records that do not fit in memory.  Records are collected into runs up to a memory budget, each run
+is sorted and spilled to a temporary file, and the runs are merged with a heap into one sorted stream.
+
+Notes:
+    The sort is stable: records with the same key keep the order they have in the source file.
+'''
+
+SORT_TYPES = ['string', 'int', 'float', 'date']
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+# Estimated memory of a record in a run besides the characters of its fields: the list, its key tuple and one string object per field
+ROW_OVERHEAD = 120
+FIELD_OVERHEAD = 60
+# Number of (key, record) pairs pickled together in a run file
+SPILL_BATCH_SIZE = 1000
+# Number of run files merged at once.  When there are more, consecutive runs are merged into larger runs first.
+MAX_MERGE_RUNS = 128
+
+def parseSortKeys(specification):
+    ''' Reads the sort keys from their command line form:  comma separated columns, each with an optional type (string, int, float or date).  A date type can be given its format (e.g. date=%d/%m/%Y); ISO dates (2020-12-31) are the default.
+        e.g. "DueDate:date,Amount:float,Id:int" or "CompanyCode"
+    Args:
+        specification (String):  The sort keys in their command line form.
+    Returns:
+        (List):  (column, type, date format) tuples.
+    Raises:
+        ValueError:  The specification is not valid.
+    '''
+    keys = []
+    for item in specification.split(','):
+        column, _, strType = item.partition(':')
+        strType, _, strFormat = strType.partition('=')
+        strType = strType.strip().lower() or 'string'
+        if column == '':
+            raise ValueError('A sort key needs a column (e.g. DueDate:date,Amount:float).')
+        if strType not in SORT_TYPES:
+            raise ValueError('Unknown sort type ' + strType + '.  Valid sort types are: ' + str(SORT_TYPES))
+        keys.append((column, strType, strFormat or None))
+    return keys
+
+def makeKeyFunction(header, sort_keys):
+    ''' Builds the function that extracts the sort key of a record.  Column references are resolved once against the header.
+    Args:
+        header (List):  The fields of the header record.
+        sort_keys (List):  (column, type, date format) tuples from parseSortKeys().
+    Returns:
+        (Callable):  Returns the key of a record.  Typed values are (True, value) pairs, and values that cannot be converted become (False, '') so they sort first.
+    '''
+    converters = []
+    for column, strType, strFormat in sort_keys:
+        intColumn = resolveColumn(header, column)
+        if strType == 'string':
+            converters.append((intColumn, None))
+        elif strType == 'int':
+            converters.append((intColumn, int))
+        elif strType == 'float':
+            converters.append((intColumn, float))
+        elif strFormat is None:
+            converters.append((intColumn, lambda value: datetime.date.fromisoformat(value.strip()[:10]).toordinal()))
+        else:
+            converters.append((intColumn, lambda value, strFormat=strFormat: datetime.datetime.strptime(value.strip(), strFormat).toordinal()))
+
+    def convert(row, intColumn, converter):
+        value = row[intColumn] if intColumn < len(row) else ''
+        if converter is None:
+            return value
+        try:
+            return (True, converter(value))
+        except ValueError:
+            return (False, '')
+
+    if len(converters) == 1:
+        intColumn, converter = converters[0]
+        return lambda row: convert(row, intColumn, converter)
+    return lambda row: tuple([convert(row, intColumn, converter) for intColumn, converter in converters])
+
+class ExternalSorter(object):
+    ''' Sorts records within a memory budget, spilling sorted runs to temporary files.
+    '''
+    def __init__(self, key_function, memory_budget=DEFAULT_MEMORY_BUDGET, temp_directory=None, descending=False):
+        ''' Class instantiation method
+        Args:
+            key_function (Callable):  Returns the sort key of a record (see makeKeyFunction()).
+            memory_budget (Integer):  Estimated bytes of records kept in memory before a run is spilled.
+            temp_directory (String):  Directory of the run files.  Defaults to the system temporary directory.
+            descending (Boolean):  Defines whether the records are sorted from the largest key to the smallest.
+        '''
+        self.key_function = key_function
+        self.memory_budget = memory_budget
+        self.temp_directory = temp_directory
+        self.descending = descending
+        self.runs = []
+        self.spilled_bytes = 0
+        self.__records = []
+        self.__records_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, rows):
+        ''' Adds records to the sort, spilling a run each time the memory budget is reached.
+        Args:
+            rows (Iterable):  The records, each as a list of fields.
+        '''
+        keyFunction = self.key_function
+        records = self.__records
+        intBytes = self.__records_bytes
+        intBudget = self.memory_budget
+        for row in rows:
+            records.append((keyFunction(row), row))
+            intBytes += ROW_OVERHEAD + FIELD_OVERHEAD * len(row) + sum(map(len, row))
+            if intBytes >= intBudget:
+                self.__records_bytes = intBytes
+                self.spill()
+                records = self.__records
+                intBytes = 0
+        self.__records_bytes = intBytes
+
+    def spill(self):
+        ''' Sorts the records in memory and writes them to a new run file.
+        '''
+        if not self.__records:
+            return
+        records = self.__sortRecords()
+        self.__records = []
+        self.__records_bytes = 0
+        self.runs.append(self.__writeRun(records))
+
+    def addRuns(self, run_file_paths):
+        ''' Adopts run files written by another sorter (e.g. in a worker process).  They are merged after the runs already spilled, and deleted by close().
+        Args:
+            run_file_paths (List):  Full paths of the run files, in the order of their records in the source.
+        '''
+        self.runs.extend(run_file_paths)
+        self.spilled_bytes += sum(os.path.getsize(path) for path in run_file_paths)
+
+    def detachRuns(self):
+        ''' Hands the run files over to the caller, e.g. to return them from a worker process.  They are no longer deleted by close().
+        Returns:
+            (List):  Full paths of the run files.
+        '''
+        runs = self.runs
+        self.runs = []
+        return runs
+
+    def sorted(self):
+        ''' Merges the runs and the records still in memory.
+        Returns:
+            (Generator):  Yields each record in sorted order.
+        '''
+        while len(self.runs) > MAX_MERGE_RUNS:
+            # Merging consecutive runs keeps the sort stable
+            merged = self.__writeRun(self.__merge(self.runs[:MAX_MERGE_RUNS]))
+            for path in self.runs[:MAX_MERGE_RUNS]:
+                os.remove(path)
+            self.runs[:MAX_MERGE_RUNS] = [merged]
+
+        if not self.runs:
+            return (row for key, row in self.__sortRecords())
+        return (row for key, row in self.__merge(self.runs, self.__sortRecords()))
+
+    def close(self):
+        ''' Deletes the run files.
+        '''
+        for path in self.runs:
+            if os.path.exists(path):
+                os.remove(path)
+        self.runs = []
+        self.__records = []
+
+    def __sortRecords(self):
+        ''' Sorts the records in memory.
+        Returns:
+            (List):  The (key, record) pairs in sorted order.
+        '''
+        self.__records.sort(key=lambda record: record[0], reverse=self.descending)
+        return self.__records
+
+    def __merge(self, run_file_paths, records=None):
+        ''' Merges run files (and the sorted records in memory, which come last in the source) with a heap.
+        Args:
+            run_file_paths (List):  Full paths of the run files.
+            records (List):  Sorted (key, record) pairs still in memory.
+        Returns:
+            (Iterator):  The (key, record) pairs in sorted order.
+        '''
+        iterables = [readRun(path) for path in run_file_paths]
+        if records:
+            iterables.append(records)
+        return heapq.merge(*iterables, key=lambda record: record[0], reverse=self.descending)
+
+    def __writeRun(self, records):
+        ''' Writes sorted (key, record) pairs to a new run file.
+        Args:
+            records (Iterable):  The pairs in sorted order.
+        Returns:
+            (String):  Full path of the run file.
+        '''
+        strPath = writeRun(records, self.temp_directory)
+        self.spilled_bytes += os.path.getsize(strPath)
+        return strPath
+
+def writeRun(records, temp_directory=None, prefix='coti-sort-'):
+    ''' Writes records to a new temporary run file, pickled in batches.
+    Args:
+        records (Iterable):  The records, in the order they are read back by readRun().
+        temp_directory (String):  Directory of the run file.  Defaults to the system temporary directory.
+        prefix (String):  Start of the name of the run file.
+    Returns:
+        (String):  Full path of the run file.
+    '''
+    intHandle, strPath = tempfile.mkstemp(prefix=prefix, suffix='.run', dir=temp_directory)
+    with os.fdopen(intHandle, 'wb') as filehandler:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= SPILL_BATCH_SIZE:
+                pickle.dump(batch, filehandler, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            pickle.dump(batch, filehandler, pickle.HIGHEST_PROTOCOL)
+    return strPath
+
+def readRun(run_file_path):
+    ''' Reads the (key, record) pairs of a run file.
+    Args:
+        run_file_path (String):  Full path of the run file.
+    Returns:
+        (Generator):  Yields each pair in the order it was written.
+    '''
+    with open(run_file_path, 'rb') as filehandler:
+        while True:
+            try:
+                batch = pickle.load(filehandler)
+            except EOFError:
+                return
+            yield from batch
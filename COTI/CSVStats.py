@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import contextlib
+import json
+import os
+import sys
+import time
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; the peak memory is then not reported
+    resource = None
+'''
+CSVStats is a function script that collects runtime metrics of a COTI run: wall and CPU time per phase, records and bytes processed, the
+latency of each output chunk, the time the writer thread spent writing and the time the reader spent waiting on it, and the peak memory.
+
+Notes:
+    The metrics are taken per phase, per chunk and per batch of records, never per record, so the overhead stays negligible and the stats
+    can be left on in production.  cProfile and tracemalloc are opt-in because they slow the run down.
+'''
+
+# Number of entries printed from the cProfile and tracemalloc reports
+PROFILE_ENTRIES = 20
+
+class RunStats(object):
+    ''' Metrics of one run.
+    '''
+    def __init__(self):
+        ''' Class instantiation method.  The clock of the run starts here.
+        '''
+        self.phases = {}
+        self.counters = {}
+        self.chunks = []
+        self.__started = time.perf_counter()
+        self.__cpu_started = time.process_time()
+        self.__chunk_started = None
+        self.__profiler = None
+        self.__profile_path = None
+        self.__trace_memory = False
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        ''' Times a phase of the run.  A phase that runs several times is added up.
+        Args:
+            name (String):  Name of the phase (e.g. read, chunk).
+        '''
+        fltStart = time.perf_counter()
+        fltCPUStart = time.process_time()
+        try:
+            yield self
+        finally:
+            phase = self.phases.setdefault(name, {'seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})
+            phase['seconds'] += time.perf_counter() - fltStart
+            phase['cpu_seconds'] += time.process_time() - fltCPUStart
+            phase['calls'] += 1
+
+    def count(self, name, value):
+        ''' Adds to a counter (e.g. rows_read, bytes_read, rows_written).
+        Args:
+            name (String):  Name of the counter.
+            value (Number):  Amount to add.
+        '''
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def startChunks(self):
+        ''' Starts the clock of the first output chunk.
+        '''
+        self.__chunk_started = time.perf_counter()
+
+    def chunkDone(self, output_path):
+        ''' Records that an output chunk was finished.  Its latency is the time since the previous chunk (or since startChunks()).
+        Args:
+            output_path (String):  Full path of the chunk file.
+        '''
+        fltNow = time.perf_counter()
+        if self.__chunk_started is None:
+            self.__chunk_started = self.__started
+        self.chunks.append((output_path, fltNow - self.__chunk_started))
+        self.__chunk_started = fltNow
+
+    def addWriter(self, writer):
+        ''' Adds the timings of a CSVWriter.ChunkWriter once it is closed.
+        Args:
+            writer (ChunkWriter):  The closed writer.
+        '''
+        self.count('writer_thread_seconds', writer.write_seconds)
+        self.count('writer_wait_seconds', writer.wait_seconds)
+        self.count('writer_batches', writer.batches)
+
+    def startProfiling(self, profile_path=None, trace_memory=False):
+        ''' Attaches the optional profilers to the rest of the run.
+        Args:
+            profile_path (String):  File the cProfile statistics are saved to.  None does not profile.
+            trace_memory (Boolean):  Defines whether tracemalloc traces the allocations, to report the peak of the Python heap and where it was allocated.
+        '''
+        if trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+            self.__trace_memory = True
+        if profile_path is not None:
+            import cProfile
+            self.__profile_path = profile_path
+            self.__profiler = cProfile.Profile()
+            self.__profiler.enable()
+
+    def stopProfiling(self):
+        ''' Stops the profilers started by startProfiling() and prints their reports.
+        '''
+        if self.__profiler is not None:
+            import pstats
+            self.__profiler.disable()
+            self.__profiler.dump_stats(self.__profile_path)
+            print('[STATS] cProfile statistics saved to: ', self.__profile_path)
+            pstats.Stats(self.__profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(PROFILE_ENTRIES)
+            self.__profiler = None
+        if self.__trace_memory:
+            import tracemalloc
+            intCurrent, intPeak = tracemalloc.get_traced_memory()
+            self.counters['traced_peak_mb'] = round(intPeak / (1024 * 1024), 1)
+            print('[STATS] Largest allocation sites:')
+            for statistic in tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_ENTRIES]:
+                print('[STATS]     ', statistic)
+            tracemalloc.stop()
+            self.__trace_memory = False
+
+    def summary(self):
+        ''' Builds the metrics of the run.
+        Returns:
+            (Dictionary):  The metrics, ready to be saved as JSON.
+        '''
+        fltSeconds = time.perf_counter() - self.__started
+        summary = {
+            'seconds': round(fltSeconds, 4),
+            'cpu_seconds': round(time.process_time() - self.__cpu_started, 4),
+            'peak_rss_mb': peakMemory(),
+            'phases': {name: {key: round(value, 4) for key, value in phase.items()} for name, phase in self.phases.items()},
+            'counters': {name: round(value, 4) if isinstance(value, float) else value for name, value in self.counters.items()},
+        }
+
+        for strRows, strBytes in [('rows_read', 'bytes_read'), ('rows_written', 'bytes_written')]:
+            if strRows in self.counters and fltSeconds > 0:
+                summary['counters'][strRows + '_per_second'] = round(self.counters[strRows] / fltSeconds)
+            if strBytes in self.counters and fltSeconds > 0:
+                summary['counters'][strBytes.replace('bytes', 'mb') + '_per_second'] = round(self.counters[strBytes] / (1024 * 1024) / fltSeconds, 2)
+
+        if self.chunks:
+            latencies = sorted(latency for path, latency in self.chunks)
+            summary['chunks'] = {
+                'count': len(latencies),
+                'min_seconds': round(latencies[0], 4),
+                'mean_seconds': round(sum(latencies) / len(latencies), 4),
+                'p95_seconds': round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 4),
+                'max_seconds': round(latencies[-1], 4),
+                'slowest': os.path.basename(max(self.chunks, key=lambda chunk: chunk[1])[0]),
+            }
+        return summary
+
+    def printSummary(self, summary=None):
+        ''' Prints the metrics of the run.
+        Args:
+            summary (Dictionary):  Metrics from summary().  Defaults to the current metrics.
+        '''
+        if summary is None:
+            summary = self.summary()
+        print('[STATS] Total: %.3f s wall, %.3f s CPU, peak memory %s MB' % (summary['seconds'], summary['cpu_seconds'], summary['peak_rss_mb']))
+        for name, phase in summary['phases'].items():
+            print('[STATS] Phase %-10s %10.3f s wall %10.3f s CPU  (%d calls)' % (name, phase['seconds'], phase['cpu_seconds'], phase['calls']))
+        for name, value in summary['counters'].items():
+            print('[STATS] %-28s %s' % (name, value))
+        if 'chunks' in summary:
+            chunks = summary['chunks']
+            print('[STATS] Chunks: %d, latency min %.3f s, mean %.3f s, p95 %.3f s, max %.3f s (%s)' % (chunks['count'], chunks['min_seconds'], chunks['mean_seconds'], chunks['p95_seconds'], chunks['max_seconds'], chunks['slowest']))
+
+    def save(self, stats_file_path, summary=None):
+        ''' Writes the metrics of the run to a JSON file.
+        Args:
+            stats_file_path (String):  Full path of the file.
+            summary (Dictionary):  Metrics from summary().  Defaults to the current metrics.
+        '''
+        if summary is None:
+            summary = self.summary()
+        with open(stats_file_path, 'w', encoding='utf-8') as filehandler:
+            json.dump(summary, filehandler, indent=2)
+        print('[STATS] Stats saved to: ', stats_file_path)
+
+def timePhase(stats, name):
+    ''' Times a phase when stats are collected.
+    Args:
+        stats (RunStats):  The metrics of the run, or None when they are not collected.
+        name (String):  Name of the phase.
+    Returns:
+        (Context manager):  RunStats.phase(), or a context manager doing nothing.
+    '''
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.phase(name)
+
+def peakMemory():
+    ''' Returns the peak resident memory of this process and of its finished worker processes.
+    Returns:
+        (Float):  Peak memory in MB, or None where it cannot be measured.
+    '''
+    if resource is None:
+        return None
+    intPeak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(intPeak / (1024 * 1024) if sys.platform == 'darwin' else intPeak / 1024, 1)
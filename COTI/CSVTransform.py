@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import importlib
+'''
+CSVTransform is a function script with the row operations that COTI applies to the records while they are streamed to the writers, so the
+transformed records never have to be written to an intermediate file first.
+'''
+
+TRANSFORMS = ['concat', 'replace', 'trim', 'call']
+
+class ColumnError(ValueError):
+    ''' Raised when a column reference is not in the header of the file.
+    '''
+    pass
+
+def resolveColumn(header, column):
+    ''' Finds the position of a column in the header.
+    Args:
+        header (List):  The fields of the header record.
+        column (String):  Name of the column, or its position using a 0 number counting system (e.g. column1 = 0, column2 = 1, etc.).
+    Returns:
+        (Integer):  Position of the column.
+    Raises:
+        ColumnError:  The column is not in the header.
+    '''
+    if column in header:
+        return header.index(column)
+    if str(column).isdigit() and int(column) < len(header):
+        return int(column)
+    raise ColumnError('Column ' + str(column) + ' is not in the header: ' + str(header))
+
+class RowExploder(object):
+    ''' Splits the list values of a field into additional rows while keeping the remaining columns the same value.
+    '''
+    def __init__(self, field_index, field_delimiter, split_field_only=True):
+        ''' Class instantiation method
+        Args:
+            field_index (Integer):  Position of the field to split, using a 0 number counting system.
+            field_delimiter (String):  The delimiter separating the list values of the field.
+            split_field_only (Boolean):  Defines whether only the rows that were split are kept.  When False, the other rows are kept unchanged.
+        '''
+        self.field_index = field_index
+        self.field_delimiter = field_delimiter
+        self.split_field_only = split_field_only
+        self.split_count = 0
+        self.not_split_count = 0
+
+    def explode(self, rows):
+        ''' Splits the rows one at a time, so only the current row and its copies are held in memory.
+        Args:
+            rows (Iterable):  The records to split, each as a list of fields.
+        Returns:
+            (Generator):  Yields a new list for each value of the split field.  The input rows are never modified.
+        '''
+        intField = self.field_index
+        strDelimiter = self.field_delimiter
+        for row in rows:
+            if len(row) > intField and strDelimiter in row[intField]:
+                self.split_count += 1
+                prefix = row[:intField]
+                suffix = row[intField + 1:]
+                for item in row[intField].split(strDelimiter):
+                    yield prefix + [item] + suffix
+            else:
+                self.not_split_count += 1
+                if not self.split_field_only:
+                    yield row
+
+class RowTransform(object):
+    ''' Base class of the transforms applied to each record by a TransformPipeline.  Column references are resolved to positions once by bind(), before the first record is transformed.
+    '''
+    def bind(self, header):
+        ''' Resolves the column references of the transform against the header.
+        Args:
+            header (List):  The fields of the header record.  Transforms that add a column append it to this list.
+        '''
+        pass
+
+    def apply(self, row):
+        ''' Transforms a record.
+        Args:
+            row (List):  The fields of the record.  The list can be modified in place.
+        Returns:
+            (List):  The transformed record.
+        '''
+        return row
+
+class Concat(RowTransform):
+    ''' Joins the values of several columns into a target column (e.g. DocumentNo = DocumentNo + '-' + InstallmentId).
+    '''
+    def __init__(self, target, columns, separator=''):
+        ''' Class instantiation method
+        Args:
+            target (String):  Name or position of the column receiving the joined value.  A name that is not in the header adds a new column.
+            columns (List):  Names or positions of the columns to join, in order.
+            separator (String):  Inserted between the values.
+        '''
+        self.target = target
+        self.columns = columns
+        self.separator = separator
+
+    def bind(self, header):
+        self.__columns = [resolveColumn(header, column) for column in self.columns]
+        if self.target not in header and not str(self.target).isdigit():
+            header.append(self.target)
+        self.__target = resolveColumn(header, self.target)
+
+    def apply(self, row):
+        value = self.separator.join([row[i] if i < len(row) else '' for i in self.__columns])
+        if self.__target < len(row):
+            row[self.__target] = value
+        else:
+            row.extend([''] * (self.__target - len(row)))
+            row.append(value)
+        return row
+
+class Replace(RowTransform):
+    ''' Replaces a substring in the values of a column.
+    '''
+    def __init__(self, column, old, new):
+        ''' Class instantiation method
+        Args:
+            column (String):  Name or position of the column.
+            old (String):  The substring to replace.
+            new (String):  The replacement.
+        '''
+        self.column = column
+        self.old = old
+        self.new = new
+
+    def bind(self, header):
+        self.__column = resolveColumn(header, self.column)
+
+    def apply(self, row):
+        if self.__column < len(row):
+            row[self.__column] = row[self.__column].replace(self.old, self.new)
+        return row
+
+class Trim(RowTransform):
+    ''' Removes the leading and trailing whitespace (or the given characters) of the values of some or all columns.
+    '''
+    def __init__(self, columns=None, characters=None):
+        ''' Class instantiation method
+        Args:
+            columns (List):  Names or positions of the columns.  None trims every column.
+            characters (String):  The characters to remove.  None removes whitespace.
+        '''
+        self.columns = columns
+        self.characters = characters
+
+    def bind(self, header):
+        self.__columns = None if self.columns is None else [resolveColumn(header, column) for column in self.columns]
+
+    def apply(self, row):
+        if self.__columns is None:
+            return [value.strip(self.characters) for value in row]
+        for i in self.__columns:
+            if i < len(row):
+                row[i] = row[i].strip(self.characters)
+        return row
+
+class Call(RowTransform):
+    ''' Applies a user-supplied function to each record.
+    '''
+    def __init__(self, function):
+        ''' Class instantiation method
+        Args:
+            function (Callable):  Called with the fields of each record.  It returns the transformed record, or None when it modified the list in place.  It must be defined at module level to be used by worker processes.
+        '''
+        self.function = function
+
+    def apply(self, row):
+        result = self.function(row)
+        return row if result is None else result
+
+class TransformPipeline(object):
+    ''' Ordered chain of RowTransform applied to each record in the same pass that reads and writes it.
+    '''
+    def __init__(self, transforms):
+        ''' Class instantiation method
+        Args:
+            transforms (List):  The RowTransform instances, in the order they are applied.
+        '''
+        self.transforms = list(transforms)
+
+    def bind(self, header):
+        ''' Resolves the column references of every transform once, before the first record.
+        Args:
+            header (List):  The fields of the header record.  It is not modified.
+        Returns:
+            (List):  The header of the transformed records, including the columns added by the transforms.
+        '''
+        header = list(header)
+        for transform in self.transforms:
+            transform.bind(header)
+        return header
+
+    def transform(self, rows, copy_rows=False):
+        ''' Applies the transforms to the records one at a time.
+        Args:
+            rows (Iterable):  The records, each as a list of fields.
+            copy_rows (Boolean):  Defines whether each record is copied before it is transformed, e.g. for records kept in memory that must not be modified.
+        Returns:
+            (Generator):  Yields each transformed record.
+        '''
+        transforms = [transform.apply for transform in self.transforms]
+        for row in rows:
+            if copy_rows:
+                row = list(row)
+            for apply in transforms:
+                row = apply(row)
+            yield row
+
+def parseTransform(specification):
+    ''' Builds a transform from its command line form.  Lists of columns are separated with "+".
+        concat:<target>:<column>+<column>[:<separator>]    e.g. concat:DocumentNo:DocumentNo+InstallmentId:-
+        replace:<column>:<old>:<new>                          e.g. replace:Amount:,:.
+        trim[:<column>+<column>]                              e.g. trim or trim:Name+City
+        call:<module>.<function>                              e.g. call:myetl.updateDocumentNo
+    Args:
+        specification (String):  The transform in its command line form.
+    Returns:
+        (RowTransform):  The transform.
+    Raises:
+        ValueError:  The specification is not valid.
+    '''
+    name, _, arguments = specification.partition(':')
+    name = name.strip().lower()
+
+    if name == 'concat':
+        parts = arguments.split(':', 2)
+        if len(parts) < 2 or parts[0] == '' or parts[1] == '':
+            raise ValueError('A concat transform needs a target and the columns to join (e.g. concat:DocumentNo:DocumentNo+InstallmentId:-).')
+        return Concat(parts[0], parts[1].split('+'), parts[2] if len(parts) > 2 else '')
+
+    if name == 'replace':
+        parts = arguments.split(':', 2)
+        if len(parts) < 3 or parts[0] == '' or parts[1] == '':
+            raise ValueError('A replace transform needs a column, the substring to replace and its replacement (e.g. replace:Amount:,:.).')
+        return Replace(parts[0], parts[1], parts[2])
+
+    if name == 'trim':
+        return Trim(arguments.split('+') if arguments != '' else None)
+
+    if name == 'call':
+        strModule, _, strFunction = arguments.rpartition('.')
+        if strModule == '' or strFunction == '':
+            raise ValueError('A call transform needs a module and a function (e.g. call:myetl.updateDocumentNo).')
+        try:
+            function = getattr(importlib.import_module(strModule), strFunction)
+        except (ImportError, AttributeError) as e:
+            raise ValueError('The function ' + arguments + ' could not be loaded: ' + str(e))
+        return Call(function)
+
+    raise ValueError('Unknown transform ' + name + '.  Valid transforms are: ' + str(TRANSFORMS))
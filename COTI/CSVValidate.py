@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+import csv
+import os
+import pickle
+import tempfile
+from CSVBytes import BLOCK_SIZE, NEWLINE, NUL
+from CSVSort import SPILL_BATCH_SIZE
+from CSVFields import MAX_FIELD_SIZE_LIMIT, fieldSizeLimit
+'''
+CSVValidate is a function script that checks the structure of every record of a CSV file before it is loaded or chunked:  records whose
+number of fields does not match the header, quoted fields that are not closed or are followed by other characters, bytes that are not
+valid in the encoding, and fields longer than the csv module accepts.  Each error is reported with the record number, the line number and
+the byte offset where it is found, so the record can be opened and fixed directly.
+
+Notes:
+    The file is split into byte ranges that start and end at record boundaries (see CSVBytes.findRecordRanges()), which are checked by
+    worker processes.  Each worker numbers its records and lines from the start of its range, and the numbers are made absolute once the
+    counts of the ranges before it are known.  The errors of each range are spilled to a temporary file, so the report is complete
+    whatever the number of errors.
+'''
+
+VALIDATION_ERRORS = ['header', 'encoding', 'quotes', 'nul', 'field_count', 'field_size']
+REPORT_HEADER = ['record', 'line', 'offset', 'error', 'detail']
+# Longest field accepted by default:  the default limit of the csv module, over which reading the file in the other operations fails
+DEFAULT_MAX_FIELD_SIZE = 131072
+
+def validateHeader(header_bytes, encoding, delimiter):
+    ''' Checks the header record.
+    Args:
+        header_bytes (Bytes):  The raw header record, e.g. from CSVBytes.readHeader().
+        encoding (String):  Encoding of the file.
+        delimiter (String):  Delimiter of the file.
+    Returns:
+        (Tuple):  (the fields of the header, the errors found as (record, line, offset, error, detail) tuples).
+    '''
+    errors = []
+    try:
+        text = header_bytes.decode(encoding)
+    except UnicodeDecodeError as e:
+        errors.append((0, 1, e.start, 'encoding', 'Invalid ' + encoding + ' bytes: ' + header_bytes[e.start:e.end].hex()))
+        text = header_bytes.decode(encoding, 'replace')
+    header = next(csv.reader([text], delimiter=delimiter), [])
+    if not header:
+        errors.append((0, 1, 0, 'header', 'The header is empty.'))
+    names = set()
+    for i, name in enumerate(header):
+        if name.strip() == '':
+            errors.append((0, 1, 0, 'header', 'Column ' + str(i) + ' has no name.'))
+        elif name in names:
+            errors.append((0, 1, 0, 'header', 'Column ' + name + ' is repeated.'))
+        names.add(name)
+    return (header, errors)
+
+class RangeValidator(object):
+    ''' Checks the records of one byte range of a CSV file.
+    '''
+    def __init__(self, source_file_path, start, end, encoding='utf-8', delimiter=',', header=None, max_field_size=DEFAULT_MAX_FIELD_SIZE, strip_nul=False, temp_directory=None):
+        ''' Class instantiation method
+        Args:
+            source_file_path (String):  Contains the full file path and file name of the source file.
+            start (Integer):  Offset of the first record of the range.
+            end (Integer):  Offset right after the last record of the range.
+            encoding (String):  Encoding of the file.  Must be one where quotes and line feeds are single bytes (see CSVBytes.isByteSafeEncoding()).
+            delimiter (String):  Delimiter of the file.
+            header (List):  The fields of the header record.  Each record must have as many fields.
+            max_field_size (Integer):  Number of characters over which a field is reported.
+            strip_nul (Boolean):  Defines whether NUL characters are removed before the records are checked, as the other operations do with -stripnul.
+            temp_directory (String):  Directory of the error file.  Defaults to the system temporary directory.
+        '''
+        self.source_file_path = source_file_path
+        self.start = start
+        self.end = end
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.header = header or []
+        self.max_field_size = max_field_size
+        self.strip_nul = strip_nul
+        self.temp_directory = temp_directory
+        self.record_count = 0
+        self.line_count = 0
+        self.counts = {name: 0 for name in VALIDATION_ERRORS}
+        self.__offset = start
+        self.__errors = []
+        self.__error_file = None
+        self.__error_path = None
+
+    def run(self):
+        ''' Checks every record of the range.
+        Returns:
+            (Tuple):  (full path of a run file with the errors as (record, line, offset, error, detail) tuples, or None when there is none;
+            the number of errors of each kind; the number of records; the number of lines).  Records and lines are numbered from 1 at the
+            start of the range.
+        '''
+        intFieldCount = len(self.header)
+        intMaxSize = self.max_field_size
+        # The fields over max_field_size are reported here instead of stopping the csv reader
+        with fieldSizeLimit(MAX_FIELD_SIZE_LIMIT):
+            reader = csv.reader(self.__readLines(), delimiter=self.delimiter, strict=True)
+            while True:
+                intOffset = self.__offset
+                intLine = self.line_count + 1
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    break
+                except csv.Error as e:
+                    self.record_count += 1
+                    self.__addError(self.record_count, intLine, intOffset, 'nul' if 'NUL' in str(e) else 'quotes', str(e))
+                    continue
+                self.record_count += 1
+                if len(row) != intFieldCount:
+                    strDetail = str(len(row)) + ' fields, expected ' + str(intFieldCount)
+                    if self.line_count > intLine:
+                        strDetail += ' (the record spans lines ' + str(intLine) + ' to ' + str(self.line_count) + ')'
+                    self.__addError(self.record_count, intLine, intOffset, 'field_count', strDetail)
+                if row and max(map(len, row)) > intMaxSize:
+                    for i, field in enumerate(row):
+                        if len(field) > intMaxSize:
+                            strColumn = self.header[i] if i < len(self.header) else str(i)
+                            self.__addError(self.record_count, intLine, intOffset, 'field_size', 'Field ' + strColumn + ' has ' + str(len(field)) + ' characters, over ' + str(intMaxSize))
+        return (self.__finishErrors(), self.counts, self.record_count, self.line_count)
+
+    def __readLines(self):
+        ''' Reads the lines of the range, in large blocks.  The offset and number of the lines are kept up to date, so the offset and line of
+        a record are known when the csv reader asks for its first line.  The bytes that are not valid in the encoding are reported and replaced.
+        Returns:
+            (Generator):  Yields each decoded line with its line feed.
+        '''
+        with open(self.source_file_path, 'rb') as filehandler:
+            filehandler.seek(self.start)
+            intRemaining = self.end - self.start
+            # The bytes of a line that runs over several blocks are kept in parts and joined once the line ends
+            tail = []
+            while intRemaining > 0:
+                block = filehandler.read(min(BLOCK_SIZE, intRemaining))
+                if not block:
+                    break
+                intRemaining -= len(block)
+                tail.append(block)
+                if NEWLINE not in block:
+                    continue
+                lines = b''.join(tail).split(NEWLINE)
+                tail = [lines.pop()]
+                for line in lines:
+                    intLineStart = self.__offset
+                    self.__offset += len(line) + 1
+                    yield self.__decodeLine(line, intLineStart) + '\n'
+            tail = b''.join(tail)
+            if tail:
+                intLineStart = self.__offset
+                self.__offset += len(tail)
+                yield self.__decodeLine(tail, intLineStart)
+
+    def __decodeLine(self, line, offset):
+        ''' Decodes a line, reporting the bytes that are not valid in the encoding.
+        Args:
+            line (Bytes):  The line without its line feed.
+            offset (Integer):  Offset of the line in the file.
+        Returns:
+            (String):  The decoded line.  Invalid bytes are replaced with U+FFFD.
+        '''
+        self.line_count += 1
+        if self.strip_nul:
+            line = line.replace(NUL, b'')
+        try:
+            return line.decode(self.encoding)
+        except UnicodeDecodeError as e:
+            # The record number of the record the line belongs to, which the csv reader has not returned yet
+            self.__addError(self.record_count + 1, self.line_count, offset + e.start, 'encoding', 'Invalid ' + self.encoding + ' bytes: ' + line[e.start:e.end].hex())
+            return line.decode(self.encoding, 'replace')
+
+    def __addError(self, record, line, offset, error, detail):
+        ''' Adds an error to the report of the range, spilling the errors to a temporary file in batches.
+        Args:
+            record (Integer):  Number of the record from the start of the range.
+            line (Integer):  Number of the line from the start of the range.
+            offset (Integer):  Byte offset of the record, or of the invalid bytes, in the file.
+            error (String):  One of VALIDATION_ERRORS.
+            detail (String):  Description of the error.
+        '''
+        self.counts[error] += 1
+        self.__errors.append((record, line, offset, error, detail))
+        if len(self.__errors) >= SPILL_BATCH_SIZE:
+            self.__writeErrors()
+
+    def __writeErrors(self):
+        ''' Writes the buffered errors to the error file, creating it the first time.
+        '''
+        if self.__error_file is None:
+            intHandle, self.__error_path = tempfile.mkstemp(prefix='coti-validate-', suffix='.run', dir=self.temp_directory)
+            self.__error_file = os.fdopen(intHandle, 'wb')
+        pickle.dump(self.__errors, self.__error_file, pickle.HIGHEST_PROTOCOL)
+        self.__errors = []
+
+    def __finishErrors(self):
+        ''' Writes the remaining errors and closes the error file.
+        Returns:
+            (String):  Full path of the error file, or None when the range has no error.
+        '''
+        if self.__errors:
+            self.__writeErrors()
+        if self.__error_file is not None:
+            self.__error_file.close()
+            self.__error_file = None
+        return self.__error_path
+
+def validateRange(source_file_path, start, end, encoding, delimiter, header, max_field_size, strip_nul, temp_directory=None):
+    ''' Checks the records of one byte range of a CSV file, in a worker process (see RangeValidator).
+    Returns:
+        (Tuple):  The result of RangeValidator.run().
+    '''
+    return RangeValidator(source_file_path, start, end, encoding, delimiter, header, max_field_size, strip_nul, temp_directory).run()
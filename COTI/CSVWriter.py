@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+import csv
+import itertools
+from collections import OrderedDict
+import queue
+import threading
+import time
+'''
+CSVWriter is a function script that writes the output files of COTI.  Records are collected in batches and handed to a writer thread, which
+formats, encodes and writes them with large buffers while the calling thread keeps reading and parsing the source file.
+
+Notes:
+    Only one output file is open at a time.  Opening the next chunk closes the previous one, and close() waits until every record was written.
+'''
+
+# Number of records (or encoded blocks) sent to the writer thread at once
+BATCH_SIZE = 1000
+# Number of batches waiting for the writer thread before the calling thread blocks, which bounds the memory used by the queue
+QUEUE_SIZE = 16
+# Buffer size of the output files
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Number of output files a PartitionWriter keeps open at once, well under the usual file descriptor limits
+MAX_OPEN_FILES = 128
+# Buffer size of each partition file, smaller than WRITE_BUFFER_SIZE since many of them are open at once
+PARTITION_BUFFER_SIZE = 64 * 1024
+# Number of records a PartitionWriter buffers across all the partitions before it writes them out
+PARTITION_BUFFER_ROWS = 100000
+
+class ChunkWriter(object):
+    ''' Writes records to a series of output files from a background thread.  writerow() has the same call as a csv.writer.
+    '''
+    def __init__(self, encoding='utf-8', delimiter=',', newline='', binary=False, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE):
+        ''' Class instantiation method
+        Args:
+            encoding (String):  Encoding of the output files.
+            delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+            newline (String):  Controls how universal newlines mode works when the files are written.  See CSVOps.setWriter().
+            binary (Boolean):  Defines whether the files are written with write() from bytes that were already formatted and encoded, instead of from records with writerow().
+            batch_size (Integer):  Number of records or blocks sent to the writer thread at once.
+            queue_size (Integer):  Number of batches that can wait for the writer thread.
+        '''
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.newline = newline
+        self.binary = binary
+        self.batch_size = batch_size
+        # Seconds the writer thread spent writing, seconds the calling thread waited for room in the queue, and batches written
+        self.write_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.batches = 0
+        self.__batch = []
+        self.__queue = queue.Queue(queue_size)
+        self.__error = None
+        self.__thread = threading.Thread(target=self.__run, name='ChunkWriter', daemon=True)
+        self.__thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self, output_path, header=None):
+        ''' Starts a new output file.  The previous file is closed by the writer thread once its records are written.
+        Args:
+            output_path (String):  Full path of the file.
+            header (List):  Record written first to the file (encoded bytes in binary mode).  None writes no header.
+        '''
+        self.__flush()
+        self.__put(('open', output_path))
+        if header is not None:
+            self.__batch.append(header)
+
+    def writerow(self, row):
+        ''' Adds a record to the current file.
+        Args:
+            row (List):  The fields of the record.
+        '''
+        self.__batch.append(row)
+        if len(self.__batch) >= self.batch_size:
+            self.__flush()
+
+    def writerows(self, rows):
+        ''' Adds records to the current file.  The records are moved into the batch without a Python loop per record.
+        Args:
+            rows (Iterable):  The records, each as a list of fields.
+        Returns:
+            (Integer):  The number of records added.
+        '''
+        rows = iter(rows)
+        intCount = 0
+        while True:
+            intRoom = self.batch_size - len(self.__batch)
+            intBefore = len(self.__batch)
+            self.__batch.extend(itertools.islice(rows, intRoom))
+            intAdded = len(self.__batch) - intBefore
+            intCount += intAdded
+            if len(self.__batch) >= self.batch_size:
+                self.__flush()
+            if intAdded < intRoom:
+                return intCount
+
+    def write(self, data):
+        ''' Adds encoded bytes to the current file (binary mode).
+        Args:
+            data (Bytes):  The formatted and encoded records.
+        '''
+        self.writerow(data)
+
+    def closeFile(self, on_closed=None):
+        ''' Closes the current file once its records are written, without starting a new one.
+        Args:
+            on_closed (Callable):  Called without arguments by the writer thread right after the file is closed, e.g. to record that the file is complete.
+        '''
+        self.__flush()
+        self.__put(('close', on_closed))
+
+    def close(self):
+        ''' Writes the remaining records, closes the current file and stops the writer thread.
+        Raises:
+            (Exception):  The error raised by the writer thread, if any.
+        '''
+        if self.__thread.is_alive():
+            if self.__error is None:
+                self.__flush()
+            fltStart = time.perf_counter()
+            self.__queue.put(None)
+            self.__thread.join()
+            self.wait_seconds += time.perf_counter() - fltStart
+        self.__batch = []
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise error
+
+    def __flush(self):
+        ''' Sends the current batch to the writer thread.
+        '''
+        if self.__batch:
+            self.__put(('rows', self.__batch))
+            self.__batch = []
+
+    def __put(self, item):
+        ''' Queues an item for the writer thread, blocking while the queue is full.  An error of the writer thread stops it and is raised here.
+        Args:
+            item (Tuple):  ('open', path), ('rows', batch) or ('close', callback).
+        '''
+        if self.__error is not None:
+            self.close()
+        fltStart = time.perf_counter()
+        self.__queue.put(item)
+        self.wait_seconds += time.perf_counter() - fltStart
+
+    def __run(self):
+        ''' Writer thread.  Writes the batches in the order they were queued.  After an error, the remaining items are discarded so the calling thread never blocks.
+        '''
+        filehandler = None
+        writer = None
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            if self.__error is not None:
+                continue
+            fltStart = time.perf_counter()
+            try:
+                if item[0] == 'close':
+                    if filehandler is not None:
+                        filehandler.close()
+                        filehandler = None
+                        writer = None
+                    if item[1] is not None:
+                        item[1]()
+                elif item[0] == 'open':
+                    if filehandler is not None:
+                        filehandler.close()
+                    if self.binary:
+                        filehandler = open(item[1], 'wb', buffering=WRITE_BUFFER_SIZE)
+                    else:
+                        filehandler = open(item[1], 'w', encoding=self.encoding, newline=self.newline, buffering=WRITE_BUFFER_SIZE)
+                        writer = csv.writer(filehandler, delimiter=self.delimiter)
+                elif self.binary:
+                    filehandler.write(b''.join(item[1]))
+                else:
+                    writer.writerows(item[1])
+            except Exception as e:
+                self.__error = e
+            self.write_seconds += time.perf_counter() - fltStart
+            self.batches += 1
+        try:
+            if filehandler is not None:
+                filehandler.close()
+        except Exception as e:
+            if self.__error is None:
+                self.__error = e
+
+class PartitionWriter(object):
+    ''' Writes records to one output file per key (e.g. per company code).  Records are buffered per key and written in batches, and only
+    the most recently used files are kept open, so any number of keys can be written without running out of file descriptors.
+    '''
+    def __init__(self, encoding='utf-8', delimiter=',', header=None, max_open=MAX_OPEN_FILES, batch_size=BATCH_SIZE, buffer_rows=PARTITION_BUFFER_ROWS, newline=''):
+        ''' Class instantiation method
+        Args:
+            encoding (String):  Encoding of the output files.
+            delimiter (String):  Defines the delimiter used to separate the data columns within a CSV record.
+            header (List):  Record written first to each file.  None writes no header.
+            max_open (Integer):  Number of files kept open at once.  The least recently used file is closed to open another one.
+            batch_size (Integer):  Number of records buffered for a key before they are written.
+            buffer_rows (Integer):  Number of records buffered across all the keys before every buffer is written, which bounds the memory used.
+            newline (String):  Controls how universal newlines mode works when the files are written.  See CSVOps.setWriter().
+        '''
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.header = header
+        self.max_open = max(max_open, 1)
+        self.batch_size = batch_size
+        self.buffer_rows = buffer_rows
+        self.newline = newline
+        # Number of times a file was opened, including reopens after it was closed by the LRU
+        self.opens = 0
+        self.__files = OrderedDict()
+        self.__buffers = {}
+        self.__buffered = 0
+        self.__opened_paths = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def writerow(self, output_path, row):
+        ''' Adds a record to a file.
+        Args:
+            output_path (String):  Full path of the file of the record's key.
+            row (List):  The fields of the record.
+        '''
+        buffer = self.__buffers.get(output_path)
+        if buffer is None:
+            buffer = self.__buffers[output_path] = []
+        buffer.append(row)
+        self.__buffered += 1
+        if len(buffer) >= self.batch_size:
+            self.__flush(output_path)
+        elif self.__buffered >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        ''' Writes the buffers of every key.  The files that are already open are written first, so they are not closed by the LRU before their turn.
+        '''
+        for output_path in [path for path in self.__files if path in self.__buffers]:
+            self.__flush(output_path)
+        for output_path in list(self.__buffers):
+            self.__flush(output_path)
+
+    def close(self):
+        ''' Writes the remaining records and closes every file.
+        '''
+        try:
+            self.flush()
+        finally:
+            while self.__files:
+                output_path, (filehandler, writer) = self.__files.popitem(last=False)
+                filehandler.close()
+
+    def __flush(self, output_path):
+        ''' Writes the buffer of a key to its file.
+        Args:
+            output_path (String):  Full path of the file.
+        '''
+        buffer = self.__buffers.pop(output_path)
+        self.__buffered -= len(buffer)
+        self.__getWriter(output_path).writerows(buffer)
+
+    def __getWriter(self, output_path):
+        ''' Returns the csv writer of a file, opening it if needed.  A file is created (and its header written) the first time, and appended to when it is opened again after the LRU closed it.
+        Args:
+            output_path (String):  Full path of the file.
+        Returns:
+            (csv.writer):  The writer of the file.
+        '''
+        entry = self.__files.get(output_path)
+        if entry is not None:
+            self.__files.move_to_end(output_path)
+            return entry[1]
+
+        if len(self.__files) >= self.max_open:
+            closed_path, (filehandler, writer) = self.__files.popitem(last=False)
+            filehandler.close()
+
+        blnReopen = output_path in self.__opened_paths
+        filehandler = open(output_path, 'a' if blnReopen else 'w', encoding=self.encoding, newline=self.newline, buffering=PARTITION_BUFFER_SIZE)
+        writer = csv.writer(filehandler, delimiter=self.delimiter)
+        if not blnReopen:
+            self.__opened_paths.add(output_path)
+            if self.header is not None:
+                writer.writerow(self.header)
+        self.opens += 1
+        self.__files[output_path] = (filehandler, writer)
+        return writer
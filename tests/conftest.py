@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import csv
+import os
+import subprocess
+import sys
+import pytest
+'''
+Shared helpers of the COTI tests.  Each test runs COTI.py in a child process, as it is called from the command line, on small files
+written to a temporary directory, and reads back the files it wrote next to the source file.
+'''
+
+REPOSITORY_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+COTI_SCRIPT = os.path.join(REPOSITORY_DIRECTORY, 'COTI', 'COTI.py')
+sys.path.insert(0, os.path.join(REPOSITORY_DIRECTORY, 'Benchmarks'))
+from CSVGenerator import generateCSV
+
+def runCOTI(source_file_path, *arguments, expect_error=False):
+    ''' Runs COTI.py on a source file.
+    Args:
+        source_file_path (String):  Full path of the source file.
+        arguments (String):  COTI arguments, without -file (e.g. '-operation=chunk').
+        expect_error (Boolean):  Defines whether the run is expected to stop with an [ERROR] message.
+    Returns:
+        (String):  What the run printed.
+    '''
+    result = subprocess.run([sys.executable, COTI_SCRIPT, '-file=' + source_file_path] + list(arguments), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=os.path.dirname(source_file_path))
+    strOutput = result.stdout.decode('utf-8', 'replace')
+    if expect_error:
+        assert '[ERROR]' in strOutput, strOutput
+    else:
+        assert result.returncode == 0 and '[ERROR]' not in strOutput, strOutput
+    return strOutput
+
+def takeOutputs(source_file_path):
+    ''' Reads and deletes the files COTI wrote next to the source file (e.g. Filename(1).csv), so the next run starts clean.
+    Args:
+        source_file_path (String):  Full path of the source file.
+    Returns:
+        (Dictionary):  The bytes of each output file, by file name.
+    '''
+    strDirectory, strName = os.path.split(source_file_path)
+    strPrefix = os.path.splitext(strName)[0] + '('
+    outputs = {}
+    for strFile in sorted(os.listdir(strDirectory)):
+        if strFile.startswith(strPrefix):
+            strPath = os.path.join(strDirectory, strFile)
+            with open(strPath, 'rb') as filehandler:
+                outputs[strFile] = filehandler.read()
+            os.remove(strPath)
+    return outputs
+
+def readRecords(data):
+    ''' Parses the bytes of an output file.
+    Args:
+        data (Bytes):  The output file.
+    Returns:
+        (List):  The records, header included.
+    '''
+    return list(csv.reader(data.decode('utf-8').splitlines(keepends=True)))
+
+def writeCSV(target_file_path, rows):
+    ''' Writes a CSV file the way the extracts are written:  CRLF line endings and minimal quoting.
+    Args:
+        target_file_path (String):  Full path of the file to write.
+        rows (List):  The records, header included.
+    Returns:
+        (String):  target_file_path.
+    '''
+    with open(target_file_path, 'w', encoding='utf-8', newline='') as filehandler:
+        csv.writer(filehandler).writerows(rows)
+    return target_file_path
+
+@pytest.fixture
+def sourceFile(tmp_path):
+    ''' A synthetic CSV file with quoted line breaks, delimiters and quotes in its text fields (see CSVGenerator.generateCSV()).
+    '''
+    strPath = str(tmp_path / 'source.csv')
+    generateCSV(strPath, rows=3000, columns=8, field_width=10, quoted_newlines=0.05)
+    return strPath
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+import os
+import sys
+from conftest import REPOSITORY_DIRECTORY, runCOTI, takeOutputs, readRecords, writeCSV
+sys.path.insert(0, os.path.join(REPOSITORY_DIRECTORY, 'COTI'))
+from CSVAggregate import Aggregator
+'''
+Checks of the aggregate operation.
+'''
+
+def test_integers_past_int64_are_summed_exactly(tmp_path):
+    strPath = writeCSV(str(tmp_path / 'big.csv'), [['k', 'v'], ['a', '99999999999999999999'], ['a', '1']])
+    runCOTI(strPath, '-operation=aggregate', '-groupby=k', '-aggregates=sum:v')
+    assert readRecords(list(takeOutputs(strPath).values())[0]) == [['k', 'sum(v)'], ['a', '100000000000000000000']]
+
+def test_vectorized_batches_match_the_record_path():
+    header = ['k', 'v']
+    rows = [['a', '99999999999999999999'], ['a', '1'], ['b', '2'], ['b', ''], ['c', '7'], ['c', 'x'], ['a', '-3']]
+    results = []
+    for blnVectorized in [False, True]:
+        for intBatchSize in [3, 100]:
+            aggregator = Aggregator(header, ['k'], [('count', None), ('sum', 'v'), ('min', 'v'), ('max', 'v')], batch_size=intBatchSize, vectorized=blnVectorized)
+            aggregator.add(rows)
+            results.append(list(aggregator.results()))
+    for result in results:
+        assert result == [['a', 3, 99999999999999999997, -3, 99999999999999999999], ['b', 2, 2, 2, 2], ['c', 2, 7, 7, 7]]
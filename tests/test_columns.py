@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+import pytest
+from conftest import runCOTI, takeOutputs, writeCSV
+'''
+Checks of the column references of the operations (names, or positions using a 0 number counting system).
+'''
+
+@pytest.mark.parametrize('arguments', [
+    ['-operation=explode', '-field2split=7', '-fielddelimiter=;'],
+    ['-operation=sort', '-sortby=7'],
+    ['-operation=dedup', '-dedupby=7'],
+    ['-operation=aggregate', '-groupby=7', '-aggregates=count'],
+    ['-operation=partition', '-partitionby=7'],
+])
+def test_position_past_the_header_is_an_error(tmp_path, arguments):
+    strPath = writeCSV(str(tmp_path / 'short.csv'), [['id', 'values'], ['1', 'a;b'], ['2', 'c']])
+    strOutput = runCOTI(strPath, *arguments, expect_error=True)
+    assert 'Column 7 is not in the header' in strOutput
+    assert takeOutputs(strPath) == {}
+
+def test_position_in_the_header_is_used(tmp_path):
+    strPath = writeCSV(str(tmp_path / 'short.csv'), [['id', 'values'], ['1', 'a;b'], ['2', 'c']])
+    runCOTI(strPath, '-operation=explode', '-field2split=1', '-fielddelimiter=;')
+    assert list(takeOutputs(strPath).values()) == [b'id,values\r\n1,a\r\n1,b\r\n']
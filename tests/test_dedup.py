@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+import os
+import random
+import sys
+from conftest import REPOSITORY_DIRECTORY, readRecords
+sys.path.insert(0, os.path.join(REPOSITORY_DIRECTORY, 'COTI'))
+from CSVDedup import Deduplicator, makeDigestFunction
+'''
+Checks of the spill partitions of the dedup operation.
+'''
+
+def test_partitions_over_budget_are_split_again(sourceFile, tmp_path):
+    with open(sourceFile, 'rb') as filehandler:
+        source = readRecords(filehandler.read())
+    rng = random.Random(4)
+    rows = source[1:] + rng.sample(source[1:], 1500)
+    rng.shuffle(rows)
+    for strKeep in ['first', 'last']:
+        results = []
+        for intBudget, intPartitions in [(1 << 30, 64), (2000, 64), (2000, 2)]:
+            with Deduplicator(makeDigestFunction(source[0]), strKeep, intBudget, str(tmp_path), intPartitions) as deduplicator:
+                results.append((list(deduplicator.filter(iter(rows))), deduplicator.duplicate_count, deduplicator.spilled_bytes))
+        assert results[0][1] == 1500 and results[0][2] == 0
+        assert results[1][:2] == results[0][:2]
+        assert results[2][:2] == results[0][:2]
+        # With 2 partitions, each partition goes over the 2000 byte budget and is spilled again at each depth
+        assert results[2][2] > 2 * results[1][2]
+    assert os.listdir(str(tmp_path)) == ['source.csv']
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+import random
+from conftest import runCOTI, takeOutputs, readRecords, writeCSV
+'''
+Round-trip checks of the COTI operations:  the read modes of the chunk operation write the same files, and the sort, dedup, join and diff
+operations give the same records when they spill to temporary files under a small -memory as when everything fits in memory.
+'''
+
+# Budget small enough for the spill paths to be taken on the test files
+SPILL_MEMORY = '-memory=16KB'
+
+def readSource(source_file_path):
+    with open(source_file_path, 'rb') as filehandler:
+        return readRecords(filehandler.read())
+
+def test_chunk_modes_write_the_same_files(sourceFile):
+    outputs = {}
+    for strMode, extra in [('stream', []), ('memory', []), ('memory-compact', ['-compact']), ('raw', [])]:
+        runCOTI(sourceFile, '-operation=chunk', '-chunksize=700', '-mode=' + strMode.split('-')[0], *extra)
+        outputs[strMode] = takeOutputs(sourceFile)
+
+    assert len(outputs['stream']) == 5
+    for strMode in ['memory', 'memory-compact', 'raw']:
+        assert outputs[strMode] == outputs['stream'], strMode
+
+    # The chunks hold every record of the source, in order, each chunk with the header
+    source = readSource(sourceFile)
+    records = []
+    for strFile in sorted(outputs['stream'], key=lambda name: int(name[name.index('(') + 1:name.index(')')])):
+        chunk = readRecords(outputs['stream'][strFile])
+        assert chunk[0] == source[0]
+        records += chunk[1:]
+    assert records == source[1:]
+
+def test_chunk_bytes_stream_and_raw_match(sourceFile):
+    runCOTI(sourceFile, '-operation=chunk', '-chunkbytes=40000', '-mode=stream')
+    stream = takeOutputs(sourceFile)
+    runCOTI(sourceFile, '-operation=chunk', '-chunkbytes=40000', '-mode=raw')
+    assert takeOutputs(sourceFile) == stream
+    assert all(len(data) <= 40000 for data in stream.values())
+
+def test_sort_spill_matches_memory(sourceFile):
+    runCOTI(sourceFile, '-operation=sort', '-sortby=DueDate:date,Amount:float')
+    inMemory = takeOutputs(sourceFile)
+    strOutput = runCOTI(sourceFile, '-operation=sort', '-sortby=DueDate:date,Amount:float', SPILL_MEMORY)
+    assert int(strOutput.split('Sorted runs spilled to disk: ')[1].split()[0]) > 1
+    assert takeOutputs(sourceFile) == inMemory
+
+    records = readRecords(list(inMemory.values())[0])[1:]
+    assert len(records) == 3000
+    keys = [(record[4], float(record[3])) for record in records]
+    assert keys == sorted(keys)
+
+def test_dedup_spill_matches_memory(sourceFile, tmp_path):
+    source = readSource(sourceFile)
+    rng = random.Random(1)
+    duplicated = source[1:] + rng.sample(source[1:], 1500)
+    strPath = writeCSV(str(tmp_path / 'duplicated.csv'), [source[0]] + duplicated)
+
+    runCOTI(strPath, '-operation=dedup')
+    inMemory = takeOutputs(strPath)
+    strOutput = runCOTI(strPath, '-operation=dedup', SPILL_MEMORY)
+    assert 'Records spilled to disk' in strOutput
+    assert takeOutputs(strPath) == inMemory
+    # The first occurrences are the records of the source, in their order
+    assert readRecords(list(inMemory.values())[0]) == source
+
+    runCOTI(strPath, '-operation=dedup', '-dedupby=DueDate', '-keep=last')
+    inMemory = takeOutputs(strPath)
+    runCOTI(strPath, '-operation=dedup', '-dedupby=DueDate', '-keep=last', SPILL_MEMORY)
+    assert takeOutputs(strPath) == inMemory
+
+def test_join_spill_matches_memory(sourceFile, tmp_path):
+    source = readSource(sourceFile)
+    rng = random.Random(2)
+    right = [['Id', 'Region']] + [[record[0], rng.choice(['EMEA', 'APAC', 'AMER'])] for record in rng.sample(source[1:], 2000)]
+    strRightPath = writeCSV(str(tmp_path / 'right.csv'), right)
+
+    for strJoinType in ['inner', 'left']:
+        runCOTI(sourceFile, '-operation=join', '-joinfile=' + strRightPath, '-joinon=Id', '-jointype=' + strJoinType)
+        inMemory = readRecords(list(takeOutputs(sourceFile).values())[0])
+        strOutput = runCOTI(sourceFile, '-operation=join', '-joinfile=' + strRightPath, '-joinon=Id', '-jointype=' + strJoinType, SPILL_MEMORY)
+        assert 'Records spilled to disk' in strOutput
+        spilled = readRecords(list(takeOutputs(sourceFile).values())[0])
+        # The spilled records come partition by partition
+        assert spilled[0] == inMemory[0]
+        assert sorted(spilled[1:]) == sorted(inMemory[1:])
+        assert len(inMemory) - 1 == (2000 if strJoinType == 'inner' else 3000)
+
+def test_diff_spill_matches_memory(sourceFile, tmp_path):
+    source = readSource(sourceFile)
+    rng = random.Random(3)
+    new = []
+    for record in source[1:]:
+        fltDraw = rng.random()
+        if fltDraw < 0.05:
+            continue
+        if fltDraw < 0.1:
+            record = record[:3] + ['%.2f' % (rng.random() * 100)] + record[4:]
+        new.append(record)
+    new += [[str(100000 + i)] + source[1 + i][1:] for i in range(50)]
+    rng.shuffle(new)
+    strNewPath = writeCSV(str(tmp_path / 'new.csv'), [source[0]] + new)
+
+    runCOTI(sourceFile, '-operation=diff', '-difffile=' + strNewPath, '-diffon=Id')
+    inMemory = readRecords(list(takeOutputs(sourceFile).values())[0])
+    for strWorkers in ['1', '2']:
+        strOutput = runCOTI(sourceFile, '-operation=diff', '-difffile=' + strNewPath, '-diffon=Id', '-workers=' + strWorkers, SPILL_MEMORY)
+        assert 'Records spilled to disk' in strOutput
+        spilled = readRecords(list(takeOutputs(sourceFile).values())[0])
+        assert spilled[0] == inMemory[0]
+        assert sorted(spilled[1:]) == sorted(inMemory[1:])
+
+    changes = [record[0] for record in inMemory[1:]]
+    assert changes.count('added') == 50
+    assert changes.count('removed') == len(source) - 1 - (len(new) - 50)